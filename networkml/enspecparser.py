@@ -8,6 +8,7 @@ import traceback
 
 # import our modules
 from networkml.error import NetworkError
+from networkml.grammarcache import GrammarCache
 
 
 class EnSpecLexerError(NetworkError):
@@ -140,7 +141,7 @@ class EnSpecLexer:
         return t
 
     def __init__(self):
-        self.lexer = lex.lex(module=self)
+        self.lexer = GrammarCache.lexer(self)
 
     def t_error(self, t):
         # _print("Illegal character {}".format(t.value[0]))
@@ -280,7 +281,7 @@ class EnSpecParser:
         self._owner = owner
         self._lexer = EnSpecLexer()
         self.lexer = self._lexer.lexer
-        self.parser = yacc.yacc(module=self)
+        self.parser = GrammarCache.parser(self)
 
     @property
     def owner(self):
@@ -2,6 +2,9 @@
 
 import os
 import re
+import logging
+import threading
+import functools
 from enum import Enum
 from networkml.error import NetworkError, NetworkNotImplementationError
 from networkml import config
@@ -21,6 +24,9 @@ def is_debug_mode():
 def set_debug(flag):
     global _debug
     _debug = flag
+    with _trace_lock:
+        for trace in _traces.values():
+            trace.on = _trace_on(trace)
 
 
 def is_traceback():
@@ -68,6 +74,113 @@ def print_fatal(*args):
         print(msg)
 
 
+class Trace(object):
+    # runtime switch for debug output of one module. a call does nothing while it is off; hot paths
+    # whose arguments are costly to build test it first, so a disabled trace costs one attribute check:
+    #     _trace = get_trace(__name__)
+    #     if _trace.on:
+    #         _trace("STACK[{}] VARS:{}", st, frame.dump())
+    # messages are formatted only when emitted, and go to the module's logger (log4p handlers and
+    # levels still apply) or the given writer. off unless named in NETWORKML_TRACE (comma separated,
+    # "all" for every module) or enabled by set_trace(). a trace made with follows_debug, for output
+    # that went through debug() before, is also on while set_debug() is.
+
+    __slots__ = ("_name", "_writer", "_follows_debug", "on")
+
+    def __init__(self, name, writer=None, on=False, follows_debug=False):
+        self._name = name
+        self._writer = writer
+        self._follows_debug = follows_debug
+        self.on = on
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def follows_debug(self):
+        return self._follows_debug
+
+    def __bool__(self):
+        return self.on
+
+    def __call__(self, msg, *args):
+        if not self.on:
+            return
+        if args:
+            msg = msg.format(*args)
+        if self._writer is None:
+            logging.getLogger(self._name).debug(msg)
+        else:
+            self._writer(msg)
+
+    def __repr__(self):
+        return "Trace({}, {})".format(self._name, self.on)
+
+
+EnvTrace = "NETWORKML_TRACE"
+TraceAll = "all"
+
+_traces = {}
+_trace_settings = {}
+_trace_lock = threading.Lock()
+
+
+def _trace_setting(name):
+    # the most specific setting among name, its packages and "all".
+    while True:
+        if name in _trace_settings:
+            return _trace_settings[name]
+        if "." not in name:
+            return _trace_settings.get(TraceAll, False)
+        name = name.rsplit(".", 1)[0]
+
+
+def _trace_on(trace):
+    return _trace_setting(trace.name) or (trace.follows_debug and _debug)
+
+
+def _init_trace_settings():
+    for name in os.environ.get(EnvTrace, "").split(","):
+        name = name.strip()
+        if name != "":
+            _trace_settings[name] = True
+
+
+_init_trace_settings()
+
+
+def get_trace(name, writer=None, follows_debug=False):
+    with _trace_lock:
+        trace = _traces.get(name)
+        if trace is None:
+            trace = Trace(name, writer, follows_debug=follows_debug)
+            trace.on = _trace_on(trace)
+            _traces[name] = trace
+        return trace
+
+
+def set_trace(name, flag):
+    # name is a module, a package (covering its modules) or "all".
+    with _trace_lock:
+        if name == TraceAll:
+            _trace_settings.clear()
+        else:
+            for n in [n for n in _trace_settings.keys() if n.startswith(name + ".")]:
+                del _trace_settings[n]
+        _trace_settings[name] = bool(flag)
+        for trace in _traces.values():
+            trace.on = _trace_on(trace)
+
+
+def is_trace(name):
+    return _trace_setting(name)
+
+
+def traces():
+    return dict((name, trace.on) for name, trace in _traces.items())
+
+
 class Generic:
     pass
 
@@ -89,6 +202,21 @@ class Comparator(Generic):
         else:
             return False
 
+    def sort_key(self):
+        # key function sorting in the order of ordered(). None means the natural order,
+        # which sorted() handles without calling back.
+        if type(self).ordered is Comparator.ordered:
+            return None
+        ordered = self.ordered
+
+        def compare(l, r):
+            if ordered(l, r):
+                return -1
+            if ordered(r, l):
+                return 1
+            return 0
+        return functools.cmp_to_key(compare)
+
     def equivalent(self, l, r):
         if self.ordered(l, r) and self.ordered(r, l):
             return True
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import threading
+import ply
+import ply.lex as lex
+import ply.yacc as yacc
+
+from networkml.generic import debug
+
+
+class GrammarCache(object):
+    """
+    Process-wide lexers and LALR tables per grammar class.
+
+    Grammar actions and token functions are methods of each instance (they refer to the owner),
+    so instances can't share one parser object. What is shared is the expensive part:
+    a lexer is built once per class and cloned onto every instance, and the LALR tables are
+    read (or generated and written) once per process and bound to every instance.
+
+    Tables are persisted as pickles in a versioned cache directory, one file per grammar,
+    instead of the single 'parsetab' module all grammars used to overwrite in the package
+    directory. PLY checks the grammar signature when reading, so a changed grammar regenerates them.
+    """
+
+    # bump when the layout of the cache changes
+    Version = 1
+
+    EnvCacheDir = "NETWORKML_CACHE_DIR"
+
+    _lock = threading.Lock()
+    _lexers = {}
+    _tables = {}
+
+    @classmethod
+    def cache_dir(cls):
+        base = os.environ.get(cls.EnvCacheDir)
+        if base is None:
+            base = os.path.join(os.path.expanduser("~"), ".cache", "networkml")
+        version = "v{}-ply{}-py{}{}".format(cls.Version, ply.__version__, sys.version_info[0], sys.version_info[1])
+        return os.path.join(base, version)
+
+    @classmethod
+    def table_file(cls, clazz, start):
+        directory = cls.cache_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as ex:
+            debug("grammar cache {} unavailable, tables are not persisted:{}".format(directory, ex))
+            return None
+        name = "{}.{}".format(clazz.__module__, clazz.__qualname__)
+        if start is not None:
+            name = "{}.{}".format(name, start)
+        return os.path.join(directory, "{}.pickle".format(name))
+
+    @classmethod
+    def lexer(cls, obj):
+        clazz = type(obj)
+        with cls._lock:
+            master = cls._lexers.get(clazz)
+            if master is None:
+                master = lex.lex(module=obj)
+                cls._lexers[clazz] = master
+        return master.clone(obj)
+
+    @classmethod
+    def table(cls, obj, start=None):
+        key = (type(obj), start)
+        with cls._lock:
+            table = cls._tables.get(key)
+            if table is None:
+                picklefile = cls.table_file(type(obj), start)
+                parser = yacc.yacc(module=obj, start=start, debug=False, write_tables=False, picklefile=picklefile)
+                table = (parser.action, parser.goto, parser.productions)
+                cls._tables[key] = table
+        return table
+
+    @classmethod
+    def parser(cls, obj, start=None):
+        action, goto, productions = cls.table(obj, start)
+        lrtab = yacc.LRTable()
+        lrtab.lr_action = action
+        lrtab.lr_goto = goto
+        # productions carry the bound action, so every instance gets its own copies.
+        lrtab.lr_productions = [yacc.MiniProduction(p.str, p.name, p.len, p.func, p.file, p.line)
+                                for p in productions]
+        lrtab.bind_callables({p.func: getattr(obj, p.func) for p in lrtab.lr_productions if p.func})
+        return yacc.LRParser(lrtab, getattr(obj, "p_error", None))
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._lexers = {}
+            cls._tables = {}
@@ -5,6 +5,10 @@ import traceback
 import os
 import sys
 import inspect
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
 from enum import Enum
 from networkml.error import NetworkError, NetworkLexerError, NetworkParserError
 from networkml.network import NetworkCallable, CommandOption, NetworkReturnValue
@@ -17,8 +21,109 @@ import subprocess
 from subprocess import PIPE
 
 
+class ScriptCache(object):
+    """
+    LRU of parsed scripts, keyed by the digest of the script text and the owner of the parser.
+
+    Parse actions bind every statement to the owner of the parser, and method/class definitions
+    are registered in the namespace of the caller, so a parsed script is only reused for the
+    owner it was parsed for. Entries hold their owner weakly. An entry is checked out while its
+    statements run, so a script interpreting itself gets a fresh parse.
+    """
+
+    DefaultSize = 128
+
+    def __init__(self, size=DefaultSize):
+        self._size = size
+        self._entries = OrderedDict()  # (digest, id(owner)) -> [owner reference, statements, checked out]
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_size(self, size):
+        # 0 disables caching
+        with self._lock:
+            self._size = size
+            self.evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+            self._hits = 0
+            self._misses = 0
+
+    @staticmethod
+    def digest(script):
+        return hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def reference(owner):
+        try:
+            return weakref.ref(owner)
+        except TypeError:
+            return lambda: owner
+
+    def evict(self):
+        for key in [_ for _ in self._entries.keys()]:
+            if len(self._entries) <= self._size:
+                break
+            if not self._entries[key][2]:
+                del self._entries[key]
+
+    def checkout(self, script, parser):
+        # statements of script parsed by parser, and the key to check them in (None if not cached).
+        owner = parser.owner
+        key = (self.digest(script), id(owner))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry[2]:
+                if entry[0]() is owner:
+                    entry[2] = True
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1], key
+                # id of a collected owner reused
+                del self._entries[key]
+            self._misses += 1
+        statements = parser.parse_script(script)
+        if type(statements) is not list:
+            return statements, None
+        with self._lock:
+            if self._size <= 0 or key in self._entries.keys():
+                return statements, None
+            self._entries[key] = [self.reference(owner), statements, True]
+            self.evict()
+        return statements, key
+
+    def checkin(self, key):
+        if key is None:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = False
+
+
 class NetworkInterpreter(NetworkMethod):
 
+    # shared by all interpreters of the process
+    script_cache = ScriptCache()
+
     def __init__(self, method_owner):
         super().__init__(method_owner, "interpret", ("script", "parser"), (), cancel_stacking=True)
         self._parser = NetworkParser(method_owner)
@@ -73,19 +178,22 @@ class NetworkInterpreter(NetworkMethod):
             return self.actual_interpret(caller, script, parser)
 
     def actual_interpret(self, caller, script, parser):
-        result = parser.parse_script(script)
-        rtn = None
-        if type(result) is not list:
-            return None
-        for obj in result:
-            if isinstance(obj, NetworkClassInstance):
-                rtn = obj
-                #caller.declare_class(obj, globally=True)
-                caller.accessor.set(caller, obj.signature, obj, security=NetworkInstance.PUBLIC, globally=True)
-            elif isinstance(obj, NetworkMethod):
-                rtn = obj
-                #caller.declare_method(obj, globally=True)
-                caller.accessor.set(caller, obj.signature, obj, security=NetworkInstance.PUBLIC, globally=True)
-            elif isinstance(obj, NetworkCallable):
-                rtn = obj(caller)
-        return rtn
+        result, key = self.script_cache.checkout(script, parser)
+        try:
+            rtn = None
+            if type(result) is not list:
+                return None
+            for obj in result:
+                if isinstance(obj, NetworkClassInstance):
+                    rtn = obj
+                    #caller.declare_class(obj, globally=True)
+                    caller.accessor.set(caller, obj.signature, obj, security=NetworkInstance.PUBLIC, globally=True)
+                elif isinstance(obj, NetworkMethod):
+                    rtn = obj
+                    #caller.declare_method(obj, globally=True)
+                    caller.accessor.set(caller, obj.signature, obj, security=NetworkInstance.PUBLIC, globally=True)
+                elif isinstance(obj, NetworkCallable):
+                    rtn = obj.compile_statement(obj)(caller)
+            return rtn
+        finally:
+            self.script_cache.checkin(key)
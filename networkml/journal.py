@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import pickle
+import zlib
+import threading
+import networkx as nx
+from networkml.error import NetworkError
+
+
+# Append-only journal of the mutations made to a model since it was last written.
+#
+#   file     "<model>.journal", header "NMLJ", version (u16), flags (u16), then records
+#   record   length (u32), crc32 (u32), pickled tuple
+#
+#   ("n+", n)                       node added
+#   ("n-", n)                       node removed, with its edges
+#   ("na", n, name, value)          node attribute set
+#   ("e+", u, v, key)               edge added
+#   ("e-", u, v, key)               edge removed
+#   ("ea", u, v, key, name, value)  edge attribute set
+#   ("N+", [(n, attrs), ..])        nodes added, or given the attributes if there
+#   ("E+", [(u, v, key, attrs), ..]) edges added, or given the attributes if there
+#
+# records are handed to the OS as they are appended, sync() also flushes them to disk.
+# a record torn by a crash fails its length or crc check; replay stops there and the next
+# append cuts it off.
+#
+# compaction folds the journal into the model: the journal is renamed to "<model>.journal.compacting",
+# appends go to a fresh journal, and a background thread writes a copy of the graph over the model
+# and removes the renamed journal. loading replays the model, then "*.compacting" if a crash left
+# one, then the journal. replay tolerates records the model already holds (removing what is gone,
+# setting attributes of what is gone), so replaying a compacting journal twice is harmless.
+
+Magic = b"NMLJ"
+Version = 1
+Suffix = ".journal"
+CompactingSuffix = ".compacting"
+
+_header = struct.Struct("<4sHH")
+_record = struct.Struct("<II")
+
+
+class Journal(object):
+
+    NodeAdded = "n+"
+    NodeRemoved = "n-"
+    NodeAttr = "na"
+    EdgeAdded = "e+"
+    EdgeRemoved = "e-"
+    EdgeAttr = "ea"
+    NodesAdded = "N+"
+    EdgesAdded = "E+"
+
+    # compaction is started once the journal holds this many records or bytes.
+    CompactRecords = 10000
+    CompactBytes = 16 * 1024 * 1024
+
+    def __init__(self, model_filename, records=0):
+        # records: already in the journal, as replayed by load.
+        self._model_filename = model_filename
+        self._filename = Journal.journal_file(model_filename)
+        self._file = None
+        self._records = records
+        self._size = 0
+        self._compactor = None
+        self._error = None
+
+    @staticmethod
+    def journal_file(model_filename):
+        return "{}{}".format(model_filename, Suffix)
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def compacting_file(self):
+        return "{}{}".format(self._filename, CompactingSuffix)
+
+    @property
+    def records(self):
+        # records appended since the journal was opened or compacted.
+        return self._records
+
+    @property
+    def should_compact(self):
+        return self._records >= self.CompactRecords or self._size >= self.CompactBytes
+
+    @property
+    def is_compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def open(self):
+        if self._file is not None:
+            return
+        valid = Journal.valid_length(self._filename)
+        f = open(self._filename, "ab")
+        if valid == 0:
+            f.truncate(0)
+            f.write(_header.pack(Magic, Version, 0))
+        elif valid < f.tell():
+            # cut off a record torn by a crash.
+            f.truncate(valid)
+            f.seek(valid)
+        self._file = f
+        self._size = f.tell()
+
+    def append(self, *record):
+        self.open()
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_record.pack(len(data), zlib.crc32(data)) + data)
+        self._file.flush()
+        self._records += 1
+        self._size += _record.size + len(data)
+
+    def sync(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def wait(self):
+        # until a running compaction is done. its failure is raised here.
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        if self._error is not None:
+            ex, self._error = self._error, None
+            raise NetworkError("journal compaction failed:{}".format(self._model_filename), ex)
+
+    def reset(self):
+        # the model was written as a whole: no record is needed any more.
+        self.wait()
+        self.close()
+        for f in (self._filename, self.compacting_file):
+            if os.path.exists(f):
+                os.remove(f)
+        self._records = 0
+        self._size = 0
+
+    def compact(self, write, background=True):
+        # write() saves a copy of the graph, taken before this call, over the model.
+        self.wait()
+        self.close()
+        if os.path.exists(self._filename):
+            self.rotate()
+        self._records = 0
+        self._size = 0
+
+        def run():
+            try:
+                write()
+                with open(self._model_filename, "rb") as f:
+                    os.fsync(f.fileno())
+                os.remove(self.compacting_file)
+            except Exception as ex:
+                self._error = ex
+
+        if background:
+            self._compactor = threading.Thread(target=run, name="journal-compaction", daemon=True)
+            self._compactor.start()
+        else:
+            run()
+            self.wait()
+
+    def rotate(self):
+        compacting = self.compacting_file
+        if not os.path.exists(compacting):
+            os.replace(self._filename, compacting)
+            return
+        # a compaction interrupted by a crash left its journal: keep those records ahead of ours.
+        valid = Journal.valid_length(self._filename)
+        with open(self._filename, "rb") as src, open(compacting, "r+b") as dst:
+            end = Journal.valid_length(compacting)
+            dst.seek(end)
+            dst.truncate()
+            if end == 0:
+                dst.write(_header.pack(Magic, Version, 0))
+            src.seek(_header.size)
+            dst.write(src.read(max(valid - _header.size, 0)))
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self._filename)
+
+    @staticmethod
+    def valid_length(filename):
+        # bytes of filename up to the end of its last whole record, 0 if it is no journal.
+        length = 0
+        for _, end in Journal.scan(filename):
+            length = end
+        return length
+
+    @staticmethod
+    def scan(filename):
+        # (pickled record, end offset) of each whole record; the header alone yields (None, its size).
+        if not os.path.exists(filename):
+            return
+        with open(filename, "rb") as f:
+            head = f.read(_header.size)
+            if len(head) < _header.size:
+                return
+            magic, version, flags = _header.unpack(head)
+            if magic != Magic:
+                raise NetworkError("not a journal:{}".format(filename))
+            if version > Version:
+                raise NetworkError("journal version {} is newer than supported {}.".format(version, Version))
+            pos = _header.size
+            yield None, pos
+            while True:
+                head = f.read(_record.size)
+                if len(head) < _record.size:
+                    return
+                length, crc = _record.unpack(head)
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    return
+                pos += _record.size + length
+                yield data, pos
+
+    @staticmethod
+    def replay(G: nx.MultiDiGraph, model_filename):
+        # applies the journals of model_filename to G, as loaded from it. returns the number of records.
+        journal = Journal.journal_file(model_filename)
+        n = 0
+        for filename in ("{}{}".format(journal, CompactingSuffix), journal):
+            for record, _ in Journal.scan(filename):
+                if record is not None:
+                    Journal.apply(G, pickle.loads(record))
+                    n += 1
+        return n
+
+    @staticmethod
+    def exists(model_filename):
+        journal = Journal.journal_file(model_filename)
+        return Journal.valid_length(journal) > _header.size or \
+            os.path.exists("{}{}".format(journal, CompactingSuffix))
+
+    @staticmethod
+    def apply(G: nx.MultiDiGraph, record):
+        op = record[0]
+        if op == Journal.NodeAdded:
+            G.add_node(record[1])
+        elif op == Journal.NodeRemoved:
+            if G.has_node(record[1]):
+                G.remove_node(record[1])
+        elif op == Journal.NodeAttr:
+            n, name, value = record[1:]
+            if G.has_node(n):
+                G.nodes[n][name] = value
+        elif op == Journal.EdgeAdded:
+            u, v, k = record[1:]
+            G.add_edge(u, v, key=k)
+        elif op == Journal.EdgeRemoved:
+            u, v, k = record[1:]
+            if G.has_edge(u, v, k):
+                G.remove_edge(u, v, k)
+        elif op == Journal.EdgeAttr:
+            u, v, k, name, value = record[1:]
+            if G.has_edge(u, v, k):
+                G[u][v][k][name] = value
+        elif op == Journal.NodesAdded:
+            G.add_nodes_from(record[1])
+        elif op == Journal.EdgesAdded:
+            G.add_edges_from(record[1])
+        else:
+            raise NetworkError("unknown journal record:{}".format(record))
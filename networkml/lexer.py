@@ -31,6 +31,7 @@ from networkml.network import NetworkMethod, ForeachStatement, NetworkSubstitute
 from networkml.network import ReachNetworkConstructor, Interval, SimpleVariable, NetworkReturn
 from networkml.network import Interval, Numberset, NumbersetOperator, CommandOption
 from networkml.network import NetworkSymbol
+from networkml.grammarcache import GrammarCache
 
 
 class NetworkLexer:
@@ -174,7 +175,7 @@ class NetworkLexer:
 
     # initializer
     def __init__(self):
-        self.lexer = lex.lex(module=self)
+        self.lexer = GrammarCache.lexer(self)
 
     def t_error(self, t):
         # _print("Illegal character {}".format(t.value[0]))
@@ -1611,7 +1612,7 @@ class NetworkParser:
         self._owner = owner
         self._lexer = NetworkLexer()
         self.lexer = self._lexer.lexer
-        self.parser = yacc.yacc(module=self)
+        self.parser = GrammarCache.parser(self)
 
     @property
     def owner(self):
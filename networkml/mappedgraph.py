@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+from collections.abc import Mapping
+import numpy as np
+import networkx as nx
+from networkml.error import NetworkError
+from networkml.snapshot import Snapshot
+
+
+# Read-only MultiDiGraph over a memory-mapped graph snapshot (networkml.snapshot).
+#
+# topology is CSR kept in the mapped file: edges are grouped by source row, EPTR gives the
+# out-edge range of each row, IPTR/IIDX the in-edge rows grouped by destination. attributes are
+# columns, one (rows, values) pair per name; rows stay mapped, values are unpickled the first
+# time the column is used. attribute dicts and neighbour dicts are built per element on access
+# and kept, so a dict handed out once is the one a later to_graph() puts in the MultiDiGraph, and
+# a lookup (G[u][v], has_edge) costs one dict access once the node has been visited.
+#
+# the reading part of the MultiDiGraph interface is there, _adj/_succ/_pred/_node included, so
+# networkx algorithms run on the mapped graph. copy(), subgraph(), reverse() and to_undirected()
+# return MultiDiGraph copies.
+#
+# processes opening the same file share its pages through the page cache. the graph cannot be
+# modified: SpecificationGraph replaces it with to_graph() on the first write.
+
+
+class _Column(object):
+
+    __slots__ = ("rows", "dense", "_buf", "_offset", "_length", "_values")
+
+    def __init__(self, rows, size, buf, offset, length):
+        self.rows = rows
+        # a column every element has is indexed by row directly.
+        self.dense = len(rows) == size
+        self._buf = buf
+        self._offset = offset
+        self._length = length
+        self._values = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = pickle.loads(bytes(self._buf[self._offset:self._offset + self._length]))
+        return self._values
+
+    def get(self, row, default):
+        if self.dense:
+            return self.values[row]
+        pos = int(np.searchsorted(self.rows, row))
+        if pos < len(self.rows) and self.rows[pos] == row:
+            return self.values[pos]
+        return default
+
+
+class _NodeView(Mapping):
+
+    def __init__(self, G):
+        self._G = G
+
+    def __getitem__(self, n):
+        return self._G.node_attrs(self._G.row(n))
+
+    def __iter__(self):
+        return iter(self._G.ids)
+
+    def __len__(self):
+        return len(self._G.ids)
+
+    def __contains__(self, n):
+        return self._G.has_node(n)
+
+    def __call__(self, data=False, default=None):
+        G = self._G
+        if data is False:
+            return iter(G.ids)
+        if data is True:
+            return ((n, G.node_attrs(i)) for i, n in enumerate(G.ids))
+        return ((n, G.node_attrs(i).get(data, default)) for i, n in enumerate(G.ids))
+
+
+class _EdgeView(object):
+
+    def __init__(self, G):
+        self._G = G
+
+    def __iter__(self):
+        return self._G.iter_edges(keys=True)
+
+    def __len__(self):
+        return self._G.number_of_edges()
+
+    def __contains__(self, e):
+        return self._G.has_edge(*e)
+
+    def __getitem__(self, e):
+        return self._G[e[0]][e[1]][e[2]]
+
+    def __call__(self, nbunch=None, data=False, keys=False, default=None):
+        return self._G.iter_edges(nbunch, data, keys, default)
+
+
+class _AdjacencyView(Mapping):
+    # N.succ / N.pred: node -> {neighbour: {key: attrs}}.
+
+    def __init__(self, G, incoming):
+        self._G = G
+        self._incoming = incoming
+
+    def __getitem__(self, n):
+        return self._G.neighbours(self._G.row(n), self._incoming)
+
+    def __iter__(self):
+        return iter(self._G.ids)
+
+    def __len__(self):
+        return len(self._G.ids)
+
+    def __contains__(self, n):
+        return self._G.has_node(n)
+
+
+class MappedGraph(object):
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._buf = np.memmap(filename, dtype=np.uint8, mode="r")
+        self._meta = {}
+        self._ids = []
+        self._index = None
+        self._src = self._dst = None
+        self._indptr = self._in_indptr = self._in_edges = None
+        self._keys_section = None
+        self._keys = None
+        self._node_columns = {}
+        self._edge_columns = {}
+        self._node_attrs = {}
+        self._edge_attrs = {}
+        self._out_neighbours = {}
+        self._in_neighbours = {}
+        self.open()
+        self._nodes = _NodeView(self)
+        self._edges = _EdgeView(self)
+        self._succ = _AdjacencyView(self, False)
+        self._pred = _AdjacencyView(self, True)
+        # as the MultiDiGraph attributes networkx algorithms read directly.
+        self._adj = self._succ
+        self._node = self._nodes
+
+    def open(self):
+        buf = self._buf
+        key_table = []
+        rows = None
+        for tag, aux, offset, length in Snapshot.sections(buf):
+            if tag in (b"ESRC", b"EDST", b"NROW", b"EROW", b"EPTR", b"IPTR", b"IIDX"):
+                data = np.frombuffer(buf, dtype="<i8", count=length // 8, offset=offset)
+            if tag == b"META":
+                self._meta = pickle.loads(bytes(buf[offset:offset + length]))
+            elif tag == b"NIDS":
+                self._ids = pickle.loads(bytes(buf[offset:offset + length]))
+            elif tag == b"ESRC":
+                self._src = data
+            elif tag == b"EDST":
+                self._dst = data
+            elif tag == b"EPTR":
+                self._indptr = data
+            elif tag == b"IPTR":
+                self._in_indptr = data
+            elif tag == b"IIDX":
+                self._in_edges = data
+            elif tag == b"EKEY":
+                self._keys_section = (offset, length)
+            elif tag == b"KEYS":
+                key_table = pickle.loads(bytes(buf[offset:offset + length]))
+            elif tag in (b"NROW", b"EROW"):
+                rows = data
+            elif tag == b"NVAL":
+                self._node_columns[key_table[aux]] = _Column(rows, len(self._ids), buf, offset, length)
+            elif tag == b"EVAL":
+                self._edge_columns[key_table[aux]] = _Column(rows, self.number_of_edges(), buf, offset, length)
+        n = len(self._ids)
+        if self._src is None:
+            self._src = self._dst = np.zeros(0, dtype="<i8")
+        if self._indptr is None:
+            # snapshots written before the CSR sections: derive them, edges are grouped by source.
+            self._indptr = np.zeros(n + 1, dtype="<i8")
+            np.cumsum(np.bincount(self._src, minlength=n), out=self._indptr[1:])
+        if self._in_indptr is None:
+            self._in_edges = np.argsort(self._dst, kind="stable")
+            self._in_indptr = np.zeros(n + 1, dtype="<i8")
+            np.cumsum(np.bincount(self._dst, minlength=n), out=self._in_indptr[1:])
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def graph(self):
+        return self._meta.get("graph", {})
+
+    @property
+    def name(self):
+        return self.graph.get("name", "")
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            if self._keys_section is None:
+                self._keys = [0] * self.number_of_edges()
+            else:
+                offset, length = self._keys_section
+                self._keys = pickle.loads(bytes(self._buf[offset:offset + length]))
+        return self._keys
+
+    @property
+    def nodes(self):
+        return self._nodes
+
+    @property
+    def edges(self):
+        return self._edges
+
+    @property
+    def succ(self):
+        return self._succ
+
+    @property
+    def adj(self):
+        return self._succ
+
+    @property
+    def pred(self):
+        return self._pred
+
+    @property
+    def degree(self):
+        return nx.reportviews.DiMultiDegreeView(self)
+
+    @property
+    def in_degree(self):
+        return nx.reportviews.InMultiDegreeView(self)
+
+    @property
+    def out_degree(self):
+        return nx.reportviews.OutMultiDegreeView(self)
+
+    def row(self, n):
+        if self._index is None:
+            self._index = {x: i for i, x in enumerate(self._ids)}
+        return self._index[n]
+
+    def node_attrs(self, i):
+        d = self._node_attrs.get(i)
+        if d is None:
+            d = {}
+            for name, c in self._node_columns.items():
+                v = c.get(i, _Column)
+                if v is not _Column:
+                    d[name] = v
+            self._node_attrs[i] = d
+        return d
+
+    def edge_attrs(self, j):
+        d = self._edge_attrs.get(j)
+        if d is None:
+            d = {}
+            for name, c in self._edge_columns.items():
+                v = c.get(j, _Column)
+                if v is not _Column:
+                    d[name] = v
+            self._edge_attrs[j] = d
+        return d
+
+    def edge_rows(self, i, incoming=False):
+        # rows of the edges leaving (or entering) node row i.
+        if incoming:
+            return self._in_edges[self._in_indptr[i]:self._in_indptr[i + 1]].tolist()
+        return range(int(self._indptr[i]), int(self._indptr[i + 1]))
+
+    def neighbours(self, i, incoming=False):
+        # {neighbour: {key: attrs}} of node row i.
+        cache = self._in_neighbours if incoming else self._out_neighbours
+        d = cache.get(i)
+        if d is not None:
+            return d
+        ids = self._ids
+        ends = self._src if incoming else self._dst
+        keys = self.keys
+        d = {}
+        for j in self.edge_rows(i, incoming):
+            v = ids[ends[j]]
+            e = d.get(v)
+            if e is None:
+                e = {}
+                d[v] = e
+            e[keys[j]] = self.edge_attrs(j)
+        cache[i] = d
+        return d
+
+    def iter_edges(self, nbunch=None, data=False, keys=False, default=None):
+        # as MultiDiGraph.edges(): grouped by source in node order.
+        ids = self._ids
+        src = self._src
+        dst = self._dst
+        ekeys = self.keys
+        if nbunch is None:
+            js = range(len(ekeys))
+        else:
+            if nbunch in self.nodes:
+                nbunch = [nbunch]
+            js = (j for n in nbunch if n in self.nodes for j in self.edge_rows(self.row(n)))
+        for j in js:
+            e = (ids[src[j]], ids[dst[j]])
+            if keys:
+                e += (ekeys[j],)
+            if data is True:
+                e += (self.edge_attrs(j),)
+            elif data is not False:
+                e += (self.edge_attrs(j).get(data, default),)
+            yield e
+
+    def out_edges(self, nbunch=None, data=False, keys=False, default=None):
+        return self.iter_edges(nbunch, data, keys, default)
+
+    def in_edges(self, nbunch=None, data=False, keys=False, default=None):
+        if nbunch is None:
+            nbunch = self._ids
+        elif nbunch in self.nodes:
+            nbunch = [nbunch]
+        ids = self._ids
+        ekeys = self.keys
+        for n in nbunch:
+            if n not in self.nodes:
+                continue
+            for j in self.edge_rows(self.row(n), True):
+                e = (ids[self._src[j]], n)
+                if keys:
+                    e += (ekeys[j],)
+                if data is True:
+                    e += (self.edge_attrs(j),)
+                elif data is not False:
+                    e += (self.edge_attrs(j).get(data, default),)
+                yield e
+
+    def successors(self, n):
+        return iter(self.neighbours(self.row(n)))
+
+    neighbors = successors
+
+    def predecessors(self, n):
+        return iter(self.neighbours(self.row(n), True))
+
+    def has_successor(self, u, v):
+        return self.has_edge(u, v)
+
+    def has_predecessor(self, u, v):
+        return self.has_edge(v, u)
+
+    def adjacency(self):
+        return ((n, self.neighbours(i)) for i, n in enumerate(self._ids))
+
+    def nbunch_iter(self, nbunch=None):
+        if nbunch is None:
+            return iter(self._ids)
+        if self.has_node(nbunch):
+            return iter([nbunch])
+        try:
+            return (n for n in list(nbunch) if self.has_node(n))
+        except TypeError as ex:
+            raise NetworkError("nbunch is not a node or a sequence of nodes:{}".format(nbunch), ex)
+
+    def get_edge_data(self, u, v, key=None, default=None):
+        if not self.has_node(u):
+            return default
+        e = self.neighbours(self.row(u)).get(v)
+        if e is None:
+            return default
+        if key is None:
+            return e
+        return e.get(key, default)
+
+    def has_node(self, n):
+        try:
+            self.row(n)
+            return True
+        except (KeyError, TypeError):
+            return False
+
+    def has_edge(self, u, v, key=None):
+        if not self.has_node(u):
+            return False
+        e = self.neighbours(self.row(u)).get(v)
+        if e is None:
+            return False
+        return key is None or key in e
+
+    def number_of_nodes(self):
+        return len(self._ids)
+
+    order = number_of_nodes
+
+    def size(self, weight=None):
+        if weight is None:
+            return self.number_of_edges()
+        return sum(d.get(weight, 1) for _, _, d in self.iter_edges(data=True))
+
+    def number_of_edges(self, u=None, v=None):
+        if u is None:
+            return len(self._src)
+        e = self.get_edge_data(u, v)
+        return 0 if e is None else len(e)
+
+    def is_directed(self):
+        return True
+
+    def is_multigraph(self):
+        return True
+
+    def __getitem__(self, n):
+        return self._succ[n]
+
+    def __contains__(self, n):
+        return self.has_node(n)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def to_graph(self) -> nx.MultiDiGraph:
+        # writable copy. attribute dicts already handed out are moved over, not copied.
+        G = nx.MultiDiGraph()
+        G.graph.update(self.graph)
+        # add_node and add_edge copy attributes; keep the very dicts instead.
+        G.add_nodes_from(self._ids)
+        for i, n in enumerate(self._ids):
+            G._node[n] = self.node_attrs(i)
+        for u, v, k, d in self.iter_edges(data=True, keys=True):
+            G.add_edge(u, v, k)
+            G._adj[u][v][k] = d
+        return G
+
+    def copy(self, as_view=False):
+        # as MultiDiGraph.copy(): attribute dicts are copied, the copy is independent of the file.
+        G = nx.MultiDiGraph()
+        G.graph.update(self.graph)
+        G.add_nodes_from(self.nodes(data=True))
+        G.add_edges_from(self.iter_edges(data=True, keys=True))
+        return G
+
+    def subgraph(self, nodes):
+        # induced by nodes, a copy rather than a view.
+        nodes = list(self.nbunch_iter(nodes))
+        kept = set(nodes)
+        G = nx.MultiDiGraph()
+        G.graph.update(self.graph)
+        G.add_nodes_from((n, self.nodes[n]) for n in nodes)
+        G.add_edges_from(e for e in self.iter_edges(nodes, data=True, keys=True) if e[1] in kept)
+        return G
+
+    def reverse(self, copy=True):
+        return self.copy().reverse(copy=False)
+
+    def to_directed(self, as_view=False):
+        return self.copy()
+
+    def to_undirected(self, reciprocal=False, as_view=False):
+        return self.copy().to_undirected(reciprocal=reciprocal)
+
+    def read_only(self, *args, **kwargs):
+        raise NetworkError("graph mapped from {} is read-only.".format(self._filename))
+
+    add_node = add_nodes_from = remove_node = remove_nodes_from = read_only
+    add_edge = add_edges_from = remove_edge = remove_edges_from = clear = update = read_only
+
+    def __repr__(self):
+        return "MappedGraph({}, {} nodes, {} edges)".format(self._filename, self.number_of_nodes(),
+                                                            self.number_of_edges())
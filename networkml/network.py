@@ -11,20 +11,26 @@ import os
 import json
 import sys
 import inspect
+import weakref
+import functools
+import heapq
 from enum import Enum
 from networkml.error import NetworkError, NetworkMethodError, NetworkParseError, NetworkNotImplementationError
 from networkml.error import NetworkReferenceError
 from networkml.error import NetworkScriptInterruptionException
 from networkml.generic import GenericCallable, GenericComponent, GenericValueHolder, Comparator, REPattern
 from networkml.generic import GenericValidator, GenericDescription
-from networkml.generic import debug, is_debug_mode, is_traceback
+from networkml.generic import debug, is_debug_mode, is_traceback, get_trace
 import networkml.genericutils as GU
 from networkml.validator import GenericEvaluatee, BinaryEvaluatee, UnaryEvaluatee, GenericValidatorParam, TrueEvaluatee
 import networkml.interpretermanager as IM
+from networkml.queryresult import QueryResult
 from networkml import config
 import log4p
 
 _armer = None
+# hot-path debug output; see generic.Trace.
+_trace = get_trace(__name__)
 
 
 def get_armer():
@@ -92,15 +98,47 @@ class DefaultSorter:
 
     log = log4p.GetLogger(logger_name=__name__, config=config.get_log_config()).logger
 
-    def __init__(self, sortee):
+    # stable sort (Timsort) in O(n log n), top-k in O(n log k).
+    # elements are ordered by a comparator, or by keys naming attributes ("name", "a.b" for nested,
+    # "-name" for descending) looked up through attributes(element). the first key is the most significant.
+
+    def __init__(self, sortee, attributes=None):
         super().__init__()
         self._sortee = sortee
         self._default_comparator = Comparator()
+        if attributes is None:
+            attributes = DefaultSorter.data_of
+        self._attributes = attributes
 
     @property
     def sortee(self):
         return self._sortee
 
+    @staticmethod
+    def data_of(x):
+        # attributes of a dict, or of a with-data tuple like (n, attrs) or (u, v, k, attrs).
+        if isinstance(x, dict):
+            return x
+        if isinstance(x, tuple) and len(x) > 0 and isinstance(x[-1], dict):
+            return x[-1]
+        return None
+
+    def attribute_key(self, path, descending=False):
+        names = tuple(path.split("."))
+        attributes = self._attributes
+        # elements without the attribute come after the others, in either direction:
+        # a descending sort reverses the flag along with the values.
+        present, missing = (1, 0) if descending else (0, 1)
+
+        def key(x):
+            v = attributes(x)
+            for n in names:
+                if not isinstance(v, dict) or n not in v:
+                    return missing, None
+                v = v[n]
+            return present, v
+        return key
+
     def minimum(self, sortee, comparator: Comparator = None):
         if comparator is None:
             comparator = self._default_comparator
@@ -112,17 +150,36 @@ class DefaultSorter:
                 idx = i
         return m, idx
 
-    def sort(self, comparator: Comparator = None):
-        if comparator is None:
-            comparator = self._default_comparator
-        result = []
-        target = self.sortee.copy()
-        while len(target) != 0:
-            m, idx = self.minimum(target, comparator)
-            target.pop(idx)
-            result.append(m)
+    def sort(self, comparator: Comparator = None, keys=(), reverse=False, top=None):
+        if len(keys) == 0:
+            if comparator is None:
+                comparator = self._default_comparator
+            return self.sort_by(comparator.sort_key(), reverse, top)
+        specs = []
+        for k in keys:
+            if k.startswith("-"):
+                specs.append((self.attribute_key(k[1:], not reverse), not reverse))
+            else:
+                specs.append((self.attribute_key(k, reverse), reverse))
+        if all(descending == specs[0][1] for _, descending in specs):
+            funcs = tuple(f for f, _ in specs)
+            return self.sort_by(lambda x: tuple(f(x) for f in funcs), specs[0][1], top)
+        # mixed directions: one stable pass per key, the least significant first.
+        result = list(self.sortee)
+        for f, descending in reversed(specs):
+            result.sort(key=f, reverse=descending)
+        if top is not None:
+            return result[:top]
         return result
 
+    def sort_by(self, key, reverse, top):
+        if top is None:
+            return sorted(self.sortee, key=key, reverse=reverse)
+        # same as the first top elements of the stable sort.
+        if reverse:
+            return heapq.nlargest(top, self.sortee, key=key)
+        return heapq.nsmallest(top, self.sortee, key=key)
+
 
 class Literal:
 
@@ -882,6 +939,13 @@ class NetworkBaseCallable(NetworkComponent, GenericCallable):
     ControlReturned = 2
     REPORT_BREAK_POINT = "report_break_point"
 
+    # Statements of method bodies and scripts run as closures built by compile(), which do what
+    # __call__ and call_impl do without the per-statement dispatch, argument conversion by type and
+    # stack dumps to the debug log. Set False to run them through the tree-walking __call__.
+    CompileStatements = True
+
+    _compiled = None
+
     def __init__(self, owner, args=(), closer=False, cancel_stacking=True, safe_call=False, **kwargs):
         super().__init__(owner, args=args)
         self._args = args
@@ -934,8 +998,9 @@ class NetworkBaseCallable(NetworkComponent, GenericCallable):
         if self.REPORT_BREAK_POINT in kwargs.keys():
             report_break_point = kwargs[self.REPORT_BREAK_POINT]
         stack_id = None
-        st = caller.deepest_stack_id(caller)
-        self.log.debug("**** PRE  STACK[{}] VARS:{}".format(st, caller.get_stack(caller, st)[caller.VARS]))
+        if _trace.on:
+            st = caller.deepest_stack_id(caller)
+            _trace("**** PRE  STACK[{}] VARS:{}", st, caller.get_stack(caller, st)[caller.VARS])
         if not self.cancel_stacking and not isinstance(caller, NetworkClassInstance):
             stack_id = caller.push_stack(caller)
         try:
@@ -946,29 +1011,85 @@ class NetworkBaseCallable(NetworkComponent, GenericCallable):
             #     print("args {} swapped to {}".format("(..{})".format(len(args)), "(..{})".format(len(actual_args))))
             # print("Method {}({}) running...".format(callee, (actual_caller, actual_args)))
             ret = callee(actual_caller, actual_args)
-            self.log.debug("{}({})".format(callee, actual_args))
+            if _trace.on:
+                _trace("{}({})", callee, actual_args)
             # print("done.")
             return ret
         except NetworkScriptInterruptionException as ex:
             raise ex
         except Exception as ex:
-            if is_traceback():
-                self.log.debug("Tracebacking...")
-                self.log.debug(traceback.format_exc())
-            raise NetworkError("{}{}({}, {}) call failed.".format(type(self), self, caller, args), ex)
+            raise self.call_failed(caller, args, ex)
         finally:
             break_info = caller.break_point
             if not self.cancel_stacking and not isinstance(caller, NetworkClassInstance):
                 caller.pop_stack(caller, stack_id)
-            st = caller.deepest_stack_id(caller)
-            self.log.debug("**** POST STACK[{}] VARS:{}".format(st, caller.get_stack(caller, st)[caller.VARS]))
+            if _trace.on:
+                st = caller.deepest_stack_id(caller)
+                _trace("**** POST STACK[{}] VARS:{}", st, caller.get_stack(caller, st)[caller.VARS])
             if report_break_point:
                 caller.set_break_point(caller, break_info)
 
+    def call_failed(self, caller, args, ex):
+        if _trace.on and is_traceback():
+            _trace("Tracebacking...\n{}", traceback.format_exc())
+        return NetworkError("{}{}({}, {}) call failed.".format(type(self), self, caller, args), ex)
+
     def pre_call_impl(self, caller, args):
         # sub class must implement this method.
         raise NetworkNotImplementationError("{}.pre_call_impl not implemented.".format(self))
 
+    @staticmethod
+    def compile_statement(stmt):
+        # callable running stmt with a caller: its closure, or stmt itself to be tree-walked.
+        if NetworkBaseCallable.CompileStatements and isinstance(stmt, NetworkBaseCallable):
+            return stmt.compiled()
+        return stmt
+
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = self.compile()
+        return self._compiled
+
+    def recompile(self):
+        self._compiled = None
+
+    def compile(self):
+        # sub classes lower themselves into a closure taking the caller.
+        # statements without one are tree-walked.
+        return self
+
+    def guard(self, impl):
+        # what __call__ does around call_impl for statements, which never stack and are called without args.
+        def run(caller):
+            if not caller.running:
+                raise NetworkScriptInterruptionException("script interrupted")
+            try:
+                return impl(caller)
+            except NetworkScriptInterruptionException as ex:
+                raise ex
+            except Exception as ex:
+                raise self.call_failed(caller, (), ex)
+        return run
+
+    @staticmethod
+    def compile_operand(a, holder_first=False):
+        # getter of an argument value, what args_impl does for it on every call, dispatched once.
+        if isinstance(a, NetworkInstance):
+            return lambda caller: a
+        elif isinstance(a, NetworkSymbol):
+            name = a.hierarchical_name
+            return lambda caller: caller.accessor.get(caller, name)
+        elif isinstance(a, NetworkCallable):
+            return NetworkBaseCallable.compile_statement(a)
+        elif holder_first and isinstance(a, GenericValueHolder):
+            return lambda caller: a.value
+        elif isinstance(a, GenericEvaluatee):
+            return lambda caller: a.evaluate(caller)
+        elif isinstance(a, GenericValueHolder):
+            return lambda caller: a.value
+        else:
+            return lambda caller: a
+
 
 class NetworkCallable(NetworkBaseCallable, GenericCallable):
 
@@ -991,7 +1112,7 @@ class NetworkCallable(NetworkBaseCallable, GenericCallable):
             if isinstance(a, NetworkInstance):
                 x = a
             elif isinstance(a, NetworkSymbol):
-                x = caller.accessor.get(caller, a.symbol)
+                x = caller.accessor.get(caller, a)
             elif isinstance(a, NetworkCallable):
                 x = a(caller)
             elif isinstance(a, GenericEvaluatee):
@@ -1154,6 +1275,7 @@ class NetworkMethod(NetworkCallable):
             self._globally = kwargs["globally"]
         for s in stmts:
             self._callees.append(s)
+        self._body = None
 
     @property
     def signature(self):
@@ -1206,27 +1328,37 @@ class NetworkMethod(NetworkCallable):
         return self._callees
 
     def append_callee(self, callee):
+        self._body = None
         return self._callees.append(callee)
 
+    @property
+    def body(self):
+        # callees lowered into closures, compiled on first call.
+        if not self.CompileStatements:
+            return self.callees
+        if self._body is None:
+            self._body = tuple(self.compile_statement(c) for c in self.callees)
+        return self._body
+
     def actual_call_impl(self, caller, args, **kwargs):
         rtn = None
-        for c in self.callees:
+        for c in self.body:
             rtn = c(caller)
             if isinstance(rtn, NetworkError):
-                self.log.debug("Error Captured.")
-                self.log.debug(rtn)
-                self.log.debug("resumed")
+                if _trace.on:
+                    _trace("Error Captured.\n{}\nresumed", rtn)
                 continue
             elif isinstance(rtn, NetworkReturnValue):
-                self.log.debug("Special dealing with:")
-                self.log.debug(rtn)
+                if _trace.on:
+                    _trace("Special dealing with:\n{}", rtn)
                 continue
             if caller.break_point is not None:
                 caller.set_break_point(caller, None)
-                self.log.debug("caller.break_point: {0}".format(caller.break_point))
+                if _trace.on:
+                    _trace("caller.break_point: {0}", caller.break_point)
                 if isinstance(rtn, NetworkReturnValue):
-                    self.log.debug("Exception occurred, but safely resumed.")
-                    self.log.debug(rtn)
+                    if _trace.on:
+                        _trace("Exception occurred, but safely resumed.\n{}", rtn)
                     return rtn.reasons
                 elif isinstance(rtn, GenericValueHolder):
                     return rtn.value
@@ -1254,14 +1386,14 @@ class NetworkMethod(NetworkCallable):
         is_callable = self.callable
         if is_callable is not None and not is_callable:
             raise NetworkError("{}.{} is not in callable state.".format(self.clazz, self.signature))
-        if is_callable is None:
-            self.log.debug("Cannot analyze argumenet for {}.{}() ".format(self.owner, self.signature))
+        if is_callable is None and _trace.on:
+            _trace("Cannot analyze argumenet for {}.{}() ", self.owner, self.signature)
         if self.safe_call:
             try:
                 return self.actual_call_impl(caller, args)
             except Exception as ex:
-                self.log.debug("Internal Error occurred, but safely resumed.")
-                self.log.debug(ex)
+                if _trace.on:
+                    _trace("Internal Error occurred, but safely resumed.\n{}", ex)
                 return self.actual_call_impl(caller, args)
         else:
             return self.actual_call_impl(caller, args)
@@ -1306,6 +1438,67 @@ class NetworkMethod(NetworkCallable):
 #         pass
 
 
+class StackFrame(object):
+    """
+    A frame of NetworkInstance's stack.
+
+    Frames are pushed for every method call, so they are kept small: variables in a dict,
+    method and class dicts created when something is registered in them.
+    frame[VARS], frame[METHODS], frame[CLASSES] and frame[BREAK_POINT] still work as on the dicts
+    frames used to be.
+    """
+
+    __slots__ = ("_vars", "_methods", "_classes", "break_point")
+
+    VARS = "vars"
+    METHODS = "methods"
+    CLASSES = "classes"
+    BREAK_POINT = "break_point"
+
+    # order in which names of a frame are looked up
+    Kinds = (VARS, METHODS, CLASSES)
+
+    def __init__(self):
+        self._vars = {}
+        self._methods = None
+        self._classes = None
+        self.break_point = None
+
+    def table(self, kind):
+        # names of the kind, None if nothing has been registered.
+        if kind == self.VARS:
+            return self._vars
+        elif kind == self.METHODS:
+            return self._methods
+        elif kind == self.CLASSES:
+            return self._classes
+        raise NetworkReferenceError("Illegal stack frame kind:{}".format(kind))
+
+    def writable(self, kind):
+        if kind == self.METHODS:
+            if self._methods is None:
+                self._methods = {}
+            return self._methods
+        elif kind == self.CLASSES:
+            if self._classes is None:
+                self._classes = {}
+            return self._classes
+        return self.table(kind)
+
+    def keys(self):
+        return self.Kinds + (self.BREAK_POINT,)
+
+    def __getitem__(self, kind):
+        if kind == self.BREAK_POINT:
+            return self.break_point
+        return self.writable(kind)
+
+    def __setitem__(self, kind, value):
+        if kind != self.BREAK_POINT:
+            raise NetworkReferenceError("Stack frame kind {} can't be replaced.".format(kind))
+        self.break_point = value
+
+
 class NetworkInstance(NetworkComponent, NetworkDocumentable):
 
     log = log4p.GetLogger(logger_name=__name__, config=config.get_log_config()).logger
@@ -1315,16 +1508,23 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
     PROTECTED = "protected"
     EMBEDDED = "embedded"
     STACK = "stack"
-    VARS = "vars"
-    METHODS = "methods"
-    CLASSES = "classes"
-    BREAK_POINT = "break_point"
+    VARS = StackFrame.VARS
+    METHODS = StackFrame.METHODS
+    CLASSES = StackFrame.CLASSES
+    BREAK_POINT = StackFrame.BREAK_POINT
 
     SELF = "$self"
     GENERATOR = "$generator"
     MANAGER = "$manager"
     OWNER = "$manager"
 
+    # get_method() results are cached per instance, keyed by the caller (whose identity decides
+    # its accessibility at every level of the class chain) and the signature. An entry is valid
+    # while this counter, shared by all instances, is unchanged. It is bumped by everything
+    # get_method() depends on: areas' attributes, methods and classes of stack frames,
+    # and popping frames holding methods.
+    _method_version = 0
+
     def __init__(self, clazz, _id, owner, embedded=(), *args, **kwargs):
         super().__init__(owner)
         # Attribute area.
@@ -1332,10 +1532,7 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
                             self.PRIVATE: {},
                             self.PUBLIC: {},
                             self.PROTECTED: {},
-                            self.STACK: [{self.VARS: {},
-                                          self.METHODS: {},
-                                          self.CLASSES: {},
-                                          self.BREAK_POINT: None}]}
+                            self.STACK: [StackFrame()]}
         #
         # Private attributes setting. Basically, object itself can access.
         self._attributes[self.PRIVATE][self.SELF] = self
@@ -1364,6 +1561,7 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
         # FIXME accessor implementation should be dynamically changable.
         self._accessor = HierarchicalAccessor(self)
         self._enable_stack = False
+        self._method_cache = {}
         #
         # FIXME document managing feature is pended for further consideration.
         self._document = NetworkDocument(self)
@@ -1395,30 +1593,61 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
                     att += "  {}\n".format(m)
         return att
 
+    # Caution! This method is internal method. Never call from other class scope.
+    def _iter_accessible_attributes(self, args=(), names=(), stack_criteria=None):
+        # (name, value) in order of priority: areas in order of args, stack frames from the deepest.
+        # names are looked up in each dict, so a local is found at the first frame probed.
+        for ac in args:
+            if ac == self.STACK:
+                kinds = [c for c in StackFrame.Kinds if stack_criteria is None or c in stack_criteria]
+                stacks = self._attributes[self.STACK]
+                for i in range(len(stacks)-1, -1, -1):
+                    for c in kinds:
+                        table = stacks[i].table(c)
+                        if table is None:
+                            continue
+                        if names is None:
+                            yield from list(table.items())
+                        else:
+                            for k in names:
+                                if k in table:
+                                    yield k, table[k]
+            elif ac in self._attributes.keys():
+                table = self._attributes[ac]
+                if names is None:
+                    yield from list(table.items())
+                else:
+                    for n in names:
+                        if n in table:
+                            yield n, table[n]
+            else:
+                print("ERROR!!! ILLEGAL ACCESS ATTEMPTED!")
+
     # Caution! This method is internal method. Never call from other class scope.
     def _accessible_attributes(self, args=(), names=(), stack_criteria=None):
-        acc = []
+        return tuple(self._iter_accessible_attributes(args, names, stack_criteria))
+
+    # Caution! This method is internal method. Never call from other class scope.
+    def _first_accessible_attribute(self, args=(), name=None, stack_criteria=None):
+        # (name, value) of the most prior attribute, None if not found.
+        # same as the first of _iter_accessible_attributes(), but for one name and without a generator.
         for ac in args:
             if ac == self.STACK:
                 stacks = self._attributes[self.STACK]
-                i = len(stacks)-1
-                while 0 <= i:
-                    for c in stacks[i].keys():
+                for i in range(len(stacks)-1, -1, -1):
+                    for c in StackFrame.Kinds:
                         if stack_criteria is not None and c not in stack_criteria:
                             continue
-                        if c == self.BREAK_POINT:
-                            continue
-                        for k in stacks[i][c].keys():
-                            if names is None or k in names:
-                                acc.append((k, stacks[i][c][k]))
-                    i = i-1
+                        table = stacks[i].table(c)
+                        if table is not None and name in table:
+                            return name, table[name]
             elif ac in self._attributes.keys():
-                for n in self._attributes[ac].keys():
-                    if names is None or n in names:
-                        acc.append((n, self._attributes[ac][n]))
+                table = self._attributes[ac]
+                if name in table:
+                    return name, table[name]
             else:
                 print("ERROR!!! ILLEGAL ACCESS ATTEMPTED!")
-        return tuple(acc)
+        return None
 
     # Caution! This method is internal method. Never call from other class scope.
     def _get_accessible_attributes(self, prior=(), names=()):
@@ -1461,14 +1690,15 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
         for a in acc:
             if a in security:
                 _acc.append(a)
-        att = self._accessible_attributes(_acc, names=[name])
-        return len(att) != 0
+        return self._first_accessible_attribute(_acc, name) is not None
 
     # This method is public accessible.
     def get_accessible_attribute(self, caller, name):
         acc = self._get_accessibilities(caller)
-        att = self._get_accessible_attributes(acc, names=[name])
-        return att[0][1]
+        att = self._first_accessible_attribute(acc, name)
+        if att is None:
+            raise IndexError("attribute {} not found.".format(name))
+        return att[1]
 
     # This method is public accessible.
     def get_accessible_attributes(self, caller, name, identfier=None):
@@ -1507,6 +1737,8 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
             t = self.CLASSES
         else:
             t = self.VARS
+        if kind != self.STACK or t != self.VARS:
+            self.invalidate_methods()
         if kind in (self.PRIVATE, self.PROTECTED, self.PUBLIC):
             if overwrite is None:
                 self._attributes[kind][name] = val
@@ -1526,16 +1758,17 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
             if depth is None:
                 depth = self._deepest_stack_id()
             if overwrite is None:
-                self._attributes[kind][depth][t][name] = val
+                self._attributes[kind][depth].writable(t)[name] = val
                 return
             while 0 <= depth:
-                if name not in self._attributes[kind][depth][t].keys():
+                table = self._attributes[kind][depth].table(t)
+                if table is None or name not in table:
                     if not overwrite:
-                        self._attributes[kind][depth][t][name] = val
+                        self._attributes[kind][depth].writable(t)[name] = val
                         return
                 else:
                     if overwrite:
-                        self._attributes[kind][depth][t][name] = val
+                        table[name] = val
                         return
                     else:
                         # FIXME prohibition should be adequately notified.
@@ -1552,6 +1785,8 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
             t = self.CLASSES
         else:
             t = self.VARS
+        if kind != self.STACK or t != self.VARS:
+            self.invalidate_methods()
         if kind in (self.PRIVATE, self.PROTECTED, self.PUBLIC):
             if name in self._attributes[kind].keys():
                 self._attributes[kind].pop(name)
@@ -1559,8 +1794,9 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
             if depth is None:
                 depth = self._deepest_stack_id()
             while 0 <= depth:
-                if name in self._attributes[kind][depth][t].keys():
-                    self._attributes[kind][depth][t].pop(name)
+                table = self._attributes[kind][depth].table(t)
+                if table is not None and name in table:
+                    table.pop(name)
                 depth = depth - 1
         # FIXME prohibition should be adequately notified.
         raise NetworkError("Illegal attempt to remove attribute. Not set yet.")
@@ -1684,7 +1920,7 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
         # self.log.debug("*** CALLER {0} {1}".format(type(caller), caller))
         # self.log.debug("*** Searching CALLABLE_ATTRIBUTE")
         weakest_acc = self._get_accessibilities(caller)
-        att = self._accessible_attributes(weakest_acc, names=[sig], stack_criteria=(self.VARS, self.CLASSES))
+        att = self._iter_accessible_attributes(weakest_acc, names=(sig,), stack_criteria=(self.VARS, self.CLASSES))
         for a in att:
             if isinstance(a[1], NetworkCallable):
                 return a[1]
@@ -1695,13 +1931,30 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
         #             return a[1]
         return None
 
+    @staticmethod
+    def invalidate_methods():
+        NetworkInstance._method_version += 1
+
     def get_method(self, caller, sig):
+        if not isinstance(caller, NetworkInstance):
+            return self.resolve_method(caller, sig)
+        # read before resolving, so that a change meanwhile leaves the entry invalid.
+        version = NetworkInstance._method_version
+        key = (id(caller), sig)
+        entry = self._method_cache.get(key)
+        if entry is not None and entry[0] == version and entry[1]() is caller:
+            return entry[2]
+        m = self.resolve_method(caller, sig)
+        self._method_cache[key] = (version, weakref.ref(caller), m)
+        return m
+
+    def resolve_method(self, caller, sig):
         # This method is opened method, so basically arrows access to registered method, not callable variable.
         # search in secured area.
         weakest_acc = self._get_accessibilities(caller)
-        att = self._accessible_attributes(weakest_acc, names=[sig], stack_criteria=[self.METHODS])
-        if len(att) != 0:
-            return att[0][1]
+        att = self._first_accessible_attribute(weakest_acc, sig, stack_criteria=[self.METHODS])
+        if att is not None:
+            return att[1]
         # if self.STACK in weakest_acc:
         #     att = self._accessible_attributes([self.STACK], names=[sig], stack_criteria=[self.METHODS])
         #     if len(att) != 0:
@@ -1726,9 +1979,9 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
         # FIXME consider class hierarchy and security
         weakest_acc = self._get_accessibilities(caller)
         if self.STACK in weakest_acc:
-            att = self._accessible_attributes([self.STACK], names=[sig], stack_criteria=[self.CLASSES])
-            if len(att) != 0:
-                return att[0][1]
+            att = self._first_accessible_attribute([self.STACK], sig, stack_criteria=[self.CLASSES])
+            if att is not None:
+                return att[1]
         # att = self.get_accessible_attribute(caller, sig)
         # if att is not None:
         #     if isinstance(att, NetworkClassInstance):
@@ -1794,8 +2047,7 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
         return self._get_stack(depth)
 
     def _push_stack(self):
-        frame = {self.VARS: {}, self.METHODS: {}, self.CLASSES: {}, self.BREAK_POINT: None}
-        self._attributes[self.STACK].append(frame)
+        self._attributes[self.STACK].append(StackFrame())
         return len(self._attributes[self.STACK])-1
 
     def push_stack(self, caller):
@@ -1809,7 +2061,9 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
             if self._deepest_stack_id() == 0:
                 print("**** ILLEGAL _POP_STACK() ATTEMPTED!!!")
                 return
-            self._attributes[self.STACK] = self._attributes[self.STACK][0:stack_id]
+            if any(frame.table(self.METHODS) for frame in self._attributes[self.STACK][stack_id:]):
+                self.invalidate_methods()
+            del self._attributes[self.STACK][stack_id:]
 
     def pop_stack(self, caller, stack_id=None):
         # FIXME check accessibility.
@@ -1985,12 +2239,11 @@ class NetworkInstance(NetworkComponent, NetworkDocumentable):
 
     @property
     def break_point(self):
-        return self.get_stack(self)[self.BREAK_POINT]
+        return self._get_stack().break_point
         # return self.context["break_point"]
 
     def set_break_point(self, caller, break_info):
-        stack = self.get_stack(caller)
-        stack[self.BREAK_POINT] = break_info
+        self._get_stack().break_point = break_info
         # self.context["break_point"] = break_info
 
     # def managing_methods(self):
@@ -2083,13 +2336,22 @@ class NetworkSymbol(UnaryEvaluatee):
     def __init__(self, owner, symbol):
         super().__init__(owner, symbol, symbol, as_symbol=True)
         self._symbol = symbol
+        self._hierarchical_name = None
 
     @property
     def symbol(self):
         return self._evaluatees[0]
 
+    @property
+    def hierarchical_name(self):
+        if self._hierarchical_name is None:
+            self._hierarchical_name = HierarchicalName.of(self.symbol)
+        return self._hierarchical_name
+
     def set_symbol(self, sym):
         self._evaluatees[0] = sym
+        self._hierarchical_name = None
+        self.invalidate_predicate()
 
     def evaluate(self, caller=None):
         return super().evaluate(caller)
@@ -2199,12 +2461,12 @@ class NetworkClassInstance(NetworkInstance, NetworkCallable):
     def declare_method(self, method, globally=True):
         super().declare_method(method, globally=globally)
 
-    def get_method(self, caller, sig):
+    def resolve_method(self, caller, sig):
         # FIXME consider class hierarchy and security
         weakest_acc = self._get_accessibilities(caller)
-        att = self._accessible_attributes(weakest_acc, names=[sig], stack_criteria=[self.METHODS])
-        if len(att) != 0:
-            return att[0][1]
+        att = self._first_accessible_attribute(weakest_acc, sig, stack_criteria=[self.METHODS])
+        if att is not None:
+            return att[1]
         # m = super().get_method(caller, sig)
         # if m is not None:
         #     return m
@@ -2377,34 +2639,45 @@ class NetworkNothing(NetworkError):
         super().__init__(args)
 
 
-class HierarchicalAccessor(NetworkComponent):
+class HierarchicalName(object):
+    """
+    A reference like 'first.middle.last[0]["key"][i]', split once.
 
-    log = log4p.GetLogger(logger_name=__name__, config=config.get_log_config()).logger
+    Symbols of scripts carry their split names, names given as strings are split through a bounded
+    cache, so the accessor doesn't match regexes on every get/set. Symbolic indices are variables,
+    they are looked up on each access. An invalid name raises when accessed, as it did before.
+    """
 
-    def __init__(self, owner=None):
-        super().__init__(owner)
+    __slots__ = ("_name", "_first_name", "_middle_names", "_last_name", "_indices", "_symbolic", "_error")
 
-    # def separate_name(self, caller, name):
-    #     return self._separate_name(caller, name)
-    #
+    #sympat = r"\s*(?P<symbol>(\$|)[a-zA-Z_]+([a-zAZ0-9_\$]*[a-zAZ0-9]+)*)\s*"
+    #sympat = r"(?P<symbol>(\$|)[a-zA-Z_]+[a-zAZ0-9_\$]*(|[a-zA-Z_]+[a-zAZ0-9_]*|\[(\"[^\"]*\"|[0-9]+)\]))"
+    SymbolPattern = re.compile(r"(?P<symbol>(\$|)[a-zA-Z_]+[a-zAZ0-9_\$]*)")
+    IndexPattern = re.compile(r"^\s*\[\s*((?P<number>\d+)|(?P<literal>(\"[^\"]+\"|'[^']+'))|(?P<symbol>[a-zA-Z_]+([a-zAZ0-9_]*[a-zAZ0-9]+)*))\s*\]")
 
-    def _separate_name(self, caller, name):
-        if isinstance(name, NetworkSymbol):
-            name = name.symbol
+    # number of string names kept split
+    CacheSize = 4096
+
+    def __init__(self, name):
+        self._name = name
+        self._first_name = None
+        self._middle_names = ()
+        self._last_name = None
+        self._indices = ()
+        self._symbolic = ()
+        self._error = None
         names = name.split(".")
         last_segment = names[len(names)-1]
-        #sympat = r"\s*(?P<symbol>(\$|)[a-zA-Z_]+([a-zAZ0-9_\$]*[a-zAZ0-9]+)*)\s*"
-        #sympat = r"(?P<symbol>(\$|)[a-zA-Z_]+[a-zAZ0-9_\$]*(|[a-zA-Z_]+[a-zAZ0-9_]*|\[(\"[^\"]*\"|[0-9]+)\]))"
-        sympat = r"(?P<symbol>(\$|)[a-zA-Z_]+[a-zAZ0-9_\$]*)"
-        m = re.match(sympat, last_segment)
+        m = self.SymbolPattern.match(last_segment)
         if m is None:
-            raise NetworkReferenceError("Invalid reference format:{}".format(last_segment))
-        last_name = m.groupdict()['symbol']
+            self._error = (NetworkReferenceError, "Invalid reference format:{}".format(last_segment))
+            return
+        self._last_name = m.groupdict()['symbol']
         indices_segment = last_segment[m.span()[1]:]
         indices = []
-        idxpat = r"^\s*\[\s*((?P<number>\d+)|(?P<literal>(\"[^\"]+\"|'[^']+'))|(?P<symbol>[a-zA-Z_]+([a-zAZ0-9_]*[a-zAZ0-9]+)*))\s*\]"
+        symbolic = []
         while True:
-            m = re.match(idxpat, indices_segment)
+            m = self.IndexPattern.match(indices_segment)
             if m is None:
                 break
             num_idx = m.groupdict()['number']
@@ -2413,23 +2686,67 @@ class HierarchicalAccessor(NetworkComponent):
             if num_idx is not None and num_idx != "":
                 indices.append(int(num_idx))
             elif sym_idx is not None and sym_idx != "":
-                self.log.debug("****** sym_idx: {} {}".format(type(sym_idx), sym_idx))
-                sym_idx = caller.get_attribute(caller, sym_idx)
-                # sym_idx = caller.accessor.get(caller, sym_idx)
+                symbolic.append(len(indices))
                 indices.append(sym_idx)
             elif ltr_idx is not None and ltr_idx != "":
                 indices.append(ltr_idx)
             else:
-                raise NetworkNothing(name)
+                self._error = (NetworkNothing, name)
+                return
             indices_segment = indices_segment[m.span()[1]:]
-        if len(names) == 1:
-            first_name = None  # last_name
-            middle_names = ()
-            # last_name = None
-        else:
-            first_name = names[0]
-            middle_names = names[1:len(names)-1]
-        return first_name, middle_names, last_name, indices
+        self._indices = tuple(indices)
+        self._symbolic = tuple(symbolic)
+        if len(names) != 1:
+            self._first_name = names[0]
+            self._middle_names = tuple(names[1:len(names)-1])
+
+    @staticmethod
+    @functools.lru_cache(maxsize=CacheSize)
+    def parse(name):
+        return HierarchicalName(name)
+
+    @staticmethod
+    def of(name):
+        if isinstance(name, HierarchicalName):
+            return name
+        elif type(name) is str:
+            return HierarchicalName.parse(name)
+        return HierarchicalName(name)
+
+    @property
+    def name(self):
+        return self._name
+
+    def separate(self, caller):
+        # first name, middle names, last name and indices, with symbolic indices looked up in caller.
+        if self._error is not None:
+            raise self._error[0](self._error[1])
+        indices = self._indices
+        if len(self._symbolic) != 0:
+            indices = list(indices)
+            for i in self._symbolic:
+                indices[i] = caller.get_attribute(caller, indices[i])
+        return self._first_name, self._middle_names, self._last_name, indices
+
+    def __repr__(self):
+        return "{}".format(self._name)
+
+
+class HierarchicalAccessor(NetworkComponent):
+
+    log = log4p.GetLogger(logger_name=__name__, config=config.get_log_config()).logger
+
+    def __init__(self, owner=None):
+        super().__init__(owner)
+
+    # def separate_name(self, caller, name):
+    #     return self._separate_name(caller, name)
+    #
+
+    def _separate_name(self, caller, name):
+        if isinstance(name, NetworkSymbol):
+            name = name.hierarchical_name
+        return HierarchicalName.of(name).separate(caller)
 
     def get_indexed_value(self, caller, var, indices):
         for i in indices:
@@ -2438,6 +2755,8 @@ class HierarchicalAccessor(NetworkComponent):
                     raise NetworkReferenceError("Negative indexer {} assigned.".format(i))
                 if isinstance(var, GenericValueHolder):
                     var = var.value
+                if isinstance(var, QueryResult):
+                    var = var.materialize()
                 if not (isinstance(var, list) or isinstance(var, tuple)):
                     raise NetworkReferenceError("Unaccessible referee {} for index {}.".format(var, i))
                 var = var[i]
@@ -2454,6 +2773,7 @@ class HierarchicalAccessor(NetworkComponent):
             if isinstance(i, int):
                 if i < 0:
                     raise NetworkReferenceError("Negative indexer {} assigned.".format(i))
+                var = QueryResult.materialized(var)
                 if not isinstance(var, list):
                     raise NetworkReferenceError("Unaccessible referee {} for index {}.".format(var, i))
                 else:
@@ -2467,6 +2787,7 @@ class HierarchicalAccessor(NetworkComponent):
         if isinstance(i, int):
             if i < 0:
                 raise NetworkReferenceError("Negative indexer {} assigned.".format(i))
+            var = QueryResult.materialized(var)
             if not isinstance(var, list):
                 raise NetworkReferenceError("Unaccessible referee {} for index {}.".format(var, i))
             else:
@@ -2510,6 +2831,9 @@ class HierarchicalAccessor(NetworkComponent):
                 symbol = self.complex_name(names, ())
                 raise NetworkNothing("Couldn't access to {}.{} to get anyway.".format(obj, symbol))
         for j, i in enumerate(indices):
+            if isinstance(obj, QueryResult):
+                # indexing a query result materializes it.
+                obj = obj.materialize()
             if isinstance(i, str):
                 if (i[0] == "\"" and i[len(i) - 1] == "\"") or (i[0] == "'" and i[len(i) - 1] == "'"):
                     i = i[1:len(i) - 1]
@@ -2594,6 +2918,7 @@ class HierarchicalAccessor(NetworkComponent):
                 raise NetworkNothing("Couldn't access to {}.{} to set.".format(obj, symbol))
         if len(indices) != 0:
             for j, ix in enumerate(indices[:len(indices)-1]):
+                obj = QueryResult.materialized(obj)
                 if isinstance(ix, str):
                     if ix[0] == "\"" and ix[len(ix) - 1] == "\"":
                         ix = ix[1:len(ix) - 1]
@@ -2622,6 +2947,7 @@ class HierarchicalAccessor(NetworkComponent):
             #obj.set_attribute(obj, last_something, val)
             obj.set_attribute(caller, last_something, val, kind=security, globally=globally, overwrite=overwrite)
             return True
+        obj = QueryResult.materialized(obj)
         i = last_something
         if isinstance(i, str):
             if last_something[0] == "\"" and i[len(i) - 1] == "\"": # literal
@@ -2652,6 +2978,9 @@ class HierarchicalAccessor(NetworkComponent):
     def set(self, caller, hierarchical_name, val, security=NetworkInstance.STACK, globally=False,
             overwrite=None, value=True, method=False, clazz=False):
         original_caller = caller
+        # a query result is stored as its list, built now: the variable holds the elements of the
+        # graph at assignment, and errors of the query surface at the assignment.
+        val = QueryResult.materialized(val)
         first_name, middle_names, last_name, indices = self._separate_name(caller, hierarchical_name)
         ret = self._set_named_value(caller, first_name, middle_names, last_name, indices, val, security=security,
                                     globally=globally, overwrite=overwrite)
@@ -2692,7 +3021,9 @@ class NetworkMethodCaller(NetworkCallable):
 
     def pre_call_impl(self, caller, args):
         # This returns actual method, caller and args.
-        args = self.args_impl(caller, args)
+        return self.resolve_callee(caller, self.args_impl(caller, args))
+
+    def resolve_callee(self, caller, args):
         actual_caller = caller
         if self.is_default_method:
             holder = actual_caller
@@ -2720,6 +3051,16 @@ class NetworkMethodCaller(NetworkCallable):
             actual_args = args
         return callee, actual_caller, actual_args
 
+    def compile(self):
+        operands = tuple(self.compile_operand(a, holder_first=True) for a in self.args)
+
+        def impl(caller):
+            if not isinstance(caller, NetworkInstance):
+                raise NetworkError("Invalid caller {}.".format(caller))
+            callee, actual_caller, actual_args = self.resolve_callee(caller, tuple(o(caller) for o in operands))
+            return callee(actual_caller, actual_args)
+        return self.guard(impl)
+
     def args_impl(self, caller, args, **kwargs):
         if not isinstance(caller, NetworkInstance):
             raise NetworkError("Invalid caller {}.".format(caller))
@@ -2728,7 +3069,7 @@ class NetworkMethodCaller(NetworkCallable):
             if isinstance(a, NetworkInstance):
                 x = a
             elif isinstance(a, NetworkSymbol):
-                x = caller.accessor.get(caller, a.symbol)
+                x = caller.accessor.get(caller, a)
             elif isinstance(a, NetworkCallable):
                 x = a(caller)
             elif isinstance(a, GenericValueHolder):
@@ -2789,12 +3130,21 @@ class NetworkSubstituter(NetworkCallable):
             depth = 0
         else:
             depth = caller.deepest_stack_id(caller)
-        self.log.debug("##### {0} <-- {1}".format(self.var, args[0]))
+        if _trace.on:
+            _trace("##### {0} <-- {1}", self.var, args[0])
         #ret = caller.set_attribute(caller, self.var, args[0], depth=depth)
         caller.accessor.set(caller, self.var, args[0], security=self.security, globally=self.globally, overwrite=self.overwrite)
         # accessor.set(caller, self.var, args[0])
         # print("*** substituted", self.var, "of", caller, "<=", self.callee)
 
+    def compile(self):
+        operand = self.compile_operand(self.callee)
+        var, security, globally, overwrite = HierarchicalName.of(self.var), self.security, self.globally, self.overwrite
+
+        def impl(caller):
+            caller.accessor.set(caller, var, operand(caller), security=security, globally=globally, overwrite=overwrite)
+        return self.guard(impl)
+
     def args_impl(self, caller, args, **kwargs):
         # print("*** caller", caller, self.args)
         # do nothing, since no argument preparation have to be done here.
@@ -2816,6 +3166,11 @@ class NetworkBreak(NetworkCallable):
     def call_impl(self, caller, args, **kwargs):
         caller.set_break_point(caller, self.BREAK)
 
+    def compile(self):
+        def impl(caller):
+            caller.set_break_point(caller, self.BREAK)
+        return self.guard(impl)
+
     def args_impl(self, caller, args, **kwargs):
         return args
 
@@ -2842,15 +3197,33 @@ class NetworkReturn(NetworkCallable, GenericValueHolder):
         if isinstance(self.callee, NetworkCallable):
             a = self.callee(caller)
         elif isinstance(self.callee, NetworkSymbol):
-            a = accessor.get(caller, self.callee.symbol)
+            a = accessor.get(caller, self.callee)
         elif isinstance(self.callee, GenericValueHolder):
             a = self.callee.value
         else:
             a = self.callee
         caller.set_break_point(caller, self.RETURN)
-        self.log.debug("return {}".format(a))
+        if _trace.on:
+            _trace("return {}", a)
         return a
 
+    def compile(self):
+        callee = self.callee
+        if isinstance(callee, NetworkCallable):
+            operand = self.compile_statement(callee)
+        elif isinstance(callee, NetworkSymbol):
+            operand = self.compile_operand(callee)
+        elif isinstance(callee, GenericValueHolder):
+            operand = lambda caller: callee.value
+        else:
+            operand = lambda caller: callee
+
+        def impl(caller):
+            a = operand(caller)
+            caller.set_break_point(caller, self.RETURN)
+            return a
+        return self.guard(impl)
+
     def __repr__(self):
         return "return {};".format(self.callee)
 
@@ -2881,11 +3254,13 @@ class NetworkSequentialStatements(NetworkCallable):
 
     def set_statements(self, stmt):
         self._statements = tuple(stmt)
+        self.recompile()
 
     def append_statements(self, stmt):
         statements = list(self.statements)
         statements.append(stmt)
         self._statements = tuple(statements)
+        self.recompile()
 
     def call_impl(self, caller, args, **kwargs):
         rtn = None
@@ -2896,6 +3271,23 @@ class NetworkSequentialStatements(NetworkCallable):
                 return rtn
         return rtn
 
+    def compile_block(self, stmts):
+        # closure doing call_impl for stmts, without the checks of guard().
+        block = tuple(self.compile_statement(s) for s in stmts)
+
+        def run(caller):
+            rtn = None
+            for stmt in block:
+                rtn = stmt(caller)
+                if caller.break_point is not None:
+                    caller.set_break_point(caller, None)
+                    return rtn
+            return rtn
+        return run
+
+    def compile(self):
+        return self.guard(self.compile_block(self.statements))
+
     def __repr__(self):
         stmts = ""
         for s in self.statements:
@@ -2928,6 +3320,8 @@ class ForeachStatement(NetworkSequentialStatements):
         super().__init__(owner)
         self._var = var.symbol
         self._fetchee = fetchee.symbol
+        self._var_name = HierarchicalName.of(self._var)
+        self._fetchee_name = HierarchicalName.of(self._fetchee)
 
     @property
     def var(self):
@@ -2937,46 +3331,40 @@ class ForeachStatement(NetworkSequentialStatements):
     def fetchee(self):
         return self._fetchee
 
-    def fetch(self, caller):
-        accessor = caller.accessor
-        fetchee = accessor.get(caller, self.fetchee)
-        pos = accessor.get(caller, self.fetch_pos_name)
-        pos = pos + 1
-        accessor.set(caller, self.fetch_pos_name, pos)
-        if pos < len(fetchee):
-            accessor.set(caller, self.var, fetchee[pos])
-            return True
-        else:
-            return False
-
-    @property
-    def fetch_pos_name(self):
-        return "{}$pos".format(self.var)
-
-    def prepare(self, caller):
-        try:
-            caller.accessor.set(caller, self.fetch_pos_name, -1)
-            return True
-        except NetworkReferenceError as ex:
-            debug("preparation failed in ForeachStatement.")
-            return False
+    def elements(self, caller):
+        # python iterator over the fetchee. the cursor lives in the running call, not in script variables,
+        # so lists, generators and lazy query results are all iterated without being copied.
+        return iter(caller.accessor.get(caller, self._fetchee_name))
 
     def call_impl(self, caller, args, **kwargs):
-        self.log.debug("*** call_impl with self={}, caller={}, args={}".format(self, caller, args))
+        if _trace.on:
+            _trace("*** call_impl with self={}, caller={}, args={}", self, caller, args)
+        accessor = caller.accessor
+        var_name = self._var_name
         rtn = None
-        while self.fetch(caller):
+        for value in self.elements(caller):
+            accessor.set(caller, var_name, value)
             rtn = super().call_impl(caller, args)
             if caller.break_point is not None:
                 caller.set_break_point(caller, None)
                 break
         return rtn
 
-    def args_impl(self, caller, args, **kwargs):
-        # self.log.debug("*** args_impl with self={}, caller={}, args={}".format(self, caller, args))
-        if not self.prepare(caller):
-            rtn = NetworkReturnValue(caller, False, "fetching from {} failed.".format(self.fetchee))
+    def compile(self):
+        block = self.compile_block(self.statements)
+        var_name = self._var_name
+
+        def impl(caller):
+            accessor = caller.accessor
+            rtn = None
+            for value in self.elements(caller):
+                accessor.set(caller, var_name, value)
+                rtn = block(caller)
+                if caller.break_point is not None:
+                    caller.set_break_point(caller, None)
+                    break
             return rtn
-        return args
+        return self.guard(impl)
 
     def __repr__(self):
         return "for({}:{})...".format(self.var, self.fetchee)
@@ -2990,15 +3378,20 @@ class ForallStatement(ForeachStatement):
         super().__init__(owner, var, fetchee)
 
     def call_impl(self, caller, args, **kwargs):
-        self.log.debug("*** call_impl with self={}, caller={}, args={}".format(self, caller, args))
-        while self.fetch(caller):
-            stmt = self.statements[0]
-            rtn = stmt.evaluate(caller)
-            # rtn = super().call_impl(caller, args)
-            if not rtn:
+        if _trace.on:
+            _trace("*** call_impl with self={}, caller={}, args={}", self, caller, args)
+        # stops at the first element failing the condition; the rest is never fetched.
+        accessor = caller.accessor
+        stmt = self.statements[0]
+        for value in self.elements(caller):
+            accessor.set(caller, self._var_name, value)
+            if not stmt.evaluate(caller):
                 return False
         return True
 
+    def compile(self):
+        return self
+
     def __repr__(self):
         return "forall {} in {}: ...".format(self.var, self.fetchee)
         #return "forall {} in {}: {}".format(self.var, self.fetchee, self.statements)
@@ -3012,14 +3405,20 @@ class ExistsStatement(ForeachStatement):
         super().__init__(owner, var, fetchee)
 
     def call_impl(self, caller, args, **kwargs):
-        self.log.debug("*** call_impl with self={}, caller={}, args={}".format(self, caller, args))
-        while self.fetch(caller):
-            stmt = self.statements[0]
-            rtn = stmt.evaluate(caller)
-            if rtn:
+        if _trace.on:
+            _trace("*** call_impl with self={}, caller={}, args={}", self, caller, args)
+        # stops at the first element satisfying the condition.
+        accessor = caller.accessor
+        stmt = self.statements[0]
+        for value in self.elements(caller):
+            accessor.set(caller, self._var_name, value)
+            if stmt.evaluate(caller):
                 return True
         return False
 
+    def compile(self):
+        return self
+
     def __repr__(self):
         return "exists {} in {}: ...".format(self.var, self.fetchee)
         #return "exists {} in {}: {}".format(self.var, self.fetchee, self.statements)
@@ -3047,6 +3446,20 @@ class WhileStatement(NetworkSequentialStatements):
                 break
         return rtn
 
+    def compile(self):
+        condition = self.condition
+        block = self.compile_block(self.statements)
+
+        def impl(caller):
+            rtn = None
+            while condition.evaluate(caller):
+                rtn = block(caller)
+                if caller.break_point is not None:
+                    caller.set_break_point(caller, None)
+                    break
+            return rtn
+        return self.guard(impl)
+
     def __repr__(self):
         return "while(..){..}"
         #return "while({}){}".format(self._cond, self.statements)
@@ -3085,6 +3498,18 @@ class IfElifElseStatement(NetworkSequentialStatements):
             self.append_statements(statements)
             self._closed = True
 
+    def compile(self):
+        if not all(type(stmts) is list or type(stmts) is tuple for stmts in self.statements):
+            return self
+        branches = tuple((cond, self.compile_block(stmts)) for cond, stmts in zip(self.conditions, self.statements))
+
+        def impl(caller):
+            for cond, block in branches:
+                if cond.evaluate(caller):
+                    return block(caller)
+            return None
+        return self.guard(impl)
+
     def call_impl(self, caller, args, **kwargs):
         rtn = None
         for cond, stmt in zip(self.conditions, self.statements):
@@ -431,7 +431,7 @@ def main(args):
     server_config = config['nmlserver-config']
     S = SpecificationWorld(None, networkml_config)
     if "default-model" in server_config.keys():
-        S.N.load(S, server_config['default-model'])
+        S.N.load(S, server_config['default-model'], mapped=server_config.get('mapped-model', True))
     S.start_server()
 
     # main loop
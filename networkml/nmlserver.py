@@ -9,7 +9,7 @@ import re
 import traceback
 from networkml.genericutils import *
 from networkml.networkml import SpecificationWorld
-from networkml.generic import debug, set_debug
+from networkml.generic import debug, set_debug, set_trace, traces
 from networkml import admin
 import log4p
 
@@ -28,6 +28,10 @@ available commands:
     $console> join <join-name> <generator-class>
     $console> plugin-reload <plugin-name>
     $console> debug True|False
+    $console> trace [<module>|all True|False]
+
+'debug' also switches the request protocol steps of networkml.server; 'trace networkml.server True'
+shows them while debug is off.
 """
 
 
@@ -90,7 +94,18 @@ def interpret(S, script_sequence):
             continue
         elif cmd == 'debug':
             if len(args) >= 1:
-                set_debug(bool(args[0]))
+                set_debug(args[0] in ("True", "true", "1", "on"))
+            else:
+                print("Wrong argument.")
+                print("See help.")
+                print("")
+            continue
+        elif cmd == 'trace':
+            if len(args) == 0:
+                for name, on in sorted(traces().items()):
+                    print("  {} {}".format(name, on))
+            elif len(args) >= 2:
+                set_trace(args[0], args[1] in ("True", "true", "1", "on"))
             else:
                 print("Wrong argument.")
                 print("See help.")
@@ -158,11 +173,15 @@ def main(args):
     # apply config to environment.
     if "debug" in server_config.keys():
         set_debug(server_config['debug'])
+    if "trace" in server_config.keys():
+        for name in server_config['trace']:
+            set_trace(name, True)
 
     S = SpecificationWorld(None, networkml_config)
     S.setup()
+    # a *.nmlg model is mapped read-only, shared with other servers on the host, unless mapped-model is false.
     if "default-model" in server_config.keys():
-        S.N.load(S, server_config['default-model'])
+        S.N.load(S, server_config['default-model'], mapped=server_config.get('mapped-model', True))
     S.start_server()  # async=server_config["async"])
 
     # main loop
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+
+# set algebra over script values.
+#
+# elements are compared through hash_key(), so lists (projected rows) and dicts (attributes of
+# with-data results) take part like tuples. with n and m the sizes of the operands, on average:
+#   membership, add, discard                    O(1)
+#   union, intersection, difference, minus      O(n + m)
+#   project                                     O(n * k) for k selected columns
+#   iteration                                   O(n), in insertion order
+#   indexing OrderedSet[i]                      O(n), it is a set, not a list
+
+
+def hash_key(x):
+    # hashable stand-in for x, equal for equal values.
+    if isinstance(x, (list, tuple)):
+        return tuple(hash_key(e) for e in x)
+    if isinstance(x, dict):
+        return "dict", tuple((k, hash_key(v)) for k, v in x.items())
+    if isinstance(x, (set, frozenset)):
+        return frozenset(hash_key(e) for e in x)
+    if isinstance(x, OrderedSet):
+        return frozenset(x.keys())
+    return x
+
+
+def key_set(elements):
+    if isinstance(elements, OrderedSet):
+        return elements.keys()
+    return set(hash_key(e) for e in elements)
+
+
+def ordered_union(U, V):
+    # elements of U, then those of V, each value once.
+    seen = set()
+    for x in (U, V):
+        for e in x:
+            k = hash_key(e)
+            if k not in seen:
+                seen.add(k)
+                yield e
+
+
+def ordered_intersection(U, V):
+    # elements of U found in V, in the order of U. duplicates in U are kept.
+    members = key_set(V)
+    for u in U:
+        if hash_key(u) in members:
+            yield u
+
+
+def ordered_difference(U, V):
+    # elements of U not found in V, in the order of U.
+    members = key_set(V)
+    for u in U:
+        if hash_key(u) not in members:
+            yield u
+
+
+def ordered_minus(U, V):
+    # U with one occurrence removed per element of V, like list.remove for each of V.
+    pending = Counter(hash_key(v) for v in V)
+    for u in U:
+        k = hash_key(u)
+        if pending[k] > 0:
+            pending[k] -= 1
+            continue
+        yield u
+
+
+def ordered_unique(U):
+    seen = set()
+    for u in U:
+        k = hash_key(u)
+        if k not in seen:
+            seen.add(k)
+            yield u
+
+
+class OrderedSet(object):
+    # insertion-ordered set of script values.
+
+    def __init__(self, elements=()):
+        self._items = {}
+        for e in elements:
+            self.add(e)
+
+    def keys(self):
+        return self._items.keys()
+
+    def add(self, e):
+        k = hash_key(e)
+        if k not in self._items:
+            self._items[k] = e
+
+    def discard(self, e):
+        self._items.pop(hash_key(e), None)
+
+    def remove(self, e):
+        del self._items[hash_key(e)]
+
+    def union(self, other):
+        return OrderedSet(ordered_union(self, other))
+
+    def intersection(self, other):
+        return OrderedSet(ordered_intersection(self, other))
+
+    def difference(self, other):
+        return OrderedSet(ordered_difference(self, other))
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __contains__(self, e):
+        return hash_key(e) in self._items
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return list(self._items.values())[index]
+
+    def __eq__(self, other):
+        if isinstance(other, OrderedSet):
+            return self._items.keys() == other.keys()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return OrderedSet, (list(self),)
+
+    def __repr__(self):
+        return "OrderedSet({})".format(list(self))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+
+class QueryResult(object):
+    # lazy result of a graph query (select_nodes, collect_edges, nodes_product, ...).
+    #
+    # nothing is computed when the query is made. the first pass over the result runs the query,
+    # so a result passed straight into another query, as in
+    #     cardinality(nodes_product(-l=select_nodes(...), -r=V))
+    # streams elements from one step to the next without building intermediate lists.
+    # a pass that runs to the end is kept: later passes, len() and 'in' read it instead of running
+    # the query again, and the result no longer follows changes of the graph. the result is
+    # materialized to a list when it is assigned to a variable, indexed or modified (U[0], U[1] = x,
+    # append(U, x), ...) or stored in the graph; from then on it behaves as that list.
+
+    def __init__(self, source, size=None):
+        # source: callable returning a fresh iterator over the elements, one call per pass.
+        # size: callable returning the number of elements without iterating, when that is cheap.
+        self._source = source
+        self._size = size
+        self._items = None
+
+    @staticmethod
+    def reiterable(elements):
+        # elements as something that can be iterated more than once. a query result runs its query
+        # on the first pass only.
+        if isinstance(elements, QueryResult) or iter(elements) is not elements:
+            return elements
+        return list(elements)
+
+    @staticmethod
+    def materialized(value):
+        # value to be stored: query results become their lists.
+        if isinstance(value, QueryResult):
+            return value.materialize()
+        return value
+
+    @property
+    def is_materialized(self):
+        return self._items is not None
+
+    def materialize(self):
+        if self._items is None:
+            self._items = list(self._source())
+        return self._items
+
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return self._first_pass()
+
+    def _first_pass(self):
+        items = []
+        for e in self._source():
+            items.append(e)
+            yield e
+        # a pass left early (a slice, bool()) keeps nothing.
+        if self._items is None:
+            self._items = items
+
+    def __len__(self):
+        if self._items is not None:
+            return len(self._items)
+        if self._size is not None:
+            return self._size()
+        return len(self.materialize())
+
+    def __bool__(self):
+        for _ in self:
+            return True
+        return False
+
+    def __contains__(self, x):
+        return x in self.materialize()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and self._items is None:
+            start, stop, step = index.start, index.stop, index.step
+            if (start is None or start >= 0) and (stop is None or stop >= 0) and (step is None or step > 0):
+                return QueryResult(lambda: itertools.islice(iter(self), start, stop, step))
+        return self.materialize()[index]
+
+    def __setitem__(self, index, value):
+        self.materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self.materialize()[index]
+
+    def __getattr__(self, name):
+        # list methods (append, pop, remove, sort, ...) modify the materialized list.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __add__(self, other):
+        other = QueryResult.reiterable(other)
+        return QueryResult(lambda: itertools.chain(self, other))
+
+    def __eq__(self, other):
+        if isinstance(other, QueryResult):
+            other = list(other)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # pickled (snapshots, messages) as the list it stands for.
+        return list, (list(self),)
+
+    def __repr__(self):
+        return repr(list(self))
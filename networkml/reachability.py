@@ -0,0 +1,937 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import numpy as np
+import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    # scipy is in the 'develop' extras. SparseMatrixBackend falls back to NumPy without it.
+    sparse = None
+
+from networkml.error import NetworkError, NetworkNotImplementationError
+from networkml.generic import GenericEvaluatee
+from networkml.network import ReachabilitySpecification, CommandOption
+from networkml.validator import MultiArityEvaluatee
+from networkml.generic import debug
+
+
+class ReachabilityBackend(object):
+    """
+    Expands a frontier (boolean array over dense node ids) by one step
+    along the adjacency of a single segment, i.e. edges satisfying the edge spec
+    whose destination satisfies the destination spec.
+    """
+
+    NAME = None
+
+    def __init__(self, size, indptr, indices):
+        self._size = size
+        self._indptr = indptr
+        self._indices = indices
+
+    @property
+    def size(self):
+        return self._size
+
+    def expand(self, frontier):
+        raise NetworkNotImplementationError("{}.expand not implemented.".format(self))
+
+
+class FrontierBackend(ReachabilityBackend):
+
+    NAME = "bitset"
+
+    def gather(self, frontier):
+        # (source, destination) of every edge leaving the frontier, as two aligned arrays
+        rows = np.flatnonzero(frontier)
+        starts = self._indptr[rows]
+        lengths = self._indptr[rows+1] - starts
+        total = int(lengths.sum())
+        # positions of all out-neighbours of the frontier rows in 'indices', without a python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return np.repeat(rows, lengths), self._indices[offsets]
+
+    def expand(self, frontier):
+        reached = np.zeros(self._size, dtype=bool)
+        _, dsts = self.gather(frontier)
+        reached[dsts] = True
+        return reached
+
+
+class SparseMatrixBackend(FrontierBackend):
+    """
+    Frontier expansion as a sparse matrix-vector product, reached = (A^T x) > 0.
+    A is the CSR adjacency of the segment. Without scipy the gather of FrontierBackend is used.
+    """
+
+    NAME = "sparse"
+
+    def __init__(self, size, indptr, indices):
+        super().__init__(size, indptr, indices)
+        self._matrix = None
+        if sparse is not None:
+            data = np.ones(len(indices), dtype=np.int32)
+            A = sparse.csr_matrix((data, indices, indptr), shape=(size, size))
+            self._matrix = A.T.tocsr()
+
+    @property
+    def scipy_enabled(self):
+        return self._matrix is not None
+
+    def expand(self, frontier):
+        if self._matrix is None:
+            return super().expand(frontier)
+        return self._matrix.dot(frontier.astype(np.int32)) > 0
+
+
+def expand_depths(backend, src, first_depth, maximum):
+    # one segment from first_depth on. Returns (depth, src, dst) per depth, dst is None if src is empty.
+    steps = []
+    for i in range(first_depth, maximum+1):
+        if not src.any():
+            steps.append((i, src, None))
+            break
+        dst = backend.expand(src)
+        steps.append((i, src, dst))
+        if not dst.any():  # stop here, forward disabled
+            break
+        src = dst
+    return steps
+
+
+class SegmentAdjacency(object):
+    """
+    Adjacency of one (edge spec, dst spec) pair as rows of dense ids.
+
+    Graph mutations only mark rows or destinations dirty. refresh() re-evaluates
+    the specs for those and reports which rows changed; the CSR handed to the backend
+    is rebuilt from the rows only when something changed.
+    """
+
+    def __init__(self, engine, edge_spec, dst_spec, dst_ok=None, rows=None):
+        self._engine = engine
+        self._edge_spec = edge_spec
+        self._dst_spec = dst_spec
+        self._edge_attrs = engine.referred_attrs(edge_spec)
+        self._dst_attrs = engine.referred_attrs(dst_spec)
+        self._P = engine.predicate(dst_spec)
+        self._Q = engine.predicate(edge_spec)
+        N = engine.graph.N
+        if dst_ok is None:
+            dst_ok = [bool(self._P(N.nodes[n])) for n in engine.node_list]
+        self._dst_ok = dst_ok
+        if rows is None:
+            rows = [self.evaluate_row(i) for i in range(engine.size)]
+        self._rows = rows
+        self._dirty_rows = set()
+        self._dirty_dst = set()
+        self._backend = None
+
+    def evaluate_row(self, i):
+        engine = self._engine
+        if not engine.alive(i):
+            return []
+        N = engine.graph.N
+        row = []
+        for v, keyed in N[engine.node(i)].items():
+            j = engine.id(v)
+            if not self._dst_ok[j]:
+                continue
+            for attrs in keyed.values():
+                if self._Q(attrs):
+                    row.append(j)
+                    break
+        return row
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def depends_on_node_attr(self, name):
+        return self._dst_attrs is None or name in self._dst_attrs
+
+    def depends_on_edge_attr(self, name):
+        return self._edge_attrs is None or name in self._edge_attrs
+
+    def grow(self):
+        self._dst_ok.append(False)
+        self._rows.append([])
+        self._dirty_dst.add(len(self._rows)-1)
+
+    def node_changed(self, i):
+        self._dirty_dst.add(i)
+
+    def row_changed(self, i):
+        self._dirty_rows.add(i)
+
+    def refresh(self):
+        engine = self._engine
+        N = engine.graph.N
+        for j in self._dirty_dst:
+            ok = engine.alive(j) and bool(self._P(N.nodes[engine.node(j)]))
+            if ok == self._dst_ok[j]:
+                continue
+            self._dst_ok[j] = ok
+            if engine.alive(j):
+                for u in N.pred[engine.node(j)]:
+                    self._dirty_rows.add(engine.id(u))
+        changed = []
+        for i in self._dirty_rows:
+            row = self.evaluate_row(i)
+            if sorted(row) != sorted(self._rows[i]):
+                self._rows[i] = row
+                changed.append(i)
+        self._dirty_rows = set()
+        self._dirty_dst = set()
+        if len(changed) > 0:
+            self._backend = None
+        return changed
+
+    @property
+    def backend(self) -> ReachabilityBackend:
+        if self._backend is None or self._backend.size != len(self._rows):
+            lengths = np.fromiter((len(r) for r in self._rows), dtype=np.int64, count=len(self._rows))
+            indptr = np.zeros(len(self._rows)+1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            indices = np.fromiter((j for r in self._rows for j in r), dtype=np.int64, count=int(indptr[-1]))
+            self._backend = self._engine.backend_class(len(self._rows), indptr, indices)
+        return self._backend
+
+
+class LoopbackIndex(object):
+    """
+    Strongly connected components of the subgraph filtered by a spec, i.e. the union of
+    the adjacencies of its segments.
+
+    Every component gets a bitmask of the segments whose source nodes it can reach over
+    at least one edge, propagated over the condensation from the sinks. Its own sources count
+    only if the component is cyclic (several nodes or a self-loop): depth d+1 of a segment
+    starts from the destinations of depth d, which would otherwise reach a source in zero steps.
+    Segment j loops back to segment i if a destination of j lies in a component whose mask
+    has bit i, so a query is a bit test.
+    """
+
+    def __init__(self, size, edges, sources, destinations):
+        self._size = size
+        G = nx.DiGraph()
+        G.add_nodes_from(range(size))
+        G.add_edges_from(edges)
+        C = nx.condensation(G)
+        component = np.array([C.graph["mapping"][i] for i in range(size)], dtype=np.int64)
+        own = [0 for _ in range(len(C))]
+        for seg_idx, mask in enumerate(sources):
+            for c in np.unique(component[mask]).tolist():
+                own[c] |= 1 << seg_idx
+        # closure: sources reached over zero or more edges, reach: over one or more.
+        closure = [0 for _ in range(len(C))]
+        reach = [0 for _ in range(len(C))]
+        for c in reversed(list(nx.topological_sort(C))):
+            members = C.nodes[c]["members"]
+            if len(members) > 1 or any(G.has_edge(n, n) for n in members):
+                reach[c] = own[c]
+            for d in C.successors(c):
+                reach[c] |= closure[d]
+            closure[c] = own[c] | reach[c]
+        self._loops = []
+        for mask in destinations:
+            bits = 0
+            for c in np.unique(component[mask]).tolist():
+                bits |= reach[c]
+            self._loops.append(bits)
+        self._components = len(C)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def components(self):
+        return self._components
+
+    def loops_back(self, j, i):
+        # segment indices are 0-based here
+        return (self._loops[j] >> i) & 1 == 1
+
+
+class WitnessIndex(object):
+    """
+    Witness paths of a constructed spec.
+
+    For every (segment, depth) the stored source frontier is expanded once more with
+    FrontierBackend.gather, recording for each destination its distance (edges from a
+    toplevel source) and a parent on a shortest path. Layers are computed on demand,
+    so only the (segment, depth) entries asked for and the ones before them are kept.
+
+    shortest() follows the parent pointers. paths() enumerates witnesses lazily in order
+    of length by a best-first search backwards from the targets. The recorded distance is
+    the exact remaining length, so no partial path is expanded that can't complete.
+    """
+
+    Unreached = np.iinfo(np.int64).max
+
+    # default bound of partial paths kept by paths()
+    DefaultMaxFrontier = 100000
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._size = engine.size
+        self._layers = {}      # (segment index, depth) -> (distance, parent) of destinations
+        self._boundaries = {}  # segment index -> (distance, depth of previous segment) of sources at depth 1
+        self._reverse = {}     # adjacency -> predecessors per node
+
+    @property
+    def size(self):
+        return self._size
+
+    def entry(self, seg_idx):
+        edge_dict = self._engine.spec.edge_dict
+        return edge_dict[sorted(edge_dict.keys())[seg_idx]]
+
+    def adjacency(self, seg_idx) -> SegmentAdjacency:
+        entry = self.entry(seg_idx)
+        return self._engine.adjacency(entry[ReachabilitySpecification.EDGE_SPEC],
+                                      entry[ReachabilitySpecification.DST_SPEC])
+
+    def depths(self, seg_idx):
+        # depths of a segment whose destinations are its eventual nodes
+        quantifier = self.entry(seg_idx)[ReachabilitySpecification.QUANTIFIER]
+        return [d for d in range(1, quantifier.maximum+1)
+                if quantifier.contains(d) and self._engine.has_depth(seg_idx, d)]
+
+    def reverse(self, seg_idx):
+        adjacency = self.adjacency(seg_idx)
+        if id(adjacency) not in self._reverse.keys():
+            preds = [[] for _ in range(self._size)]
+            for u, row in enumerate(adjacency.rows):
+                for v in row:
+                    preds[v].append(u)
+            self._reverse[id(adjacency)] = preds
+        return self._reverse[id(adjacency)]
+
+    def boundary(self, seg_idx):
+        if seg_idx not in self._boundaries.keys():
+            choice = np.zeros(self._size, dtype=np.int64)
+            if seg_idx == 0:
+                dist = np.where(self._engine.top_src, 0, self.Unreached)
+            else:
+                dist = np.full(self._size, self.Unreached, dtype=np.int64)
+                for d in self.depths(seg_idx-1):
+                    layer, _ = self.layer(seg_idx-1, d)
+                    shorter = layer < dist
+                    dist[shorter] = layer[shorter]
+                    choice[shorter] = d
+            self._boundaries[seg_idx] = (dist, choice)
+        return self._boundaries[seg_idx]
+
+    def source_distance(self, seg_idx, i):
+        if i == 1:
+            return self.boundary(seg_idx)[0]
+        return self.layer(seg_idx, i-1)[0]
+
+    def layer(self, seg_idx, i):
+        if (seg_idx, i) not in self._layers.keys():
+            src_dist = self.source_distance(seg_idx, i)
+            dist = np.full(self._size, self.Unreached, dtype=np.int64)
+            parent = np.full(self._size, -1, dtype=np.int64)
+            if self._engine.has_depth(seg_idx, i):
+                src = self._engine.src_mask(seg_idx, i)
+                rows, dsts = self.adjacency(seg_idx).backend.gather(src)
+                if len(dsts) > 0:
+                    candidate = src_dist[rows] + 1
+                    # the nearest parent of every destination: sort by (destination, distance), take firsts
+                    order = np.lexsort((candidate, dsts))
+                    sorted_dsts = dsts[order]
+                    first = order[np.concatenate(([True], sorted_dsts[1:] != sorted_dsts[:-1]))]
+                    dist[dsts[first]] = candidate[first]
+                    parent[dsts[first]] = rows[first]
+            self._layers[(seg_idx, i)] = (dist, parent)
+        return self._layers[(seg_idx, i)]
+
+    def shortest(self, seg_idx, i, target):
+        # shortest witness from a toplevel source to target, a destination of (seg_idx, i). None if unreached.
+        dist, _ = self.layer(seg_idx, i)
+        if dist[target] == self.Unreached:
+            return None
+        path = [target]
+        v = target
+        while True:
+            _, parent = self.layer(seg_idx, i)
+            v = int(parent[v])
+            path.append(v)
+            if i > 1:
+                i -= 1
+            elif seg_idx == 0:
+                break
+            else:
+                i = int(self.boundary(seg_idx)[1][v])
+                seg_idx -= 1
+        path.reverse()
+        return path
+
+    def paths(self, seg_idx, i, targets, max_paths=None, max_length=None, max_frontier=None):
+        # generator of witnesses (lists of dense ids) ending at targets, shortest first.
+        if max_frontier is None:
+            max_frontier = self.DefaultMaxFrontier
+        dist, _ = self.layer(seg_idx, i)
+        counter = itertools.count()
+        heap = []
+        # entries: (length bound, tie breaker, walked length, state, path)
+        # state: (segment, depth, node, node is a destination), path: linked (node, rest) up to the target
+        for t in targets:
+            if dist[t] != self.Unreached:
+                heapq.heappush(heap, (int(dist[t]), next(counter), 0, (seg_idx, i, t, True), (t, None)))
+        yielded = set()
+        while len(heap) > 0:
+            f, _, g, (s, d, v, is_dst), path = heapq.heappop(heap)
+            if max_length is not None and f > max_length:
+                return
+            if is_dst:
+                src_dist = self.source_distance(s, d)
+                src = self._engine.src_mask(s, d)
+                for u in self.reverse(s)[v]:
+                    if src[u] and src_dist[u] != self.Unreached:
+                        heapq.heappush(heap, (g+1+int(src_dist[u]), next(counter), g+1, (s, d, u, False), (u, path)))
+            elif d > 1:
+                layer, _ = self.layer(s, d-1)
+                heapq.heappush(heap, (g+int(layer[v]), next(counter), g, (s, d-1, v, True), path))
+            elif s == 0:
+                witness = []
+                while path is not None:
+                    witness.append(path[0])
+                    path = path[1]
+                # the same nodes may be split into segments differently
+                if tuple(witness) in yielded:
+                    continue
+                yielded.add(tuple(witness))
+                yield witness
+                if max_paths is not None and len(yielded) >= max_paths:
+                    return
+            else:
+                for e in self.depths(s-1):
+                    layer, _ = self.layer(s-1, e)
+                    if layer[v] != self.Unreached:
+                        heapq.heappush(heap, (g+int(layer[v]), next(counter), g, (s-1, e, v, True), path))
+            if len(heap) > max_frontier:
+                debug("witness search stopped, more than {} partial paths.".format(max_frontier))
+                return
+
+
+class ReachabilityEngine(object):
+    """
+    Constructs ReachabilitySpecification.edge_dict with frontier operations, and keeps it fresh.
+
+    Nodes are mapped to dense integers in graph order, and node sets are boolean arrays,
+    so membership, union and the loopback intersections are vectorized.
+    Node lists stored in edge_dict are in graph order.
+
+    The engine stays attached to the constructed spec. SpecificationGraph reports mutations
+    to it (node_added, node_attr_changed, edge_changed, ...), which only mark things dirty.
+    refresh() then recomputes edge_dict from the first (segment, depth) whose sources
+    meet a changed adjacency row, and stops at the first segment whose input did not change.
+    """
+
+    BACKENDS = {FrontierBackend.NAME: FrontierBackend,
+                SparseMatrixBackend.NAME: SparseMatrixBackend}
+    DEFAULT_BACKEND = FrontierBackend.NAME
+
+    def __init__(self, graph, caller, backend=None):
+        if backend is None:
+            backend = self.DEFAULT_BACKEND
+        if backend not in self.BACKENDS.keys():
+            raise NetworkError("Unknown reachability backend:{}".format(backend))
+        self._graph = graph
+        self._caller = caller
+        self._backend_name = backend
+        self._spec = None
+        self.reset()
+
+    def reset(self):
+        self._nodes = [_ for _ in self._graph.N.nodes]
+        self._ids = {n: i for i, n in enumerate(self._nodes)}
+        self._alive = [True for _ in self._nodes]
+        self._adjacencies = {}
+        self._src_predicate = None
+        self._src_attrs = set()
+        self._top_src = None
+        self._dirty_src = set()
+        self._src_masks = {}  # (segment index, depth) -> source nodes, referred by loopback
+        self._dst_masks = {}
+        self._eventuals = []
+        self._stale = False
+        self._loopback = None
+        self._witness = None
+
+    @property
+    def graph(self):
+        return self._graph
+
+    @property
+    def caller(self):
+        return self._caller
+
+    @property
+    def spec(self) -> ReachabilitySpecification:
+        return self._spec
+
+    @property
+    def backend_name(self):
+        return self._backend_name
+
+    @property
+    def backend_class(self):
+        return self.BACKENDS[self._backend_name]
+
+    @property
+    def size(self):
+        return len(self._nodes)
+
+    @property
+    def node_list(self):
+        return self._nodes
+
+    @property
+    def validator(self):
+        if self._caller is None or self._caller.validator is None:
+            return self._graph.validator
+        return self._caller.validator
+
+    def node(self, i):
+        return self._nodes[i]
+
+    def id(self, n):
+        return self._ids[n]
+
+    def alive(self, i):
+        return self._alive[i]
+
+    def predicate(self, spec):
+        return self._graph.spec_predicate(self._caller, [spec], self.validator)
+
+    @staticmethod
+    def referred_attrs(spec, names=None):
+        # attribute names a spec looks up under tag validation. None if it may refer to anything.
+        if names is None:
+            names = set()
+        if not isinstance(spec, GenericEvaluatee):
+            return names
+        if not isinstance(spec, MultiArityEvaluatee):
+            return None
+        for i in range(spec.arity):
+            e = spec.operand(i)
+            if not spec.get_symbolic(i):
+                continue
+            if isinstance(e, MultiArityEvaluatee):
+                if ReachabilityEngine.referred_attrs(e, names) is None:
+                    return None
+            elif isinstance(e, GenericEvaluatee) or callable(e):
+                return None
+            else:
+                try:
+                    names.add(e)
+                except TypeError:
+                    return None
+        return names
+
+    def mask(self, nodes):
+        m = np.zeros(self.size, dtype=bool)
+        ids = [self._ids[n] for n in nodes if n in self._ids]
+        m[ids] = True
+        return m
+
+    def nodes(self, mask):
+        return [self._nodes[i] for i in np.flatnonzero(mask)]
+
+    def fit(self, mask):
+        # masks stored before nodes were added are shorter than the current id space.
+        if len(mask) == self.size:
+            return mask
+        fitted = np.zeros(self.size, dtype=bool)
+        fitted[:len(mask)] = mask
+        return fitted
+
+    def adjacency(self, edge_spec, dst_spec, dst_ok=None, rows=None) -> SegmentAdjacency:
+        key = (id(edge_spec), id(dst_spec))
+        if key not in self._adjacencies.keys():
+            self._adjacencies[key] = SegmentAdjacency(self, edge_spec, dst_spec, dst_ok=dst_ok, rows=rows)
+        return self._adjacencies[key]
+
+    def source_mask(self, src_spec):
+        opt_spec = CommandOption("-spec", [src_spec], has_assignee=True)
+        opt_cand = CommandOption("-candidates", has_assignee=False)
+        opt_data = CommandOption("-with_data", has_assignee=False)
+        return self.mask(self._graph.collect_nodes(self._caller, (opt_spec, opt_cand, opt_data)))
+
+    def prepare(self, spec: ReachabilitySpecification):
+        self._spec = spec
+        self.reset()
+        keys = sorted(spec.edge_dict.keys())
+        if len(keys) == 0:
+            return keys
+        src_spec = spec.edge_dict[keys[0]][ReachabilitySpecification.SRC_SPEC]
+        self._src_predicate = self.predicate(src_spec)
+        self._src_attrs = self.referred_attrs(src_spec)
+        self._top_src = self.source_mask(src_spec)
+        self._eventuals = [None for _ in keys]
+        return keys
+
+    @property
+    def top_src(self):
+        return self._top_src
+
+    def construct(self, spec: ReachabilitySpecification):
+        keys = self.prepare(spec)
+        for seg_idx in range(len(keys)):
+            self.expand_segment(seg_idx, 1)
+        if len(keys) > 0:
+            self.update_loopback((0, 1))
+        return spec
+
+    def install(self, spec: ReachabilitySpecification, segments):
+        # edge_dict from steps expanded elsewhere (ReachabilityPool). prepare() must be called before.
+        for seg_idx, steps in enumerate(segments):
+            self.install_segment(seg_idx, 1, steps)
+        if len(segments) > 0:
+            self.update_loopback((0, 1))
+        return spec
+
+    def expand_segment(self, seg_idx, first_depth):
+        # (re)computes depths >= first_depth of a segment. Depths before it are kept.
+        edge_dict = self._spec.edge_dict
+        seg = sorted(edge_dict.keys())[seg_idx]
+        entry = edge_dict[seg]
+        quantifier = entry[ReachabilitySpecification.QUANTIFIER]
+        adjacency = self.adjacency(entry[ReachabilitySpecification.EDGE_SPEC],
+                                   entry[ReachabilitySpecification.DST_SPEC])
+        if first_depth == 1:
+            if seg_idx == 0:  # toplevel
+                src = self._top_src
+            else:
+                src = self._eventuals[seg_idx-1]
+        else:
+            src = self._src_masks[(seg_idx, first_depth)]
+        steps = expand_depths(adjacency.backend, src, first_depth, quantifier.maximum)
+        self.install_segment(seg_idx, first_depth, steps)
+
+    def install_segment(self, seg_idx, first_depth, steps):
+        edge_dict = self._spec.edge_dict
+        seg = sorted(edge_dict.keys())[seg_idx]
+        entry = edge_dict[seg]
+        quantifier = entry[ReachabilitySpecification.QUANTIFIER]
+        if first_depth == 1:
+            entry[ReachabilitySpecification.DEPTHS] = {}
+        depths = entry[ReachabilitySpecification.DEPTHS]
+        for k in [_ for _ in self._src_masks.keys() if _[0] == seg_idx and _[1] >= first_depth]:
+            del self._src_masks[k]
+            self._dst_masks.pop(k, None)
+            depths.pop(k[1], None)
+        for i, src, dst in steps:
+            depths[i] = {}
+            depths[i][ReachabilitySpecification.SRC_NODES] = self.nodes(src)
+            depths[i][ReachabilitySpecification.LOOPBACK_NODES] = {}
+            depths[i][ReachabilitySpecification.SRC_REACHABLE] = dst is not None
+            self._src_masks[(seg_idx, i)] = src
+            if dst is None:
+                depths[i][ReachabilitySpecification.DST_NODES] = []
+                depths[i][ReachabilitySpecification.DST_REACHABLE] = False
+                continue
+            self._dst_masks[(seg_idx, i)] = dst
+            depths[i][ReachabilitySpecification.DST_NODES] = self.nodes(dst)
+            depths[i][ReachabilitySpecification.DST_REACHABLE] = bool(dst.any())
+        eventual = np.zeros(self.size, dtype=bool)
+        for (s, i), dst in self._dst_masks.items():
+            if s == seg_idx and quantifier.contains(i):
+                eventual |= dst
+        self._eventuals[seg_idx] = eventual
+
+    def update_loopback(self, first):
+        # loopback of (segment, depth) lists its destinations which are sources of any (segment, depth)
+        # constructed so far. Recomputed for every entry at or after 'first'.
+        keys = sorted(self._spec.edge_dict.keys())
+        for (seg_idx, i), dst in self._dst_masks.items():
+            if (seg_idx, i) < first or not dst.any():
+                continue
+            depth = self._spec.edge_dict[keys[seg_idx]][ReachabilitySpecification.DEPTHS][i]
+            loopback = {}
+            for k, back_src in self._src_masks.items():
+                if k <= (seg_idx, i):
+                    loopback[k] = self.nodes(dst & back_src)
+            depth[ReachabilitySpecification.LOOPBACK_NODES] = loopback
+
+    @property
+    def loopback(self) -> LoopbackIndex:
+        if self._loopback is None or self._loopback.size != self.size:
+            count = len(self._eventuals)
+            sources = [np.zeros(self.size, dtype=bool) for _ in range(count)]
+            destinations = [np.zeros(self.size, dtype=bool) for _ in range(count)]
+            for (seg_idx, i), src in self._src_masks.items():
+                sources[seg_idx] |= src
+            for (seg_idx, i), dst in self._dst_masks.items():
+                destinations[seg_idx] |= dst
+            edges = ((i, j) for adjacency in self._adjacencies.values()
+                     for i, row in enumerate(adjacency.rows) for j in row)
+            self._loopback = LoopbackIndex(self.size, edges, sources, destinations)
+        return self._loopback
+
+    @property
+    def witness(self) -> WitnessIndex:
+        if self._witness is None or self._witness.size != self.size:
+            self._witness = WitnessIndex(self)
+        return self._witness
+
+    def has_depth(self, seg_idx, i):
+        # depth i of the segment expanded (its sources weren't empty)
+        return (seg_idx, i) in self._dst_masks.keys()
+
+    def src_mask(self, seg_idx, i):
+        return self._src_masks[(seg_idx, i)]
+
+    def witness_paths(self, seg_idx, i, targets=None, max_paths=None, max_length=None, max_frontier=None):
+        # witnesses as node lists, lazily. targets default to all destinations of (seg_idx, i).
+        if not self.has_depth(seg_idx, i):
+            return
+        if targets is None:
+            ids = np.flatnonzero(self._dst_masks[(seg_idx, i)]).tolist()
+        else:
+            ids = [self._ids[n] for n in targets if n in self._ids]
+        for path in self.witness.paths(seg_idx, i, ids, max_paths=max_paths, max_length=max_length,
+                                       max_frontier=max_frontier):
+            yield [self._nodes[v] for v in path]
+
+    # graph mutations reported by SpecificationGraph
+
+    def invalidate(self):
+        self._stale = True
+
+    def node_added(self, n):
+        if self._stale:
+            return
+        self._ids[n] = len(self._nodes)
+        self._nodes.append(n)
+        self._alive.append(True)
+        for adjacency in self._adjacencies.values():
+            adjacency.grow()
+        self._dirty_src.add(self._ids[n])
+
+    def node_removed(self, n):
+        if self._stale or n not in self._ids:
+            return
+        i = self._ids.pop(n)
+        self._alive[i] = False
+        for adjacency in self._adjacencies.values():
+            adjacency.node_changed(i)
+            adjacency.row_changed(i)
+        self._dirty_src.add(i)
+
+    def node_attr_changed(self, n, name):
+        if self._stale or n not in self._ids:
+            return
+        i = self._ids[n]
+        for adjacency in self._adjacencies.values():
+            if adjacency.depends_on_node_attr(name):
+                adjacency.node_changed(i)
+        if self._src_attrs is None or name in self._src_attrs:
+            self._dirty_src.add(i)
+
+    def edge_changed(self, u, v, name=None):
+        # name is None if the edge itself was added or removed.
+        if self._stale or u not in self._ids:
+            return
+        i = self._ids[u]
+        for adjacency in self._adjacencies.values():
+            if name is None or adjacency.depends_on_edge_attr(name):
+                adjacency.row_changed(i)
+
+    def refresh(self):
+        if self._spec is None:
+            return False
+        if self._stale:
+            self.construct(self._spec)
+            return True
+        keys = sorted(self._spec.edge_dict.keys())
+        if len(keys) == 0:
+            return False
+        for k in self._src_masks.keys():
+            self._src_masks[k] = self.fit(self._src_masks[k])
+        for k in self._dst_masks.keys():
+            self._dst_masks[k] = self.fit(self._dst_masks[k])
+        self._eventuals = [self.fit(e) for e in self._eventuals]
+        changed_rows = {}
+        for key, adjacency in self._adjacencies.items():
+            rows = np.zeros(self.size, dtype=bool)
+            rows[adjacency.refresh()] = True
+            changed_rows[key] = rows
+        top_src = self.fit(self._top_src).copy()
+        N = self._graph.N
+        for i in self._dirty_src:
+            top_src[i] = self._alive[i] and bool(self._src_predicate(N.nodes[self._nodes[i]]))
+        self._dirty_src = set()
+        src_changed = not np.array_equal(top_src, self._top_src)
+        self._top_src = top_src
+        if src_changed or any(rows.any() for rows in changed_rows.values()):
+            self._loopback = None
+            self._witness = None
+        first = None
+        for seg_idx, seg in enumerate(keys):
+            entry = self._spec.edge_dict[seg]
+            key = (id(entry[ReachabilitySpecification.EDGE_SPEC]), id(entry[ReachabilitySpecification.DST_SPEC]))
+            rows = changed_rows[key]
+            depth = None
+            if src_changed:
+                depth = 1
+            elif rows.any():
+                for (s, i), src in self._src_masks.items():
+                    if s == seg_idx and (src & rows).any():
+                        depth = i
+                        break
+            if depth is None:
+                src_changed = False
+                continue
+            if first is None:
+                first = (seg_idx, depth)
+            eventual = self._eventuals[seg_idx]
+            self.expand_segment(seg_idx, depth)
+            src_changed = not np.array_equal(eventual, self._eventuals[seg_idx])
+        if first is None:
+            return False
+        self.update_loopback(first)
+        return True
+
+
+class GraphSnapshot(object):
+    """
+    Read-only topology of a SpecificationGraph for ReachabilityPool workers.
+
+    Edges are kept as CSR over dense node ids in N.edges() order, one entry per multi-edge.
+    Specs are evaluated in the parent process (evaluatees are bound to the interpreter and
+    can't be pickled), so workers receive one boolean per edge and per node instead of attributes.
+    """
+
+    def __init__(self, graph):
+        N = graph.N
+        self._nodes = [_ for _ in N.nodes]
+        ids = {n: i for i, n in enumerate(self._nodes)}
+        self._node_attrs = [N.nodes[n] for n in self._nodes]
+        self._edge_attrs = []
+        rows = []
+        indices = []
+        for u, v, d in N.edges(data=True):
+            rows.append(ids[u])
+            indices.append(ids[v])
+            self._edge_attrs.append(d)
+        self._rows = np.array(rows, dtype=np.int64)
+        self._indices = np.array(indices, dtype=np.int64)
+        # N.edges() iterates grouped by source in node order, so counting rows gives indptr.
+        self._indptr = np.zeros(len(self._nodes)+1, dtype=np.int64)
+        np.cumsum(np.bincount(self._rows, minlength=len(self._nodes)), out=self._indptr[1:])
+
+    @property
+    def size(self):
+        return len(self._nodes)
+
+    @property
+    def indptr(self):
+        return self._indptr
+
+    @property
+    def indices(self):
+        return self._indices
+
+    def masks(self, edge_predicate, dst_predicate):
+        edge_ok = np.fromiter((bool(edge_predicate(d)) for d in self._edge_attrs), dtype=bool,
+                              count=len(self._edge_attrs))
+        dst_ok = np.fromiter((bool(dst_predicate(d)) for d in self._node_attrs), dtype=bool, count=self.size)
+        return edge_ok, dst_ok
+
+    def rows(self, edge_ok, dst_ok):
+        # adjacency rows as SegmentAdjacency keeps them, one entry per neighbour
+        rows = [{} for _ in range(self.size)]
+        keep = edge_ok & dst_ok[self._indices]
+        for u, j in zip(self._rows[keep].tolist(), self._indices[keep].tolist()):
+            rows[u][j] = True
+        return [list(row.keys()) for row in rows]
+
+
+# topology of the worker process, set once by the pool initializer
+_snapshot = None
+
+
+def _init_worker(size, indptr, indices):
+    global _snapshot
+    _snapshot = (size, indptr, indices)
+
+
+def _expand_spec(task, snapshot=None):
+    # all segments of one spec. A segment starts from the eventual nodes of the previous one.
+    size, indptr, indices = _snapshot if snapshot is None else snapshot
+    backend_name, src, segments = task
+    backend_class = ReachabilityEngine.BACKENDS[backend_name]
+    results = []
+    for edge_ok, dst_ok, maximum, contained in segments:
+        keep = edge_ok & dst_ok[indices]
+        kept = np.zeros(len(keep)+1, dtype=np.int64)
+        np.cumsum(keep, out=kept[1:])
+        steps = expand_depths(backend_class(size, kept[indptr], indices[keep]), src, 1, maximum)
+        results.append(steps)
+        src = np.zeros(size, dtype=bool)
+        for i, _, dst in steps:
+            if dst is not None and i in contained:
+                src |= dst
+    return results
+
+
+class ReachabilityPool(object):
+    """
+    Constructs many specs on a process pool. The graph snapshot is shipped once per pool
+    through the initializer, and each task carries the edge/node masks of one spec.
+
+    Segments of a spec depend on each other (a segment starts from the eventual nodes of
+    the previous one) as depths do, so the unit of parallelism is a spec. Specs are handed
+    out in chunks to keep the per-task overhead low with hundreds of specs.
+    """
+
+    def __init__(self, graph, caller, workers, backend=None):
+        if workers is None or workers < 1:
+            raise NetworkError("Invalid number of workers:{}".format(workers))
+        self._graph = graph
+        self._caller = caller
+        self._workers = workers
+        self._backend = backend
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def construct(self, specs):
+        snapshot = GraphSnapshot(self._graph)
+        engines = []
+        tasks = []
+        for spec in specs:
+            engine = ReachabilityEngine(self._graph, self._caller, backend=self._backend)
+            keys = engine.prepare(spec)
+            segments = []
+            for seg in keys:
+                entry = spec.edge_dict[seg]
+                quantifier = entry[ReachabilitySpecification.QUANTIFIER]
+                edge_spec = entry[ReachabilitySpecification.EDGE_SPEC]
+                dst_spec = entry[ReachabilitySpecification.DST_SPEC]
+                edge_ok, dst_ok = snapshot.masks(engine.predicate(edge_spec), engine.predicate(dst_spec))
+                # the engine keeps the same adjacency for incremental maintenance
+                engine.adjacency(edge_spec, dst_spec, dst_ok=dst_ok.tolist(), rows=snapshot.rows(edge_ok, dst_ok))
+                contained = {i for i in range(1, quantifier.maximum+1) if quantifier.contains(i)}
+                segments.append((edge_ok, dst_ok, quantifier.maximum, contained))
+            engines.append(engine)
+            tasks.append((engine.backend_name, engine.top_src, segments))
+        if self._workers == 1 or len(tasks) < 2:
+            topology = (snapshot.size, snapshot.indptr, snapshot.indices)
+            results = [_expand_spec(task, topology) for task in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (self._workers * 4))
+            with ProcessPoolExecutor(max_workers=self._workers, initializer=_init_worker,
+                                     initargs=(snapshot.size, snapshot.indptr, snapshot.indices)) as executor:
+                results = list(executor.map(_expand_spec, tasks, chunksize=chunksize))
+        for spec, engine, segments in zip(specs, engines, results):
+            engine.install(spec, segments)
+        return engines
@@ -22,6 +22,7 @@ from networkml.network import NetworkConditionValidatee, ReachNetworkConstructor
 from networkml.network import Interval, Numberset, NumbersetOperator, CommandOption
 from networkml.requirementterm import RequirementTerm, RequirementTermOption, ActionRequirement, ExistenceRequirement
 from networkml.requirementterm import ActionScript
+from networkml.grammarcache import GrammarCache
 
 
 class RequirementSyntacticAnalyzer:
@@ -129,7 +130,7 @@ class RequirementSyntacticAnalyzer:
 
     # initializer
     def __init__(self):
-        self.lexer = lex.lex(module=self)
+        self.lexer = GrammarCache.lexer(self)
 
     def t_error(self, t):
         # _print("Illegal character {}".format(t.value[0]))
@@ -946,7 +947,7 @@ class RequirementParser:
         self._owner = owner
         self._lexer = RequirementSyntacticAnalyzer()
         self.lexer = self._lexer.lexer
-        self.parser = yacc.yacc(module=self)
+        self.parser = GrammarCache.parser(self)
 
     @property
     def owner(self):
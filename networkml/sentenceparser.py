@@ -8,6 +8,7 @@ import traceback
 
 # import our modules
 from networkml.error import NetworkError
+from networkml.grammarcache import GrammarCache
 
 
 class SentenceSyntacticError(NetworkError):
@@ -252,7 +253,7 @@ class SentenceSyntacticAnalyzer:
         return t
 
     def __init__(self):
-        self.lexer = lex.lex(module=self)
+        self.lexer = GrammarCache.lexer(self)
 
     def t_error(self, t):
         # _print("Illegal character {}".format(t.value[0]))
@@ -1135,7 +1136,7 @@ class SentenceParser:
         self._owner = owner
         self._lexer = SentenceSyntacticAnalyzer()
         self.lexer = self._lexer.lexer
-        self.parser = yacc.yacc(module=self)
+        self.parser = GrammarCache.parser(self)
 
     @property
     def owner(self):
@@ -7,10 +7,15 @@ import sys
 import queue
 import re
 import enum
-from networkml.generic import debug, is_debug_mode
+from networkml.generic import debug, is_debug_mode, get_trace
 from networkml.consensus import Consensus, ConsensusError, ConsensusConfused, ConsensusReset
 
 
+# protocol steps of the socket loops, printed while the debug switch (nmlserver 'debug') or the
+# trace is on; see generic.Trace.
+_trace = get_trace(__name__, print, follows_debug=True)
+
+
 class ForceQuit(Exception):
 
     def __init__(self, msg):
@@ -170,14 +175,14 @@ class AutonomousWorker(threading.Thread):
     def receive(self, sock, length, once=False):
         # self.debug(sock, length, once)
         if once:
-            debug("began receiving.")
+            _trace("began receiving.")
             chunk = sock.recv(length)
-            debug("done.")
+            _trace("done.")
             if chunk == b'':
                 raise SocketConnectionBrokenError("socket connection broken observed. b'' received.")
-            debug("message receive completed. {} bytes read".format(len(chunk)))
+            _trace("message receive completed. {} bytes read", len(chunk))
             return chunk
-        debug("began receiving.")
+        _trace("began receiving.")
         chunks = []
         bytes_recd = 0
         while bytes_recd < length:
@@ -188,8 +193,8 @@ class AutonomousWorker(threading.Thread):
             if len(chunk) == 0:
                 break
             bytes_recd = bytes_recd + len(chunk)
-            debug(bytes_recd, "has read.")
-        debug("message receive completed. {} bytes read".format(bytes_recd))
+            _trace("{} has read.", bytes_recd)
+        _trace("message receive completed. {} bytes read", bytes_recd)
         msg = b''.join(chunks)
         return msg
 
@@ -213,34 +218,34 @@ class AutonomousWorker(threading.Thread):
         self.pre_process_request()
         sock = self.rw_sock
         i = 1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.BeginRequest.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.BeginRequest.value)
         req = self.receive(sock, 128, once=True)
-        debug("done")
+        _trace("done")
         length = self._consensus.decode_received_data(req, self._consensus.ConsensusKeywords.BeginRequest)
         i = i+1
-        debug(i, "sending", self._consensus.ConsensusKeywords.AcceptBeginRequest.value)
+        _trace("{} sending {}", i, self._consensus.ConsensusKeywords.AcceptBeginRequest.value)
         req = self._consensus.encode_sending_data("", self._consensus.ConsensusKeywords.AcceptBeginRequest)
         self.send_msg(sock, req)
-        debug("done")
+        _trace("done")
         # receive request
         i = i+1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.SendRequest.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.SendRequest.value)
         req = self.receive(sock, length)
-        debug("done")
+        _trace("done")
         req_msg = self._consensus.decode_received_data(req, self._consensus.ConsensusKeywords.SendRequest)
         i = i+1
-        debug(i, "sending ", self._consensus.ConsensusKeywords.AcceptSendRequest.value)
+        _trace("{} sending {}", i, self._consensus.ConsensusKeywords.AcceptSendRequest.value)
         req = self._consensus.encode_sending_data("", self._consensus.ConsensusKeywords.AcceptSendRequest)
         self.send_msg(sock, req)
-        debug("done")
+        _trace("done")
         # end request
         i = i+1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.EndRequest.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.EndRequest.value)
         req = self.receive(sock, 128, once=True)
-        debug("done")
+        _trace("done")
         _ = self._consensus.encode_sending_data(req, self._consensus.ConsensusKeywords.EndRequest)
         i = i+1
-        debug(i, "sending", self._consensus.ConsensusKeywords.AcceptEndRequest.value)
+        _trace("{} sending {}", i, self._consensus.ConsensusKeywords.AcceptEndRequest.value)
         req = self._consensus.encode_sending_data("", self._consensus.ConsensusKeywords.AcceptEndRequest)
         self.send_msg(sock, req)
 
@@ -258,47 +263,47 @@ class AutonomousWorker(threading.Thread):
 
         # begin response
         i = i+1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.WaitResponse.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.WaitResponse.value)
         res = self.receive(sock, 128, once=True)
         _ = self._consensus.encode_sending_data(res, self._consensus.ConsensusKeywords.WaitResponse)
-        debug("done")
+        _trace("done")
         i = i+1
         res_msg = self._consensus.encode_sending_data(res_msg, self._consensus.ConsensusKeywords.SendResponse)
         res = self._consensus.encode_sending_data(len(res_msg), self._consensus.ConsensusKeywords.BeginResponse)
-        debug(i, "sending", "with", len(res_msg), res_msg, self._consensus.ConsensusKeywords.BeginResponse.value)
+        _trace("{} sending with {} {} {}", i, len(res_msg), res_msg, self._consensus.ConsensusKeywords.BeginResponse.value)
         self.send_msg(sock, res)
         # sock.send(res)
-        debug("done")
+        _trace("done")
         i = i+1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.AcceptBeginResponse.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.AcceptBeginResponse.value)
         res = self.receive(sock, 128, once=True)
-        debug("done")
+        _trace("done")
         _ = self._consensus.decode_received_data(res, self._consensus.ConsensusKeywords.AcceptBeginResponse)
         # send response. content is already encoded preliminarily.
         i = i+1
-        debug(i, "sending", self._consensus.ConsensusKeywords.SendResponse.value)
+        _trace("{} sending {}", i, self._consensus.ConsensusKeywords.SendResponse.value)
         self.send_msg(sock, res_msg)
-        debug("done")
+        _trace("done")
         i = i+1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.AcceptSendResponse.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.AcceptSendResponse.value)
         res = self.receive(sock, 128, once=True)
-        debug("done")
+        _trace("done")
         _ = self._consensus.decode_received_data(res, self._consensus.ConsensusKeywords.AcceptSendResponse)
         # end response
         i = i+1
-        debug(i, "sending", self._consensus.ConsensusKeywords.EndResponse.value)
+        _trace("{} sending {}", i, self._consensus.ConsensusKeywords.EndResponse.value)
         res = self._consensus.encode_sending_data("", self._consensus.ConsensusKeywords.EndResponse)
         self.send_msg(sock, res)
-        debug("done")
+        _trace("done")
         i = i+1
-        debug(i, "waiting for", self._consensus.ConsensusKeywords.AcceptEndResponse.value)
+        _trace("{} waiting for {}", i, self._consensus.ConsensusKeywords.AcceptEndResponse.value)
         res = self.receive(sock, 128, once=True)
-        debug("done")
+        _trace("done")
         _ = self._consensus.decode_received_data(res, self._consensus.ConsensusKeywords.AcceptEndResponse)
 
         rtn = self.post_process_request()
         # process response
-        debug("Request successfully proceeded with '{}'".format(rtn))
+        _trace("Request successfully proceeded with '{}'", rtn)
         return rtn
 
     def process_request_loop(self):
@@ -307,11 +312,11 @@ class AutonomousWorker(threading.Thread):
 
                 rtn = self.process_request()
                 # analyzes purpose of Exception return not raise.
-                debug("returned type", type(rtn))
+                _trace("returned type {}", type(rtn))
                 if isinstance(rtn, Exception):
-                    debug("analyzing exception")
+                    _trace("analyzing exception")
                     for r in self._consensus_err_breaks:
-                        debug(r)
+                        _trace("{}", r)
                         if isinstance(rtn, type(r[0])):
                             if r[1] == "return":
                                 return rtn
@@ -325,7 +330,7 @@ class AutonomousWorker(threading.Thread):
                 breaking = False
                 continuing = False
                 for r in self._consensus_err_breaks:
-                    debug(r)
+                    _trace("{}", r)
                     if isinstance(ex, type(r[0])):
                         if r[1] == "return":
                             return ex
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import struct
+import pickle
+import tempfile
+import numpy as np
+import networkx as nx
+import yaml
+from networkml.error import NetworkError
+
+
+# Binary snapshot of a SpecificationGraph's MultiDiGraph.
+#
+#   header   "NMLG", version (u16), flags (u16)
+#   sections tag (4 bytes), aux (u32), length (u64), data padded to 8 bytes
+#
+#   META     pickled dict: graph attributes, node and edge counts
+#   NIDS     pickled list of node ids, in node order; rows below index it
+#   ESRC     int64 row of the source of each edge; edges are grouped by source in node order
+#   EDST     int64 row of the destination of each edge
+#   EPTR     int64 CSR index pointer: edges of source row i are EPTR[i]:EPTR[i+1]
+#   IPTR     int64 CSR index pointer of incoming edges into IIDX
+#   IIDX     int64 edge rows grouped by destination row
+#   EKEY     pickled list of edge keys
+#   KEYS     pickled list of attribute names, the interned key table
+#   NROW     int64 rows having the attribute aux (an index to KEYS), followed by
+#   NVAL     pickled list of its values, one per row
+#   EROW     as NROW, for edges
+#   EVAL     as NVAL, for edges
+#
+# arrays are little endian and 8-byte aligned, so they can be mapped without copying
+# (networkml.mappedgraph opens a snapshot as a read-only graph that way).
+# YAML stays the interchange format, snapshots are for fast load/save.
+
+Magic = b"NMLG"
+Version = 1
+Extensions = (".nmlg",)
+
+_header = struct.Struct("<4sHH")
+_section = struct.Struct("<4sIQ")
+
+
+# dicts are dumped in insertion order and loaded back as such.
+def represent_odict(dumper, instance):
+    return dumper.represent_mapping('tag:yaml.org,2002:map', instance.items())
+
+yaml.add_representer(dict, represent_odict)
+
+def construct_odict(loader, node):
+    return dict(loader.construct_pairs(node))
+
+yaml.add_constructor('tag:yaml.org,2002:map', construct_odict)
+
+
+def is_snapshot_file(filename):
+    return os.path.splitext("{}".format(filename))[1].lower() in Extensions
+
+
+class Snapshot:
+
+    def __init__(self):
+        self.meta = {}
+        self.ids = []
+        self.src = np.zeros(0, dtype="<i8")
+        self.dst = np.zeros(0, dtype="<i8")
+        self.keys = []
+        self.key_table = []
+        # attribute name -> (rows, values)
+        self.node_columns = {}
+        self.edge_columns = {}
+
+    @staticmethod
+    def of(G: nx.MultiDiGraph):
+        s = Snapshot()
+        s.ids = list(G.nodes)
+        index = {n: i for i, n in enumerate(s.ids)}
+        key_ids = {}
+        node_columns = {}
+        for i, (n, attrs) in enumerate(G.nodes(data=True)):
+            for k, v in attrs.items():
+                if k not in key_ids:
+                    key_ids[k] = len(key_ids)
+                c = node_columns.get(k)
+                if c is None:
+                    c = ([], [])
+                    node_columns[k] = c
+                c[0].append(i)
+                c[1].append(v)
+        m = G.number_of_edges()
+        src = np.empty(m, dtype="<i8")
+        dst = np.empty(m, dtype="<i8")
+        keys = []
+        edge_columns = {}
+        for j, (u, v, key, attrs) in enumerate(G.edges(keys=True, data=True)):
+            src[j] = index[u]
+            dst[j] = index[v]
+            keys.append(key)
+            for k, x in attrs.items():
+                if k not in key_ids:
+                    key_ids[k] = len(key_ids)
+                c = edge_columns.get(k)
+                if c is None:
+                    c = ([], [])
+                    edge_columns[k] = c
+                c[0].append(j)
+                c[1].append(x)
+        s.src = src
+        s.dst = dst
+        s.keys = keys
+        s.key_table = list(key_ids.keys())
+        s.node_columns = {k: (np.asarray(r, dtype="<i8"), v) for k, (r, v) in node_columns.items()}
+        s.edge_columns = {k: (np.asarray(r, dtype="<i8"), v) for k, (r, v) in edge_columns.items()}
+        s.meta = {"graph": dict(G.graph), "nodes": len(s.ids), "edges": m}
+        return s
+
+    def to_graph(self) -> nx.MultiDiGraph:
+        ids = self.ids
+        node_attrs = [{} for _ in ids]
+        for k, (rows, values) in self.node_columns.items():
+            for r, v in zip(rows.tolist(), values):
+                node_attrs[r][k] = v
+        edge_attrs = [{} for _ in self.keys]
+        for k, (rows, values) in self.edge_columns.items():
+            for r, v in zip(rows.tolist(), values):
+                edge_attrs[r][k] = v
+        G = nx.MultiDiGraph()
+        G.graph.update(self.meta.get("graph", {}))
+        G.add_nodes_from(zip(ids, node_attrs))
+        G.add_edges_from((ids[u], ids[v], key, d)
+                         for u, v, key, d in zip(self.src.tolist(), self.dst.tolist(), self.keys, edge_attrs))
+        return G
+
+    def csr(self):
+        # (EPTR, IPTR, IIDX) of the edges.
+        n = len(self.ids)
+        indptr = np.zeros(n + 1, dtype="<i8")
+        np.cumsum(np.bincount(self.src, minlength=n), out=indptr[1:])
+        in_indptr = np.zeros(n + 1, dtype="<i8")
+        np.cumsum(np.bincount(self.dst, minlength=n), out=in_indptr[1:])
+        in_edges = np.argsort(self.dst, kind="stable").astype("<i8")
+        return indptr, in_indptr, in_edges
+
+    def write(self, filename):
+        # written aside and renamed over filename, so processes mapping the old file keep it intact.
+        key_ids = {k: i for i, k in enumerate(self.key_table)}
+        indptr, in_indptr, in_edges = self.csr()
+        temp = "{}.tmp".format(filename)
+        with open(temp, "wb") as f:
+            f.write(_header.pack(Magic, Version, 0))
+            self.write_section(f, b"META", pickle.dumps(self.meta, protocol=pickle.HIGHEST_PROTOCOL))
+            self.write_section(f, b"NIDS", pickle.dumps(self.ids, protocol=pickle.HIGHEST_PROTOCOL))
+            self.write_section(f, b"ESRC", self.src.astype("<i8").tobytes())
+            self.write_section(f, b"EDST", self.dst.astype("<i8").tobytes())
+            self.write_section(f, b"EPTR", indptr.tobytes())
+            self.write_section(f, b"IPTR", in_indptr.tobytes())
+            self.write_section(f, b"IIDX", in_edges.tobytes())
+            self.write_section(f, b"EKEY", pickle.dumps(self.keys, protocol=pickle.HIGHEST_PROTOCOL))
+            self.write_section(f, b"KEYS", pickle.dumps(self.key_table, protocol=pickle.HIGHEST_PROTOCOL))
+            for tags, columns in (((b"NROW", b"NVAL"), self.node_columns), ((b"EROW", b"EVAL"), self.edge_columns)):
+                for k, (rows, values) in columns.items():
+                    self.write_section(f, tags[0], rows.astype("<i8").tobytes(), key_ids[k])
+                    self.write_section(f, tags[1], pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL), key_ids[k])
+        os.replace(temp, filename)
+
+    @staticmethod
+    def write_section(f, tag, data, aux=0):
+        f.write(_section.pack(tag, aux, len(data)))
+        f.write(data)
+        pad = -len(data) % 8
+        if pad:
+            f.write(b"\0" * pad)
+
+    @staticmethod
+    def sections(buf):
+        # (tag, aux, offset, length) of each section of a snapshot held in buf.
+        if len(buf) < _header.size:
+            raise NetworkError("not a graph snapshot: too short.")
+        magic, version, flags = _header.unpack_from(buf, 0)
+        if magic != Magic:
+            raise NetworkError("not a graph snapshot: bad magic {}.".format(magic))
+        if version > Version:
+            raise NetworkError("graph snapshot version {} is newer than supported {}.".format(version, Version))
+        pos = _header.size
+        while pos < len(buf):
+            tag, aux, length = _section.unpack_from(buf, pos)
+            pos += _section.size
+            yield tag, aux, pos, length
+            pos += length + (-length % 8)
+
+    @staticmethod
+    def read(filename, mmap=False):
+        # with mmap, int64 rows are views of the mapped file instead of copies.
+        if mmap:
+            buf = np.memmap(filename, dtype=np.uint8, mode="r")
+        else:
+            with open(filename, "rb") as f:
+                buf = f.read()
+        s = Snapshot()
+        rows = None
+        for tag, aux, offset, length in Snapshot.sections(buf):
+            if tag in (b"ESRC", b"EDST", b"NROW", b"EROW", b"EPTR", b"IPTR", b"IIDX"):
+                data = np.frombuffer(buf, dtype="<i8", count=length // 8, offset=offset)
+            else:
+                data = bytes(buf[offset:offset + length])
+            if tag == b"META":
+                s.meta = pickle.loads(data)
+            elif tag == b"NIDS":
+                s.ids = pickle.loads(data)
+            elif tag == b"ESRC":
+                s.src = data
+            elif tag == b"EDST":
+                s.dst = data
+            elif tag == b"EKEY":
+                s.keys = pickle.loads(data)
+            elif tag == b"KEYS":
+                s.key_table = [sys.intern(k) if isinstance(k, str) else k for k in pickle.loads(data)]
+            elif tag in (b"NROW", b"EROW"):
+                rows = data
+            elif tag == b"NVAL":
+                s.node_columns[s.key_table[aux]] = (rows, pickle.loads(data))
+            elif tag == b"EVAL":
+                s.edge_columns[s.key_table[aux]] = (rows, pickle.loads(data))
+            # CSR sections are for mapped graphs, unknown sections of later minor revisions are skipped.
+        return s
+
+
+def write_snapshot(G: nx.MultiDiGraph, filename):
+    Snapshot.of(G).write(filename)
+
+
+def read_snapshot(filename) -> nx.MultiDiGraph:
+    return Snapshot.read(filename).to_graph()
+
+
+def read_graph(filename) -> nx.MultiDiGraph:
+    if is_snapshot_file(filename):
+        return read_snapshot(filename)
+    with open(filename, "r") as f:
+        return yaml.load(f, Loader=yaml.Loader)
+
+
+def write_graph(G: nx.MultiDiGraph, filename):
+    if is_snapshot_file(filename):
+        write_snapshot(G, filename)
+    else:
+        if not isinstance(G, nx.MultiDiGraph):
+            # mapped graphs are dumped as the MultiDiGraph they stand for.
+            G = G.to_graph()
+        # written aside and renamed, a crash while dumping leaves the previous file.
+        temp = "{}.tmp".format(filename)
+        with open(temp, "w") as f:
+            yaml.dump(G, f)
+        os.replace(temp, filename)
+
+
+def convert(src, dst):
+    # between YAML and snapshot, in the direction the extensions tell.
+    write_graph(read_graph(src), dst)
+
+
+def sample_graph(n):
+    # uml-model like graph of n nodes and about 2n edges.
+    G = nx.MultiDiGraph()
+    for i in range(n):
+        G.add_node(i, clazz="C{}".format(i), kind="class" if i % 3 else "interface",
+                   name={"type": "attribute", "accessibility": "private"})
+    for i in range(1, n):
+        G.add_edge(i, i // 2, **{"is": True, "isParentOf": False, "knows": False, "manages": i % 5 == 0})
+        G.add_edge(i, (i * 7) % n, **{"is": False, "isParentOf": False, "knows": True, "manages": False})
+    return G
+
+
+def benchmark(G: nx.MultiDiGraph, directory=None):
+    # seconds to save and load G as YAML and as a snapshot, and the file sizes.
+    result = {}
+    with tempfile.TemporaryDirectory(dir=directory) as d:
+        for fmt, ext in (("yaml", ".yaml"), ("snapshot", Extensions[0])):
+            filename = os.path.join(d, "graph{}".format(ext))
+            t0 = time.time()
+            write_graph(G, filename)
+            t1 = time.time()
+            H = read_graph(filename)
+            t2 = time.time()
+            if H.number_of_nodes() != G.number_of_nodes() or H.number_of_edges() != G.number_of_edges():
+                raise NetworkError("{} round trip lost elements.".format(fmt))
+            result[fmt] = {"save": t1 - t0, "load": t2 - t1, "bytes": os.path.getsize(filename)}
+    return result
+
+
+def main(argv):
+    # snapshot.py convert <src> <dst>
+    # snapshot.py bench <model file>|<number of nodes>
+    if len(argv) == 4 and argv[1] == "convert":
+        convert(argv[2], argv[3])
+    elif len(argv) == 3 and argv[1] == "bench":
+        if os.path.exists(argv[2]):
+            G = read_graph(argv[2])
+        else:
+            G = sample_graph(int(argv[2]))
+        print("{} nodes, {} edges".format(G.number_of_nodes(), G.number_of_edges()))
+        for fmt, r in benchmark(G).items():
+            print("{:9s} save {:8.3f}s  load {:8.3f}s  {:>12d} bytes".format(fmt, r["save"], r["load"], r["bytes"]))
+    else:
+        print("usage: {} convert <src> <dst> | bench <file>|<nodes>".format(argv[0]))
+        print("  snapshot extensions: {}".format(", ".join(Extensions)))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
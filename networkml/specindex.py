@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left, bisect_right, insort
+
+from networkml.generic import GenericEvaluatee
+from networkml.network import NetworkSymbol
+from networkml.validator import BooleanConjunctiveEvaluatee, BooleanDisjunctiveEvaluatee, BooleanEqualityEvaluatee
+from networkml.validator import BooleanLessThanEvaluatee, BooleanLessOrEqualsEvaluatee
+from networkml.validator import BooleanGreaterThanEvaluatee, BooleanGreaterOrEqualsEvaluatee
+
+
+class AttributeIndex(object):
+    """
+    Secondary index over the attribute dicts of graph elements (nodes or edges).
+
+    hash index:   attr -> value -> set of element keys, answers '=='.
+    sorted index: attr -> sorted distinct values, per comparable kind (numbers, strings),
+                  answers '<', '<=', '>', '>=' by bisecting and merging the hash buckets.
+    Unhashable values are kept aside per attr and always returned as candidates,
+    so the index answers a superset and the caller evaluates the spec on it.
+    """
+
+    NUMBER = "number"
+    STRING = "string"
+
+    def __init__(self):
+        self._hash = {}
+        self._sorted = {}
+        self._unhashable = {}
+        self._ordinal = {}
+        self._next_ordinal = 0
+
+    @staticmethod
+    def kind_of(value):
+        if type(value) in (int, float, bool):
+            return AttributeIndex.NUMBER
+        if type(value) is str:
+            return AttributeIndex.STRING
+        return None
+
+    def __len__(self):
+        return len(self._ordinal)
+
+    def __contains__(self, key):
+        return key in self._ordinal
+
+    def clear(self):
+        self._hash = {}
+        self._sorted = {}
+        self._unhashable = {}
+        self._ordinal = {}
+        self._next_ordinal = 0
+
+    def build(self, items):
+        # as add() of each item, but each sorted index is sorted once at the end instead of kept
+        # sorted value by value, which is quadratic in the distinct values of an attribute.
+        self.clear()
+        index = self._hash
+        for key, attrs in items:
+            if key not in self._ordinal:
+                self._ordinal[key] = self._next_ordinal
+                self._next_ordinal += 1
+            for name, value in attrs.items():
+                try:
+                    buckets = index.setdefault(name, {})
+                    bucket = buckets.get(value)
+                except TypeError:
+                    self._unhashable.setdefault(name, set()).add(key)
+                    continue
+                if bucket is None:
+                    buckets[value] = {key}
+                else:
+                    bucket.add(key)
+        for name, buckets in index.items():
+            for value in buckets.keys():
+                kind = self.kind_of(value)
+                if kind is not None:
+                    self._sorted.setdefault(name, {}).setdefault(kind, []).append(value)
+            for values in self._sorted.get(name, {}).values():
+                values.sort()
+
+    def add(self, key, attrs):
+        if key not in self._ordinal:
+            self._ordinal[key] = self._next_ordinal
+            self._next_ordinal += 1
+        for name, value in attrs.items():
+            self.add_value(key, name, value)
+
+    def discard(self, key, attrs):
+        for name, value in attrs.items():
+            self.discard_value(key, name, value)
+        self._ordinal.pop(key, None)
+
+    def add_value(self, key, name, value):
+        try:
+            buckets = self._hash.setdefault(name, {})
+            bucket = buckets.get(value)
+        except TypeError:
+            self._unhashable.setdefault(name, set()).add(key)
+            return
+        if bucket is None:
+            buckets[value] = {key}
+            kind = self.kind_of(value)
+            if kind is not None:
+                insort(self._sorted.setdefault(name, {}).setdefault(kind, []), value)
+        else:
+            bucket.add(key)
+
+    def discard_value(self, key, name, value):
+        try:
+            buckets = self._hash.get(name, {})
+            bucket = buckets.get(value)
+        except TypeError:
+            if name in self._unhashable:
+                self._unhashable[name].discard(key)
+            return
+        if bucket is None:
+            return
+        bucket.discard(key)
+        if len(bucket) == 0:
+            del buckets[value]
+            kind = self.kind_of(value)
+            if kind is not None:
+                values = self._sorted[name][kind]
+                i = bisect_left(values, value)
+                if i < len(values) and values[i] == value:
+                    values.pop(i)
+
+    def update_value(self, key, name, old_exists, old, new):
+        if old_exists:
+            self.discard_value(key, name, old)
+        self.add_value(key, name, new)
+
+    def lookup_eq(self, name, value):
+        try:
+            bucket = self._hash.get(name, {}).get(value, ())
+        except TypeError:
+            return None
+        return set(bucket) | self._unhashable.get(name, set())
+
+    def lookup_range(self, name, op, value):
+        kind = self.kind_of(value)
+        if kind is None:
+            return None
+        values = self._sorted.get(name, {}).get(kind, [])
+        if op == "<":
+            selected = values[:bisect_left(values, value)]
+        elif op == "<=":
+            selected = values[:bisect_right(values, value)]
+        elif op == ">":
+            selected = values[bisect_right(values, value):]
+        elif op == ">=":
+            selected = values[bisect_left(values, value):]
+        else:
+            return None
+        buckets = self._hash.get(name, {})
+        keys = set(self._unhashable.get(name, set()))
+        for v in selected:
+            keys.update(buckets[v])
+        return keys
+
+    def order(self, keys):
+        # restores insertion order, which is the order networkx iterates nodes in.
+        ordinal = self._ordinal
+        return sorted(keys, key=lambda k: ordinal.get(k, -1))
+
+    def candidates(self, specs):
+        # specs are AND-ed like in select_nodes. None means "no restriction".
+        C = None
+        for spec in specs:
+            S = self.plan(spec)
+            if S is None:
+                continue
+            if C is None:
+                C = S
+            else:
+                C = C & S
+        return C
+
+    # operator seen from the symbol side, i.e. "3 < x" is "x > 3"
+    _flipped = {"==": "==", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+    _ops = ((BooleanEqualityEvaluatee, "=="),
+            (BooleanLessOrEqualsEvaluatee, "<="),
+            (BooleanLessThanEvaluatee, "<"),
+            (BooleanGreaterOrEqualsEvaluatee, ">="),
+            (BooleanGreaterThanEvaluatee, ">"))
+
+    @staticmethod
+    def literal_operand(spec, n):
+        if spec.get_symbolic(n):
+            return False
+        return type(spec.operand(n)) in (int, float, bool, str)
+
+    @staticmethod
+    def symbol_operand(spec, n):
+        return spec.get_symbolic(n) and isinstance(spec.operand(n), NetworkSymbol)
+
+    def plan(self, spec):
+        if not isinstance(spec, GenericEvaluatee):
+            return None
+        # non symbolic operands of and/or are not evaluated, so they never restrict.
+        if type(spec) is BooleanConjunctiveEvaluatee:
+            return self.candidates(spec.operand(i) for i in range(spec.arity) if spec.get_symbolic(i))
+        if type(spec) is BooleanDisjunctiveEvaluatee:
+            keys = set()
+            for i in range(spec.arity):
+                if not spec.get_symbolic(i):
+                    return None
+                S = self.plan(spec.operand(i))
+                if S is None:
+                    return None
+                keys |= S
+            return keys
+        for clazz, op in self._ops:
+            if type(spec) is not clazz:
+                continue
+            if self.symbol_operand(spec, 0) and self.literal_operand(spec, 1):
+                name, value = spec.operand(0).symbol, spec.operand(1)
+            elif self.literal_operand(spec, 0) and self.symbol_operand(spec, 1):
+                name, value, op = spec.operand(1).symbol, spec.operand(0), self._flipped[op]
+            else:
+                return None
+            if op == "==":
+                return self.lookup_eq(name, value)
+            return self.lookup_range(name, op, value)
+        return None
@@ -13,6 +13,8 @@ import sys
 import inspect
 from enum import Enum
 import yaml
+import weakref
+import pickle
 
 # project modules
 from networkml.error import NetworkError, NetworkNotImplementationError
@@ -21,21 +23,21 @@ from networkml.generic import GenericEvaluatee
 from networkml.network import ReachabilitySpecification, Numberset, CommandOption, DefaultSorter, NetworkSymbol
 from networkml.network import NetworkReturnValue, NetworkNothing
 from networkml.validator import GenericEvaluatee, UnaryEvaluatee, BinaryEvaluatee, TrueEvaluatee
+from networkml.specindex import AttributeIndex
+from networkml.queryresult import QueryResult
+from networkml.orderedset import OrderedSet, ordered_union, ordered_intersection, ordered_difference, ordered_minus
+from networkml.orderedset import ordered_unique, hash_key
+from networkml.reachability import ReachabilityEngine, ReachabilityPool
+from networkml.snapshot import read_graph, write_graph, represent_odict, construct_odict, is_snapshot_file
+from networkml.mappedgraph import MappedGraph
+from networkml.journal import Journal
+from networkml.spreadsheet import open_workbook, iter_table, batches, Progress, BatchRows, ProgressRows
+from networkml.spreadsheet import collection_paused
+from networkml.tables import read_csv, read_columns, key_column, keyed_rows
 import networkml.genericutils as GU
 from networkml.generic import debug
 
 
-def represent_odict(dumper, instance):
-    return dumper.represent_mapping('tag:yaml.org,2002:map', instance.items())
-
-yaml.add_representer(dict, represent_odict)
-
-def construct_odict(loader, node):
-    return dict(loader.construct_pairs(node))
-
-yaml.add_constructor('tag:yaml.org,2002:map', construct_odict)
-
-
 class SpecValidator(GenericComponent, GenericValidator):
 
     def __init__(self, owner=None):
@@ -170,14 +172,225 @@ class SpecificationGraph(nx.MultiDiGraph):
             self._enable_stack = False
         else:
             self._enable_stack = enable_stack
+        self._node_index = AttributeIndex()
+        self._edge_index = AttributeIndex()
+        # constructed reachability specs -> engines keeping their edge_dict fresh
+        self._constructed = weakref.WeakKeyDictionary()
+        # mutations of a model with a file are journaled next to it, see networkml.journal.
+        self._journal = None
+        self._journaling = True
+        self._compaction_deferred = False
         self.init(N, filename)
         self._validator = SpecValidator()
+        # method name -> {doc kind -> text}, and programs compiled from them. Rebuilt by construct_spec_doc.
+        self._method_docs = {}
+        self._args_checkers = {}
+        self._args_arrangements = {}
         if self._spec_doc is None:
             self.construct_spec_doc()
 
-    def init(self, N: nx.MultiDiGraph, filename=None):
+    def init(self, N: nx.MultiDiGraph, filename=None, journal_records=0):
         self._N = N
         self._filename = filename
+        self.open_journal(filename, journal_records)
+        self.rebuild_index()
+        for engine in self._constructed.values():
+            engine.invalidate()
+
+    @property
+    def node_index(self) -> AttributeIndex:
+        self.ensure_index()
+        return self._node_index
+
+    @property
+    def edge_index(self) -> AttributeIndex:
+        self.ensure_index()
+        return self._edge_index
+
+    def rebuild_index(self):
+        # attribute index is rebuilt from scratch whenever the graph is replaced, on its first use,
+        # so opening a mapped graph does not read every attribute.
+        # Every mutation below must go through _add_node, _set_node_attr, etc. to keep it consistent.
+        self._index_stale = True
+
+    def ensure_index(self):
+        if not self._index_stale:
+            return
+        self._index_stale = False
+        if self._N is None:
+            self._node_index.clear()
+            self._edge_index.clear()
+            return
+        self._node_index.build(self._N.nodes(data=True))
+        self._edge_index.build(((u, v, k), d) for u, v, k, d in self._N.edges(keys=True, data=True))
+
+    @property
+    def is_mapped(self):
+        return isinstance(self._N, MappedGraph)
+
+    def writable(self) -> nx.MultiDiGraph:
+        # a mapped graph is read-only; the first mutation turns it into a MultiDiGraph.
+        if self.is_mapped:
+            debug("materializing graph mapped from {}".format(self._N.filename))
+            self._N = self._N.to_graph()
+        return self._N
+
+    @property
+    def journal_file(self):
+        return None if self._journal is None else self._journal.filename
+
+    def open_journal(self, filename, records=0):
+        if self._journal is not None:
+            try:
+                self._journal.wait()
+            except NetworkError as ex:
+                # its records stay on disk and are replayed when the model is loaded again.
+                debug(ex)
+            self._journal.close()
+        self._journal = None
+        if filename is not None and self._journaling:
+            self._journal = Journal(filename, records)
+
+    def _record(self, *record):
+        if self._journal is None:
+            return
+        try:
+            self._journal.append(*record)
+        except (pickle.PicklingError, TypeError, AttributeError) as ex:
+            debug("journal of {} disabled, record {} can't be written: {}".format(self._filename, record[:2], ex))
+            self._journal.close()
+            self._journal = None
+            return
+        if self._journal.should_compact and not self._compaction_deferred:
+            self.compact()
+
+    def compact(self, background=True):
+        # folds the journal into the model file, writing a copy so the graph stays usable meanwhile.
+        if self._journal is None:
+            return
+        G = self.N if self.is_mapped else self.N.copy()
+        filename = self._filename
+        self._journal.compact(lambda: write_graph(G, filename), background)
+
+    def _add_node(self, n):
+        self.ensure_index()
+        self.writable().add_node(n)
+        self._node_index.add(n, self.N.nodes[n])
+        self._record(Journal.NodeAdded, n)
+        for engine in self._constructed.values():
+            engine.node_added(n)
+
+    def _remove_node(self, n):
+        self.ensure_index()
+        self.writable()
+        for u, v, k in list(self.N.in_edges(n, keys=True)) + list(self.N.out_edges(n, keys=True)):
+            if (u, v, k) in self._edge_index:
+                self._edge_index.discard((u, v, k), self.N[u][v][k])
+            for engine in self._constructed.values():
+                engine.edge_changed(u, v)
+        self._node_index.discard(n, self.N.nodes[n])
+        self.N.remove_node(n)
+        self._record(Journal.NodeRemoved, n)
+        for engine in self._constructed.values():
+            engine.node_removed(n)
+
+    def _set_node_attr(self, n, name, value):
+        value = QueryResult.materialized(value)
+        self.ensure_index()
+        attrs = self.writable().nodes[n]
+        self._node_index.update_value(n, name, name in attrs, attrs.get(name), value)
+        attrs[name] = value
+        self._record(Journal.NodeAttr, n, name, value)
+        for engine in self._constructed.values():
+            engine.node_attr_changed(n, name)
+
+    def _add_edge(self, u, v):
+        self.ensure_index()
+        k = self.writable().add_edge(u, v)
+        self._edge_index.add((u, v, k), self.N[u][v][k])
+        self._record(Journal.EdgeAdded, u, v, k)
+        for engine in self._constructed.values():
+            engine.edge_changed(u, v)
+        return k
+
+    def _remove_edge(self, u, v, k):
+        self.ensure_index()
+        self.writable()
+        self._edge_index.discard((u, v, k), self.N[u][v][k])
+        self.N.remove_edge(u, v, k)
+        self._record(Journal.EdgeRemoved, u, v, k)
+        for engine in self._constructed.values():
+            engine.edge_changed(u, v)
+
+    def _set_edge_attr(self, u, v, k, name, value):
+        value = QueryResult.materialized(value)
+        self.ensure_index()
+        attrs = self.writable()[u][v][k]
+        self._edge_index.update_value((u, v, k), name, name in attrs, attrs.get(name), value)
+        attrs[name] = value
+        self._record(Journal.EdgeAttr, u, v, k, name, value)
+        for engine in self._constructed.values():
+            engine.edge_changed(u, v, name)
+
+    def _add_nodes_from(self, nodes):
+        # bulk _add_node and _set_node_attr of (n, attrs): nodes already there get the attributes.
+        # the attribute index is rebuilt on its next use and reachability engines are invalidated,
+        # which is cheaper than following every element of a bulk insert.
+        # returns the added nodes and the number of rows taken, here all of them.
+        G = self.writable()
+        items = list(nodes)
+        added = list(dict.fromkeys(n for n, _ in items if n not in G))
+        G.add_nodes_from(items)
+        if len(items) > 0:
+            self._record(Journal.NodesAdded, items)
+        self.rebuild_index()
+        for engine in self._constructed.values():
+            engine.invalidate()
+        return added, len(items)
+
+    def _add_edges_from(self, edges, overwrite=True):
+        # bulk newedge of (u, v, attrs) between existing nodes: an edge u -> v is added unless there is
+        # one already, which gets the attributes if overwrite. returns the added (u, v, key)s and the
+        # number of rows taken; rows with an end that is no node are not.
+        G = self.writable()
+        new = {}
+        items = []
+        taken = 0
+        for u, v, attrs in edges:
+            e = (u, v)
+            if e in new:
+                if overwrite:
+                    new[e].update(attrs)
+                taken += 1
+                continue
+            # the {key: attrs} of the pair, without building views per edge.
+            keydict = G.get_edge_data(u, v)
+            if keydict is None:
+                if u not in G or v not in G:
+                    continue
+                new[e] = dict(attrs)
+            elif overwrite:
+                for k, current in keydict.items():
+                    current.update(attrs)
+                    items.append((u, v, k, attrs))
+            taken += 1
+        # the first edge of a pair gets key 0. given explicitly, add_edge skips its key search; attributes
+        # are set on the edge data rather than passed as keywords, which would reject an attribute "key".
+        # add_edges_from goes through add_edge and edge views per edge, about twice as slow.
+        add_edge = G.add_edge
+        edge_data = G.get_edge_data
+        added = []
+        for (u, v), attrs in new.items():
+            add_edge(u, v, 0)
+            edge_data(u, v, 0).update(attrs)
+            added.append((u, v, 0))
+            items.append((u, v, 0, attrs))
+        if len(items) > 0:
+            self._record(Journal.EdgesAdded, items)
+        self.rebuild_index()
+        for engine in self._constructed.values():
+            engine.invalidate()
+        return added, taken
 
     @property
     def validator(self):
@@ -193,6 +406,7 @@ class SpecificationGraph(nx.MultiDiGraph):
             xml = GU.read_xml(descfile)
             root = xml.getroot()
             self._spec_doc = root
+            self.index_spec_doc()
         except Exception as ex:
             debug(ex)
             debug("{} not found. We cannot provide document of our class.".format(descfile))
@@ -203,27 +417,47 @@ class SpecificationGraph(nx.MultiDiGraph):
     def reload_settings(self):
         self.load_settings()
 
-    def find_method_doc(self, method_sig, doc_kind):  # doc_kind in {"doc", "args-requirement"}
+    def index_spec_doc(self):
+        # first method of a name and first doc of a kind win, as the linear scan did.
+        self._method_docs = {}
+        self._args_checkers = {}
+        self._args_arrangements = {}
         for m in self._spec_doc:
             # m.text, m.attrib, m.tag
-            if m.tag == "method" and m.attrib["name"] == method_sig:
-                for n in m:
-                    if n.tag == doc_kind:
-                        return n.text
-        return None
+            if m.tag != "method" or m.attrib["name"] in self._method_docs.keys():
+                continue
+            docs = {}
+            for n in m:
+                if n.tag not in docs.keys():
+                    docs[n.tag] = n.text
+            self._method_docs[m.attrib["name"]] = docs
+
+    def find_method_doc(self, method_sig, doc_kind):  # doc_kind in {"doc", "args-requirement"}
+        docs = self._method_docs.get(method_sig)
+        if docs is None:
+            return None
+        return docs.get(doc_kind)
+
+    def args_arrangement(self, sig):
+        # option tags per argument position, None if the method has no arrangement.
+        if sig not in self._args_arrangements.keys():
+            arrange_doc = self.find_method_doc(sig, "args-arrangement")
+            tags_list = None
+            if arrange_doc is not None:
+                tags_list = []
+                for d in arrange_doc.split("\n"):
+                    d = d.replace(" ", "")
+                    d = d.replace("\t", "")
+                    tags = d.split(",")
+                    if tags[0] != "":
+                        tags_list.append(tags)
+            self._args_arrangements[sig] = tags_list
+        return self._args_arrangements[sig]
 
     def arrange_args(self, caller, sig, args):
-        arrange_doc = self.find_method_doc(sig, "args-arrangement")
-        if arrange_doc is None:
+        tags_list = self.args_arrangement(sig)
+        if tags_list is None:
             return args
-        doc = arrange_doc.split("\n")
-        tags_list = []
-        for i, d in enumerate(doc):
-            d = d.replace(" ", "")
-            d = d.replace("\t", "")
-            tags = d.split(",")
-            if tags[0] != "":
-                tags_list.append(tags)
         # At first, generates None value options
         new_args = [CommandOption("--{}".format(ts[0]), None, has_assignee=False) for ts in tags_list]
         for a in args:
@@ -237,6 +471,15 @@ class SpecificationGraph(nx.MultiDiGraph):
                 debug("{} was ignored.".format(a))
         return new_args
 
+    def args_checker(self, caller, args, method_sig):
+        # requirement programs don't depend on args (conditions are lambdas of caller and args), so compiled once.
+        if method_sig not in self._args_checkers.keys():
+            checker = self.build_args_checker(caller, args, method_sig)
+            if checker is None:
+                return None
+            self._args_checkers[method_sig] = checker
+        return self._args_checkers[method_sig]
+
     def build_args_checker(self, caller, args, method_sig):
         program = []
         i = -1
@@ -355,7 +598,7 @@ class SpecificationGraph(nx.MultiDiGraph):
         # arrange arguments
         args = self.arrange_args(caller, method_sig, args)
 
-        checker = self.build_args_checker(caller, args, method_sig)
+        checker = self.args_checker(caller, args, method_sig)
         i = 0
         while True:
             step: dict = checker[i]
@@ -376,7 +619,7 @@ class SpecificationGraph(nx.MultiDiGraph):
                     i = step['else']
                 continue
             elif step['statement'] == 'refer':
-                checker = self.build_args_checker(caller, args, step['jump'])
+                checker = self.args_checker(caller, args, step['jump'])
                 i = 0
                 continue
 
@@ -500,33 +743,20 @@ class SpecificationGraph(nx.MultiDiGraph):
             else:
                 validator = caller.validator
             E = []
+            src_pred = self.spec_predicate(caller, [src_spec], validator)
+            dst_pred = self.spec_predicate(caller, [dst_spec], validator)
             for u in src_nodes:  # for each u in U
-                if isinstance(validator, SpecValidator):
-                    validator.set_evaluation_target(self.N.nodes[u], GenericValidatorParam.VALIDATE_AS_TAG)
-                result = src_spec.evaluate(caller)
-                if isinstance(validator, SpecValidator):
-                    validator.reverse_evaluation_policy()
-                if not result:
+                if not src_pred(self.N.nodes[u]):
                     continue
                 for v in dst_nodes:  # for each v in V
-                    if isinstance(validator, SpecValidator):
-                        validator.set_evaluation_target(self.N.nodes[v], GenericValidatorParam.VALIDATE_AS_TAG)
-                    result = dst_spec.evaluate(caller)
-                    if isinstance(validator, SpecValidator):
-                        validator.reverse_evaluation_policy()
-                    if not result:
+                    if not dst_pred(self.N.nodes[v]):
                         continue
                     for e in edges:  # for each e in E
                         if u != e[0] or v != e[1]:
                             continue
                         for k in self.N[u][v].keys():
                             # e = self.N[u][v][k]
-                            if isinstance(validator, SpecValidator):
-                                validator.set_evaluation_target(self.N[u][v][k], GenericValidatorParam.VALIDATE_AS_TAG)
-                            result = dst_spec.evaluate(caller)
-                            if isinstance(validator, SpecValidator):
-                                validator.reverse_evaluation_policy()
-                            if not result:
+                            if not dst_pred(self.N[u][v][k]):
                                 continue
                             if with_data:
                                 E.append((u, v, k, self.N[u][v][k]))
@@ -642,15 +872,9 @@ class SpecificationGraph(nx.MultiDiGraph):
                 ret = self.help_check("nodes_product", caller, args)
                 if ret is not None:
                     return ret
-            U = args[0].value
-            U = self.resolve_symbol(caller, U)
-            V = args[1].value
-            V = self.resolve_symbol(caller, V)
-            node_product = []
-            for u in U:
-                for v in V:
-                    node_product.append((u, v))
-            return node_product
+            U = QueryResult.reiterable(self.resolve_symbol(caller, args[0].value))
+            V = QueryResult.reiterable(self.resolve_symbol(caller, args[1].value))
+            return QueryResult(lambda: ((u, v) for u in U for v in V), lambda: len(U) * len(V))
         except Exception as ex:
             raise NetworkError("nodes_product failed:{}".format(args), ex)
 
@@ -660,12 +884,9 @@ class SpecificationGraph(nx.MultiDiGraph):
                 ret = self.help_check("edges_to_nodes_product", caller, args)
                 if ret is not None:
                     return ret
-            node_product = []
+            # distinct (u, v) of edges in order of appearance, O(|edges|).
             edges = args[0].value
-            for e in edges:
-                if (e[0], e[1]) not in node_product:
-                    node_product.append((e[0], e[1]))
-            return node_product
+            return list(ordered_unique((e[0], e[1]) for e in edges))
         except Exception as ex:
             raise NetworkError("edges_to_nodes_product failed:{}".format(args), ex)
 
@@ -675,13 +896,10 @@ class SpecificationGraph(nx.MultiDiGraph):
                 ret = self.help_check("subtract_nodes_product", caller, args)
                 if ret is not None:
                     return ret
+            # elements of U not in V, in order of U, O(|U| + |V|).
             U = args[0].value
             V = args[1].value
-            N = []
-            for u in U:
-                if u not in V:
-                    N.append(u)
-            return N
+            return list(ordered_difference(U, V))
         except Exception as ex:
             raise NetworkError("subtract_nodes_product failed:{}".format(args), ex)
 
@@ -701,16 +919,19 @@ class SpecificationGraph(nx.MultiDiGraph):
                 overwrite = False
             E = []
             for e in P:
+                # as newedge, pairs with an end that is no node are skipped: the edge would add it
+                # outside _add_node, unknown to the index, the journal and the reachability engines.
+                if e[0] not in self.N.nodes or e[1] not in self.N.nodes:
+                    continue
                 if not (e[0] in self.N.nodes or e[1] in self.N[e[0]].keys()):
                     if not overwrite:
                         continue
                 else:
-                    self.N.add_edge(e[0], e[1])
+                    self._add_edge(e[0], e[1])
                     E.append((e[0], e[1], attrs))
                 for k in self.N[e[0]][e[1]].keys():
-                    e = self.N[e[0]][e[1]][k]
                     for a in attrs:
-                        e[a.l] = a.r
+                        self._set_edge_attr(e[0], e[1], k, a.l, a.r)
                 # o1 = CommandOption("-u", [e[0]], has_assignee=True)
                 # o2 = CommandOption("-v", [e[1]], has_assignee=True)
                 # o3 = CommandOption("-a", attrs, has_assignee=True)
@@ -727,19 +948,24 @@ class SpecificationGraph(nx.MultiDiGraph):
                 ret = self.help_check("project", caller, args)
                 if ret is not None:
                     return ret
-            src_set = args[0].value
+            src_set = QueryResult.reiterable(args[0].value)
             numbers = args[1].value
-            dst_set = []
-            for s in src_set:
-                d = []
-                for i in numbers:
-                    d.append(s[i])
-                if d not in dst_set:
-                    dst_set.append(d)
-            return dst_set
+            return QueryResult(lambda: self.iter_project(src_set, numbers))
         except Exception as ex:
             raise NetworkError("project failed:{}".format(args), ex)
 
+    def iter_project(self, src_set, numbers):
+        # distinct rows in order of first appearance, O(|src_set| * |numbers|).
+        seen = set()
+        for s in src_set:
+            d = []
+            for i in numbers:
+                d.append(s[i])
+            k = hash_key(d)
+            if k not in seen:
+                seen.add(k)
+                yield d
+
     @property
     def N(self) -> nx.MultiDiGraph:
         return self._N
@@ -749,6 +975,7 @@ class SpecificationGraph(nx.MultiDiGraph):
         return self._filename
 
     def analyze_reach_segments(self, caller, spec: ReachabilitySpecification, S, D):
+        self.refresh_spec_network(caller, spec)
         result = []
         edge_dict = spec.edge_dict
         for seg_idx, seg in enumerate(sorted(edge_dict.keys())):
@@ -777,6 +1004,7 @@ class SpecificationGraph(nx.MultiDiGraph):
 
     def analyze_reachable(self, caller, spec: ReachabilitySpecification, seg, dep):
         try:
+            self.refresh_spec_network(caller, spec)
             if seg not in spec.edge_dict.keys():
                 return False, "Invalid edge key:{}".format(seg)
             Q = spec.edge_dict[seg][ReachabilitySpecification.QUANTIFIER]
@@ -794,8 +1022,48 @@ class SpecificationGraph(nx.MultiDiGraph):
             raise NetworkError("reachable failed. spec:{}, seg:{}, depth:{}".format(spec, seg, dep), ex)
 
     def analyze_reach_loopback(self, caller, spec: ReachabilitySpecification, _from, _to):
-        raise NetworkNotImplementationError("{} not implementd.".format("analyze_reach_loopback"))
-        pass
+        # segment j (in _from) loops back to segment i (in _to, i <= j) if a destination of j reaches
+        # a source of i in the subgraph filtered by the spec. Answered by the cycle index of the engine.
+        try:
+            self.refresh_spec_network(caller, spec)
+            engine = self._constructed.get(spec)
+            if engine is None:
+                return [(False, {"from": None, "to": None, "message": "Specification is not constructed.",
+                                 "loopback": False})]
+            index = engine.loopback
+            keys = sorted(spec.edge_dict.keys())
+            result = []
+            for j, seg_from in enumerate(keys):
+                if not _from.contains(j+1):
+                    continue
+                for i, seg_to in enumerate(keys[:j+1]):
+                    if not _to.contains(i+1):
+                        continue
+                    if index.loops_back(j, i):
+                        result.append((True, {"from": seg_from, "to": seg_to, "loopback": True,
+                                              "message": "Segment {} loops back to segment {}".format(j+1, i+1)}))
+                    else:
+                        result.append((False, {"from": seg_from, "to": seg_to, "loopback": False,
+                                               "message": "Segment {} doesn't loop back to segment {}".format(j+1, i+1)}))
+            return result
+        except Exception as ex:
+            raise NetworkError("analyze_reach_loopback failed. spec:{}, from:{}, to:{}".format(spec, _from, _to), ex)
+
+    def witness_paths(self, caller, spec: ReachabilitySpecification, seg, dep, targets=None, max_paths=1,
+                      max_length=None, max_frontier=None):
+        # witness paths of segment seg (1 origin, as analyze_reach_segments) at depth dep, shortest first.
+        # Returns a generator, paths are enumerated while it is iterated and stop at the caps.
+        try:
+            self.refresh_spec_network(caller, spec)
+            engine = self._constructed.get(spec)
+            if engine is None:
+                raise NetworkError("Specification is not constructed:{}".format(spec))
+            if seg < 1 or len(spec.edge_dict.keys()) < seg:
+                raise NetworkError("invalid segment:{}".format(seg))
+            return engine.witness_paths(seg-1, dep, targets=targets, max_paths=max_paths, max_length=max_length,
+                                        max_frontier=max_frontier)
+        except Exception as ex:
+            raise NetworkError("witness_paths failed. spec:{}, seg:{}, depth:{}".format(spec, seg, dep), ex)
 
     def check_reachability(self, caller, spec: ReachabilitySpecification, seg, depth, loopback, _from, _to):
         if seg is not None:
@@ -858,6 +1126,7 @@ class SpecificationGraph(nx.MultiDiGraph):
 
     def reachable(self, caller, spec: ReachabilitySpecification, seg, dep):
         try:
+            self.refresh_spec_network(caller, spec)
             keys = sorted(spec.edge_dict.keys())
             if seg < 0 or len(keys)-1 < seg:
                 return False, "invalid segment:{}".format(seg)
@@ -878,19 +1147,49 @@ class SpecificationGraph(nx.MultiDiGraph):
         except Exception as ex:
             raise NetworkError("reachable failed:{}".format(spec, seg, dep), ex)
 
-    def construct_spec_network(self, caller, spec: ReachabilitySpecification):
+    @staticmethod
+    def prepare_spec_network(spec: ReachabilitySpecification):
+        edge_connection = spec.serialize()
+        dic = {}
+        spec.edge_dictionary(dic, edge_connection, [], "TOP")
+        spec._edge_dict = dic
+
+    def construct_spec_network(self, caller, spec: ReachabilitySpecification, backend=None):
         try:
-            edge_connection = spec.serialize()
-            dic = {}
-            spec.edge_dictionary(dic, edge_connection, [], "TOP")
-            spec._edge_dict = dic
-            edge_dict = spec.edge_dict
+            self.prepare_spec_network(spec)
             # construct forward network
-            for seg in sorted(edge_dict.keys()):
-                self.collect_edge_dst_nodes(caller, spec, seg)
+            engine = ReachabilityEngine(self, caller, backend=backend)
+            engine.construct(spec)
+            self._constructed[spec] = engine
         except Exception as ex:
             raise NetworkError("construct_spec_network failed:{}".format(spec), ex)
 
+    def construct_spec_networks(self, caller, specs, backend=None, workers=None):
+        # constructs a batch of specs, on a pool of worker processes if workers is given.
+        try:
+            if workers is None:
+                for spec in specs:
+                    self.construct_spec_network(caller, spec, backend=backend)
+                return
+            for spec in specs:
+                self.prepare_spec_network(spec)
+            pool = ReachabilityPool(self, caller, workers, backend=backend)
+            for spec, engine in zip(specs, pool.construct(specs)):
+                self._constructed[spec] = engine
+        except Exception as ex:
+            raise NetworkError("construct_spec_networks failed:{}".format(specs), ex)
+
+    def refresh_spec_network(self, caller, spec: ReachabilitySpecification):
+        # applies graph mutations since the last construct/refresh to edge_dict of spec.
+        # Mutations are only recorded when they happen, so a batch of them is applied at once here.
+        try:
+            engine = self._constructed.get(spec)
+            if engine is None:
+                return False
+            return engine.refresh()
+        except Exception as ex:
+            raise NetworkError("refresh_spec_network failed:{}".format(spec), ex)
+
     def collect_edge_eventual_dst_nodes(self, caller, spec: ReachabilitySpecification, seg):
         try:
             eventual_dst_nodes = []
@@ -920,7 +1219,7 @@ class SpecificationGraph(nx.MultiDiGraph):
                 opt_spec = CommandOption("-spec", [src_spec], has_assignee=True)
                 opt_cand = CommandOption("-candidates", has_assignee=False)
                 opt_data = CommandOption("-with_data", has_assignee=False)
-                src_nodes = self.collect_nodes(caller, (opt_spec, opt_cand, opt_data))
+                src_nodes = self.collect_nodes(caller, (opt_spec, opt_cand, opt_data)).materialize()
             else:
                 prev_seg = keys[seg_idx-1]
                 src_nodes = self.collect_edge_eventual_dst_nodes(caller, spec, prev_seg)
@@ -940,6 +1239,7 @@ class SpecificationGraph(nx.MultiDiGraph):
                 opt_dst_spec = CommandOption("-dst_spec", [dst_spec], has_assignee=True)
                 opt_data = CommandOption("-with_data", has_assignee=False)
                 dst_nodes = self.collect_dst_nodes(caller, (opt_src_nodes, opt_edge_spec, opt_dst_spec, opt_data))
+                dst_nodes = dst_nodes.materialize()
                 depths[i][ReachabilitySpecification.DST_NODES] = dst_nodes
                 depths[i][ReachabilitySpecification.DST_REACHABLE] = len(dst_nodes) != 0
                 if not depths[i][ReachabilitySpecification.DST_REACHABLE]:  # stop here, forward disabled
@@ -976,39 +1276,87 @@ class SpecificationGraph(nx.MultiDiGraph):
         else:
             edge_specs = ()
         if args[1].has_assignee:
-            D = args[1].value
+            D = QueryResult.reiterable(args[1].value)
         else:
             D = None
         if args[2].has_assignee:
             with_data = args[2].value
         else:
             with_data = False
-        if D is None:
-            D = [_ for _ in self.N.edges(keys=True, data=with_data)]
-        E = []
         # validator setup
         if caller is None:
             validator = self.validator
         else:
             validator = caller.validator
+        size = None
+        if D is None and len(edge_specs) == 0:
+            size = self.N.number_of_edges
+        return QueryResult(lambda: self.iter_edges(caller, edge_specs, D, with_data, validator), size)
+
+    def iter_edges(self, caller, edge_specs, D, with_data, validator):
+        # edges of D (or the whole graph) satisfying edge_specs, one pass of collect_edges.
+        C = self.index_candidates(self.edge_index, edge_specs, validator)
+        if D is None:
+            if C is None:
+                D = list(self.N.edges(keys=True, data=True))
+            else:
+                D = [(u, v, k, self.N[u][v][k]) for u, v, k in self._edge_index.order(C)]
+        elif C is not None:
+            D = (e for e in D if (e[0], e[1], e[2]) in C)
+        P = self.spec_predicate(caller, edge_specs, validator)
         for e in D:
-            done = True
-            for a in edge_specs:
+            if P(e[3]):
+                if with_data:
+                    yield e
+                else:
+                    yield e[0], e[1], e[2]
+
+    def index_candidates(self, index: AttributeIndex, specs, validator):
+        # equality and range predicates are answered from the attribute index.
+        # returns None if the specs cannot be narrowed, and a full scan is required.
+        if not isinstance(validator, SpecValidator):
+            return None
+        return index.candidates(specs)
+
+    def spec_predicate(self, caller, specs, validator):
+        # AND-ed specs as one predicate over an attribute dict.
+        # compiled predicates of evaluatees are used if all of them are compilable,
+        # otherwise specs are interpreted through the validator as before.
+        predicates = []
+        if isinstance(validator, SpecValidator):
+            for a in specs:
+                p = getattr(a, "predicate", None)
+                if p is None:
+                    predicates = None
+                    break
+                predicates.append(p)
+        else:
+            predicates = None
+        if predicates is not None:
+            if len(predicates) == 1:
+                return predicates[0]
+
+            def compiled(attrs):
+                for p in predicates:
+                    if not p(attrs):
+                        return False
+                return True
+            return compiled
+
+        def interpreted(attrs):
+            for a in specs:
                 if isinstance(a, GenericEvaluatee):
-                    validator.set_evaluation_target(e[3], GenericValidatorParam.VALIDATE_AS_TAG)
+                    if isinstance(validator, SpecValidator):
+                        validator.set_evaluation_target(attrs, GenericValidatorParam.VALIDATE_AS_TAG)
                     result = a.evaluate(caller)
-                    validator.reverse_evaluation_policy()
+                    if isinstance(validator, SpecValidator):
+                        validator.reverse_evaluation_policy()
                 else:
                     result = a.value
                 if not result:
-                    done = False
-                    break
-            if done:
-                if with_data:
-                    E.append(e)
-                else:
-                    E.append((e[0], e[1], e[2]))
-        return E
+                    return False
+            return True
+        return interpreted
 
     def collect_args(self, caller, args, type_list=()):
         holder = [[] for _ in type_list]
@@ -1028,39 +1376,43 @@ class SpecificationGraph(nx.MultiDiGraph):
         else:
             node_specs = ()
         if args[1].has_assignee:
-            N = args[1].value
+            N = QueryResult.reiterable(args[1].value)
         else:
             N = None
-        if N is None:
-            N = [_ for _ in self.N.nodes]
         if args[2].has_assignee:
             with_data = args[2].value
         else:
             with_data = False
-        V = []
         # validator setup
         if caller is None:
             validator = self.validator
         else:
             validator = caller.validator
+        size = None
+        if N is None and len(node_specs) == 0:
+            size = self.N.number_of_nodes
+        return QueryResult(lambda: self.iter_nodes(caller, node_specs, N, with_data, validator), size)
+
+    def iter_nodes(self, caller, node_specs, N, with_data, validator):
+        # nodes of N (or the whole graph) satisfying node_specs, one pass of select_nodes.
+        # node ids are listed before the first one is yielded, so the graph may be changed while iterating.
+        C = self.index_candidates(self.node_index, node_specs, validator)
+        if N is None:
+            if C is None:
+                N = list(self.N.nodes)
+            else:
+                N = self._node_index.order(C)
+        elif C is not None:
+            N = (n for n in N if n in C)
+        P = self.spec_predicate(caller, node_specs, validator)
+        nodes = self.N.nodes
         for n in N:
-            done = True
-            for a in node_specs:
-                if isinstance(a, GenericEvaluatee):
-                    validator.set_evaluation_target(self.N.nodes[n], GenericValidatorParam.VALIDATE_AS_TAG)
-                    result = a.evaluate(caller)
-                    validator.reverse_evaluation_policy()
-                else:
-                    result = a.value
-                if not result:
-                    done = False
-                    break
-            if done:
+            attrs = nodes[n]
+            if P(attrs):
                 if with_data:
-                    V.append((n, self.N.nodes[n]))
+                    yield n, attrs
                 else:
-                    V.append(n)
-        return V
+                    yield n
 
     def collect_nodes(self, caller, args):
         if len(args) > 0:
@@ -1090,45 +1442,34 @@ class SpecificationGraph(nx.MultiDiGraph):
             if len(args) > 3:
                 if args[3].has_assignee:
                     with_data = args[3].value
-            D = []
             if caller.validator is None:
                 validator = self.validator
             else:
                 validator = caller.validator
+            src_nodes = QueryResult.reiterable(src_nodes)
+            return QueryResult(lambda: self.iter_dst_nodes(caller, src_nodes, edge_specs, dst_specs, with_data,
+                                                           validator, args))
+        except Exception as ex:
+            raise NetworkError("collect_dst_nodes failed:{}".format(args), ex)
+
+    def iter_dst_nodes(self, caller, src_nodes, edge_specs, dst_specs, with_data, validator, args=()):
+        # distinct nodes reached from src_nodes over an edge satisfying edge_specs, one pass of collect_dst_nodes.
+        try:
+            P = self.spec_predicate(caller, dst_specs, validator)
+            Q = self.spec_predicate(caller, edge_specs, validator)
+            seen = set()
             for u in src_nodes:
-                for v in self.N[u].keys():
-                    done = True
-                    for a in dst_specs:
-                        if isinstance(validator, SpecValidator):
-                            validator.set_evaluation_target(self.N.nodes[v], GenericValidatorParam.VALIDATE_AS_TAG)
-                        result = a.evaluate(caller)
-                        if isinstance(validator, SpecValidator):
-                            validator.reverse_evaluation_policy()
-                        if not result:
-                            done = False
-                            break
-                    if not done:
+                for v, keys in self.N[u].items():
+                    if v in seen or not P(self.N.nodes[v]):
                         continue
-                    for k in self.N[u][v].keys():
-                        done = True
-                        for a in edge_specs:
-                            if isinstance(validator, SpecValidator):
-                                validator.set_evaluation_target(self.N[u][v][k], GenericValidatorParam.VALIDATE_AS_TAG)
-                            result = a.evaluate(caller)
-                            if isinstance(validator, SpecValidator):
-                                validator.reverse_evaluation_policy()
-                            if not result:
-                                done = False
-                                break
-                        if not done:
-                            continue
-                        if v not in D:
+                    for attrs in keys.values():
+                        if Q(attrs):
+                            seen.add(v)
                             if with_data:
-                                D.append((v, self.N.nodes[v]))
+                                yield v, self.N.nodes[v]
                             else:
-                                D.append(v)
+                                yield v
                             break
-            return D
         except Exception as ex:
             raise NetworkError("collect_dst_nodes failed:{}".format(args), ex)
 
@@ -1154,14 +1495,24 @@ class SpecificationGraph(nx.MultiDiGraph):
             ret = self.help_check("minus", caller, args)
             if ret is not None:
                 return ret
+        # one occurrence of x removed per element of y, O(|x| + |y|). the order of x is kept.
         x = args[0]
         y = args[1]
-        if type(x) is list and type(y) is list:
-            z = x.copy()
-            for a in y:
-                if a in z:
-                    z.remove(a)
+        if isinstance(x, OrderedSet):
+            if isinstance(y, (list, tuple, QueryResult, OrderedSet)):
+                return x - y
+            z = OrderedSet(x)
+            z.discard(y)
             return z
+        if isinstance(x, QueryResult) or (type(x) is list and isinstance(y, (QueryResult, OrderedSet))):
+            x = QueryResult.reiterable(x)
+            if isinstance(y, (list, tuple, QueryResult, OrderedSet)):
+                removed = y
+            else:
+                removed = [y]
+            return QueryResult(lambda: ordered_minus(x, removed))
+        if type(x) is list and type(y) is list:
+            return list(ordered_minus(x, y))
         elif type(x) is list and type(y) is not list:
             z = x.copy()
             if y in x:
@@ -1204,10 +1555,10 @@ class SpecificationGraph(nx.MultiDiGraph):
             for n in candidates:
                 if n in self.N.nodes and not overwrite:
                     continue
-                self.N.add_node(n)
+                self._add_node(n)
                 for a in specs:
                     if isinstance(a, BinaryEvaluatee):
-                        self.N.nodes[n][a.l] = a.r
+                        self._set_node_attr(n, a.l, a.r)
             return candidates
         except Exception as ex:
             raise NetworkError("deledges failed:{}".format(args), ex)
@@ -1234,13 +1585,13 @@ class SpecificationGraph(nx.MultiDiGraph):
         for c in C:
             if c not in self.N.nodes:
                 exists = False
-                self.N.add_node(c)
+                self._add_node(c)
                 N.append(c)
             else:
                 exists = False
             if ow or not exists:
                 for s in S:
-                    self.N.nodes[c][s.l] = s.r
+                    self._set_node_attr(c, s.l, s.r)
         return N
 
     def newnodes(self, caller, args):
@@ -1262,8 +1613,9 @@ class SpecificationGraph(nx.MultiDiGraph):
                 ret = self.help_check("newedge", caller, args)
                 if ret is not None:
                     return ret
-            U = args[0].value
-            V = args[1].value
+            # materialized before edges are added: a query over the graph must not see them.
+            U = QueryResult.materialized(args[0].value)
+            V = QueryResult.materialized(args[1].value)
             if args[2].has_assignee:
                 A = args[2].value
             else:
@@ -1288,15 +1640,12 @@ class SpecificationGraph(nx.MultiDiGraph):
                             for ek in EK:
                                 for spec in A:
                                     spec: BinaryEvaluatee = spec
-                                    self.N[u][v][ek][spec.l] = spec.r
+                                    self._set_edge_attr(u, v, ek, spec.l, spec.r)
                     else:
-                        self.N.add_edge(u, v)
-                        key = 1
-                        for key in self.N[u][v].keys():
-                            break
+                        key = self._add_edge(u, v)
                         for spec in A:
                             spec: BinaryEvaluatee = spec
-                            self.N[u][v][key][spec.l] = spec.r
+                            self._set_edge_attr(u, v, key, spec.l, spec.r)
                         new_edge = (u, v, key, A)
                         E.append(new_edge)
             return E
@@ -1330,9 +1679,9 @@ class SpecificationGraph(nx.MultiDiGraph):
                 node_can = CommandOption("-candidates", candidates, has_assignee=True)
             data_opt = CommandOption("-data", False, has_assignee=False)
             if candidates is None:
-                candidates = self.collect_nodes(caller, (spec_opt, node_can, data_opt))
+                candidates = self.collect_nodes(caller, (spec_opt, node_can, data_opt)).materialize()
             for n in candidates:
-                self.N.remove_node(n)
+                self._remove_node(n)
             return candidates
         except Exception as ex:
             raise NetworkError("delnodes failed:{}".format(args), ex)
@@ -1356,9 +1705,9 @@ class SpecificationGraph(nx.MultiDiGraph):
                 candidates = [_ for _ in self.N.edges]
                 can = CommandOption("-edges", candidates)
             data_opt = CommandOption("--with_data", False, has_assignee=True)
-            candidates = self.collect_edges(caller, (spec, can, data_opt))
+            candidates = self.collect_edges(caller, (spec, can, data_opt)).materialize()
             for e in candidates:
-                self.N.remove_edge(e[0], e[1], e[2])
+                self._remove_edge(e[0], e[1], e[2])
             return candidates
         except Exception as ex:
             raise NetworkError("deledges failed:{}".format(args), ex)
@@ -1398,12 +1747,21 @@ class SpecificationGraph(nx.MultiDiGraph):
             debug(arg)
             caller.print_buf.append(arg)
 
-    def load(self, caller, filename) -> None:
+    def load(self, caller, filename, mapped=False) -> None:
         try:
-            with open(filename, "r") as f:
-                N = yaml.load(f, Loader=yaml.Loader)
-                # N = nx.read_yaml(filename)
-                self.init(N, filename)
+            # binary snapshot or YAML, by extension. mapped snapshots are opened read-only in place.
+            if mapped and is_snapshot_file(filename):
+                N = MappedGraph(filename)
+            else:
+                N = read_graph(filename)
+            # N = nx.read_yaml(filename)
+            # then the mutations journaled since it was written.
+            records = 0
+            if Journal.exists(filename):
+                if isinstance(N, MappedGraph):
+                    N = N.to_graph()
+                records = Journal.replay(N, filename)
+            self.init(N, filename, records)
         except Exception as ex:
             debug("file open failed. no infection to current graph.")
             raise NetworkError("load file failed:{}".format(filename), ex)
@@ -1414,21 +1772,57 @@ class SpecificationGraph(nx.MultiDiGraph):
                 if self._filename is None:
                     debug("filename not specified")
                 else:
-                    with open(self.filename, "w") as f:
-                        yaml.dump(self.N, f)
+                    if self._journal is not None:
+                        self._journal.wait()
+                    write_graph(self.N, self.filename)
                     # nx.write_yaml(self.N, self.filename)
                     # self.dirty = False
+                    if self._journal is not None:
+                        self._journal.reset()
             else:
                 filename = args[0]
                 filename = os.getcwd() + "\\" + "{}".format(filename)
-                with open(filename, "w") as f:
-                    yaml.dump(self.N, f)
+                write_graph(self.N, filename)
                 # nx.write_yaml(self.N, filename)
                 self._filename = filename
+                self.open_journal(filename)
+                if self._journal is not None:
+                    self._journal.reset()
         except Exception as ex:
             debug("file save failed. no infection to current graph.")
             raise NetworkError("save file failed:({})".format(args), ex)
 
+    def journal(self, caller, args):
+        # journal(), journal(-sync), journal(-compact), journal(-off), journal(-on)
+        try:
+            if len(args) > 0:
+                ret = self.help_check("journal", caller, args)
+                if ret is not None:
+                    return ret
+            for a in args:
+                if not isinstance(a, CommandOption):
+                    raise NetworkError("unknown journal argument:{}".format(a))
+                if a.name == "sync":
+                    if self._journal is not None:
+                        self._journal.sync()
+                elif a.name == "compact":
+                    self.compact(background=False)
+                elif a.name == "off":
+                    self._journaling = False
+                    self.open_journal(None)
+                elif a.name == "on":
+                    self._journaling = True
+                    if self._journal is None:
+                        self.open_journal(self._filename)
+                else:
+                    raise NetworkError("unknown journal option:{}".format(a))
+            if self._journal is None:
+                return {"file": None, "records": 0, "compacting": False}
+            return {"file": self._journal.filename, "records": self._journal.records,
+                    "compacting": self._journal.is_compacting}
+        except Exception as ex:
+            raise NetworkError("journal error:{}".format(args), ex)
+
     def getcwd(self, caller):
         try:
             path = os.getcwd()
@@ -1455,7 +1849,25 @@ class SpecificationGraph(nx.MultiDiGraph):
                 spec = spec.value
             opt_cmd = args[1]
             if opt_cmd.name in ("construct", "con"):
-                self.construct_spec_network(caller, spec)
+                backend = None
+                if len(args) > 5 and args[5].has_assignee:
+                    backend = args[5].value
+                    if isinstance(backend, NetworkSymbol):
+                        backend = backend.value
+                    if backend[0] == "\"" and backend[len(backend)-1] == "\"":
+                        backend = backend[1:len(backend)-1]
+                workers = None
+                if len(args) > 6 and args[6].has_assignee:
+                    workers = args[6].value
+                    if isinstance(workers, NetworkSymbol):
+                        workers = workers.value
+                if type(spec) is list:
+                    specs = [s.value if isinstance(s, NetworkSymbol) else s for s in spec]
+                    self.construct_spec_networks(caller, specs, backend=backend, workers=workers)
+                elif workers is not None:
+                    self.construct_spec_networks(caller, [spec], backend=backend, workers=workers)
+                else:
+                    self.construct_spec_network(caller, spec, backend=backend)
                 rtn = NetworkReturnValue(spec, True, "successed")
                 return rtn
             elif opt_cmd.name in ("reach", "reachability"):
@@ -1506,6 +1918,21 @@ class SpecificationGraph(nx.MultiDiGraph):
                         return NetworkReturnValue(None, False, "Unknown error")
                     rtn = NetworkReturnValue(rtn, True, "success")
                     return rtn
+                elif opt_act.name in ("witness", "wit"):
+                    seg = opt_act.value
+                    if isinstance(seg, NetworkSymbol):
+                        seg = seg.value
+                    depth = args[3].value
+                    if isinstance(depth, NetworkSymbol):
+                        depth = depth.value
+                    paths = 1
+                    if len(args) > 7 and args[7].has_assignee:
+                        paths = args[7].value
+                        if isinstance(paths, NetworkSymbol):
+                            paths = paths.value
+                    rtn = [_ for _ in self.witness_paths(caller, spec, seg, depth, max_paths=paths)]
+                    rtn = NetworkReturnValue(rtn, True, "success")
+                    return rtn
                 else:
                     rtn = NetworkReturnValue(None, False, "Unknown sub-command '{}' for command 'reach'".format(opt_act.name))
                     return rtn
@@ -1524,73 +1951,142 @@ class SpecificationGraph(nx.MultiDiGraph):
                 return ret
         attrib = args[2].value
         opt = CommandOption("-data", False, has_assignee=True)
-        N = self.collect_nodes(caller, (args[0], args[1], opt))
+        N = self.collect_nodes(caller, (args[0], args[1], opt)).materialize()
         for n in N:
             for a in attrib:
-                self.N.nodes[n][a.l] = a.r
+                self._set_node_attr(n, a.l, a.r)
                 debug(n, "->", a.l, "=", a.r)
         return N
 
     def import_xlsx(self, caller, args):
-        # "graph.xlsx", (Nodes, start_row, id_col, attr1, attr2,..),
-        #               (Edges, start_row, src_id_col, dst_id_col, attr1, attr2,..)
+        # "graph.xlsx", (Nodes, id_col, start_row, attr_col1, attr_col2,..),
+        #               (Edges, src_id_col, dst_id_col, start_row, attr_col1, attr_col2,..),
+        #               -batch=rows per bulk insert, -progress=rows per progress report (0 for none)
+        # sheets are streamed and inserted batch by batch, attribute names come from the first row.
         try:
             if len(args) > 0:
                 ret = self.help_check("import_xlsx", caller, args)
                 if ret is not None:
                     return ret
-            filename = args[0]
-            wb = openpyxl.load_workbook(filename, data_only=True)
-            # load nodes
-            nodes = []
-            dataset = args[1]
-            sheet = dataset[0]
-            ws = wb[sheet]
-            id_col = dataset[1]
-            start_row = dataset[2]
-            start_col = 3
-            i = start_row
-            while True:
-                id_cell = ws.cell(row=i, column=id_col)
-                if id_cell.value is None:
-                    break
-                attrs = {}
-                for j in range(start_col, len(dataset)):
-                    j = dataset[j]
-                    attrs[ws.cell(row=1, column=j).value] = ws.cell(row=i, column=j).value
-                nodes.append((id_cell.value, attrs))
-                i += 1
-            # load nodes
-            edges = []
-            dataset = args[2]
-            sheet = dataset[0]
-            ws = wb[sheet]
-            src_id_col = dataset[1]
-            dst_id_col = dataset[2]
-            start_row = dataset[3]
-            start_col = 4
-            i = start_row
-            while True:
-                src_id_cell = ws.cell(row=i, column=src_id_col)
-                dst_id_cell = ws.cell(row=i, column=dst_id_col)
-                if src_id_cell.value is None or dst_id_cell.value is None:
-                    break
-                attrs = {}
-                for j in range(start_col, len(dataset)):
-                    j = dataset[j]
-                    attrs[ws.cell(row=1, column=j).value] = ws.cell(row=i, column=j).value
-                edges.append((src_id_cell.value, dst_id_cell.value, attrs))
-                i += 1
-            # import nodes
-            for n in nodes:
-                self.newnode(caller, (n[0], n[1], True))
-            # import edges
-            for e in edges:
-                self.newedge(caller, (e[0], e[1], e[2], True))
-            return nodes, edges
+            datasets = []
+            batch = BatchRows
+            every = ProgressRows
+            for a in args:
+                if not isinstance(a, CommandOption):
+                    datasets.append(a)
+                elif a.name in ("batch", "b"):
+                    batch = int(a.value)
+                elif a.name in ("progress", "p"):
+                    every = int(a.value) if a.has_assignee else ProgressRows
+                else:
+                    raise NetworkError("unknown import_xlsx option:{}".format(a))
+            filename = datasets[0]
+            # counts of the rows read, see Progress. the rows are not kept, as the (nodes, edges) lists
+            # returned before were.
+            imported = {"nodes": Progress.empty(), "edges": Progress.empty()}
+            wb = open_workbook(filename)
+            # the journal gets a record per batch; it is compacted once, after the import.
+            self._compaction_deferred = True
+            try:
+                with collection_paused():
+                    if len(datasets) > 1:
+                        sheet, id_col, start_row = datasets[1][:3]
+                        progress = Progress("import_xlsx {} {}".format(filename, sheet), every)
+                        for rows in batches(iter_table(wb[sheet], start_row, (id_col,), datasets[1][3:]), batch):
+                            added, taken = self._add_nodes_from((keys[0], attrs) for keys, attrs in rows)
+                            progress.update(len(rows), len(added), taken)
+                        imported["nodes"] = progress.done()
+                    if len(datasets) > 2:
+                        sheet, src_id_col, dst_id_col, start_row = datasets[2][:4]
+                        progress = Progress("import_xlsx {} {}".format(filename, sheet), every)
+                        table = iter_table(wb[sheet], start_row, (src_id_col, dst_id_col), datasets[2][4:])
+                        for rows in batches(table, batch):
+                            added, taken = self._add_edges_from((keys[0], keys[1], attrs) for keys, attrs in rows)
+                            progress.update(len(rows), len(added), taken)
+                        imported["edges"] = progress.done()
+            finally:
+                wb.close()
+                self._compaction_deferred = False
+            if self._journal is not None and self._journal.should_compact:
+                self.compact()
+            return imported
         except Exception as ex:
             raise NetworkError("excel file import error:{}".format(args), ex)
 
+    def import_csv(self, caller, args):
+        # "nodes.csv", "edges.csv", -id=column, -source=column, -target=column, -delimiter=";",
+        #   -types=[[column, int|float|bool|str], ..], -batch=rows per bulk insert, -progress=rows per report
+        # the first row names the columns. nodes are keyed by column id (else the first one), edges by
+        # source and target (else src and dst, else the first two). other columns become attributes.
+        # "" skips a file.
+        return self.import_tables(caller, args, "import_csv", True)
+
+    def import_columns(self, caller, args):
+        # as import_csv, for columnar files: .npz (an array per column), .npy (a structured array),
+        # and with pyarrow .parquet, .arrow and .feather. values keep their stored types.
+        return self.import_tables(caller, args, "import_columns", False)
+
+    def import_tables(self, caller, args, sig, is_csv):
+        try:
+            if len(args) > 0:
+                ret = self.help_check(sig, caller, args)
+                if ret is not None:
+                    return ret
+            files = []
+            options = {"id": None, "source": None, "target": None, "delimiter": None, "types": {},
+                       "batch": BatchRows, "progress": ProgressRows}
+            aliases = {"i": "id", "s": "source", "src": "source", "t": "target", "dst": "target",
+                       "d": "delimiter", "b": "batch", "p": "progress"}
+            for a in args:
+                if not isinstance(a, CommandOption):
+                    files.append(a)
+                    continue
+                name = aliases.get(a.name, a.name)
+                if name not in options.keys() or (not a.has_assignee and name != "progress"):
+                    raise NetworkError("unknown {} option:{}".format(sig, a))
+                value = a.value
+                if isinstance(value, NetworkSymbol):
+                    value = value.symbol
+                if name == "types":
+                    value = {"{}".format(c): "{}".format(t) for c, t in value}
+                elif name in ("batch", "progress"):
+                    value = int(value) if a.has_assignee else ProgressRows
+                options[name] = value
+            batch = options["batch"]
+
+            def read(filename):
+                if is_csv:
+                    return read_csv(filename, batch, options["delimiter"], options["types"])
+                return read_columns(filename, batch)
+
+            imported = {"nodes": Progress.empty(), "edges": Progress.empty()}
+            # the journal gets a record per chunk; it is compacted once, after the import.
+            self._compaction_deferred = True
+            try:
+                with collection_paused():
+                    if len(files) > 0 and files[0]:
+                        progress = Progress("{} {}".format(sig, files[0]), options["progress"])
+                        for names, columns in read(files[0]):
+                            key = options["id"] or key_column(names, ("id",), 0)
+                            added, taken = self._add_nodes_from(keyed_rows(names, columns, (key,)))
+                            progress.update(len(columns[0]), len(added), taken)
+                        imported["nodes"] = progress.done()
+                    if len(files) > 1 and files[1]:
+                        progress = Progress("{} {}".format(sig, files[1]), options["progress"])
+                        for names, columns in read(files[1]):
+                            src = options["source"] or key_column(names, ("source", "src"), 0)
+                            dst = options["target"] or key_column(names, ("target", "dst"), 1)
+                            added, taken = self._add_edges_from(keyed_rows(names, columns, (src, dst)))
+                            progress.update(len(columns[0]), len(added), taken)
+                        imported["edges"] = progress.done()
+            finally:
+                self._compaction_deferred = False
+            if self._journal is not None and self._journal.should_compact:
+                self.compact()
+            return imported
+        except Exception as ex:
+            raise NetworkError("{} failed:{}".format(sig, args), ex)
+
     def load_xlsx(self, caller, args):
         # "something.xlsx", (sheet1, start_row, attr1, attr2,..),
         #                   (sheet2, start_row, attr1, attr2,..),
@@ -1654,33 +2150,83 @@ class SpecificationGraph(nx.MultiDiGraph):
                 ret = self.help_check("sort", caller, args)
                 if ret is not None:
                     return ret
+            # sort(L), sort(L, -key=name, -reverse, -top=10); -key takes a list for multiple keys.
             sortee = args[0]
-            sorter = DefaultSorter(sortee)
+            if isinstance(sortee, NetworkSymbol):
+                sortee = caller.accessor.get(caller, sortee.symbol)
+            keys = []
+            reverse = False
+            top = None
+            for a in args[1:]:
+                if not isinstance(a, CommandOption):
+                    raise NetworkError("unknown sort argument:{}".format(a))
+                if a.name in ("key", "k"):
+                    values = a.value
+                    if not isinstance(values, (list, tuple)):
+                        values = [values]
+                    for v in values:
+                        if isinstance(v, NetworkSymbol):
+                            v = v.symbol
+                        keys.append(v)
+                elif a.name in ("reverse", "r"):
+                    reverse = a.value if a.has_assignee else True
+                elif a.name in ("top", "t"):
+                    top = a.value
+                else:
+                    raise NetworkError("unknown sort option:{}".format(a))
+            sorter = DefaultSorter(sortee, self.element_attributes)
             comparator = Comparator()
-            result = sorter.sort(comparator)
+            result = sorter.sort(comparator, keys=keys, reverse=reverse, top=top)
             return result
         except Exception as ex:
             raise NetworkError("sort error:{}".format(args), ex)
 
+    def element_attributes(self, x):
+        # attributes of a node id, an edge (u, v, k) or a with-data tuple, for sort keys.
+        attrs = DefaultSorter.data_of(x)
+        if attrs is not None:
+            return attrs
+        try:
+            if x in self.N.nodes:
+                return self.N.nodes[x]
+        except TypeError:
+            return None
+        if isinstance(x, tuple) and len(x) == 3 and self.N.has_edge(x[0], x[1], x[2]):
+            return self.N[x[0]][x[1]][x[2]]
+        return None
+
     def intersect(self, caller, args):
         if len(args) > 0:
             ret = self.help_check("intersect", caller, args)
             if ret is not None:
                 return ret
-        U = args[0]
-        V = args[1]
-        I = []
-        for u in U:
-            if u in V:
-                I.append(u)
-        return I
+        # elements of U also in V, in order of U, O(|U| + |V|).
+        U = QueryResult.reiterable(args[0])
+        V = QueryResult.reiterable(args[1])
+        if isinstance(U, OrderedSet):
+            return U & V
+        return QueryResult(lambda: ordered_intersection(U, V))
 
     def union(self, caller, args):
         if len(args) > 0:
             ret = self.help_check("union", caller, args)
             if ret is not None:
                 return ret
-        pass
+        # distinct elements of U, then of V, O(|U| + |V|).
+        U = QueryResult.reiterable(args[0])
+        V = QueryResult.reiterable(args[1])
+        if isinstance(U, OrderedSet):
+            return U | V
+        return QueryResult(lambda: ordered_union(U, V))
+
+    def ordered_set(self, caller, args):
+        if len(args) > 0:
+            ret = self.help_check("ordered_set", caller, args)
+            if ret is not None:
+                return ret
+        if len(args) == 1 and isinstance(args[0], (list, tuple, QueryResult, OrderedSet)):
+            return OrderedSet(args[0])
+        return OrderedSet(args)
 
     def pull(self, caller, args):
         if len(args) > 0:
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import time
+import itertools
+from contextlib import contextmanager
+import openpyxl
+
+
+# streaming access to xlsx sheets for bulk imports.
+#
+# workbooks are opened read-only, so rows are parsed from the sheet as they are iterated and a
+# sheet of millions of rows is read in memory bounded by one batch. columns are 1-based, as in Excel.
+
+BatchRows = 10000
+ProgressRows = 100000
+
+
+def open_workbook(filename):
+    return openpyxl.load_workbook(filename, read_only=True, data_only=True)
+
+
+def cell_value(row, column):
+    # rows of read-only sheets stop at their last non-empty cell.
+    return row[column - 1] if column - 1 < len(row) else None
+
+
+def column_names(ws, columns):
+    # names of columns, from the first row of the sheet.
+    if len(columns) == 0:
+        return []
+    for row in ws.iter_rows(min_row=1, max_row=1, max_col=max(columns), values_only=True):
+        return [cell_value(row, c) for c in columns]
+    return [None] * len(columns)
+
+
+def iter_table(ws, start_row, key_columns, attr_columns):
+    # (keys, attrs) of each row from start_row, until a row misses one of its keys.
+    names = column_names(ws, attr_columns)
+    last = max(itertools.chain(key_columns, attr_columns))
+    for row in ws.iter_rows(min_row=start_row, max_col=last, values_only=True):
+        keys = tuple(cell_value(row, c) for c in key_columns)
+        if None in keys:
+            return
+        yield keys, {name: cell_value(row, c) for name, c in zip(names, attr_columns)}
+
+
+def batches(rows, size=BatchRows):
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if len(batch) == 0:
+            return
+        yield batch
+
+
+@contextmanager
+def collection_paused():
+    # bulk imports create millions of attribute dicts that all stay alive; the cyclic collector
+    # would scan them again and again, about half of the import time.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Progress(object):
+    # counts the rows of an import and reports the rows read every 'every' rows, and the counts once
+    # done. every=0 reports nothing. rows read are either merged into elements already there, added as
+    # new elements, or skipped (a key or an end node missing).
+
+    def __init__(self, name, every=ProgressRows, report=print):
+        self._name = name
+        self._every = every
+        self._report = report
+        self._rows = 0
+        self._added = 0
+        self._taken = 0
+        self._next = every
+        self._start = time.time()
+
+    @staticmethod
+    def empty():
+        # counts of a table not imported.
+        return {"read": 0, "added": 0, "merged": 0, "skipped": 0}
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def counts(self):
+        return {"read": self._rows, "added": self._added, "merged": self._taken - self._added,
+                "skipped": self._rows - self._taken}
+
+    def update(self, n, added=0, taken=None):
+        # n rows read, 'added' elements made of them and 'taken' of them used, all unless given.
+        self._rows += n
+        self._added += added
+        self._taken += n if taken is None else taken
+        if self._every and self._rows >= self._next:
+            self._report("{}: {} rows ({:.1f}s)".format(self._name, self._rows, time.time() - self._start))
+            while self._next <= self._rows:
+                self._next += self._every
+
+    def done(self):
+        counts = self.counts
+        if self._every:
+            self._report("{}: {} rows done, {} added, {} merged, {} skipped ({:.1f}s)".format(
+                self._name, counts["read"], counts["added"], counts["merged"], counts["skipped"],
+                time.time() - self._start))
+        return counts
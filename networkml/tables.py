@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import numpy as np
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # pyarrow is in the 'columnar' extras. CSV and NumPy tables are read without it.
+    pyarrow = None
+
+from networkml.error import NetworkError
+from networkml.spreadsheet import batches, BatchRows
+
+
+# chunked readers of tables for bulk imports.
+#
+# a reader yields chunks as (names, columns): the column names and one list of values per column,
+# at most 'size' rows each. the first row of a CSV file names its columns. each CSV column gets its
+# type once, from the first chunk: int, float or bool if every value of the chunk reads as such,
+# str otherwise. the whole column then goes through that one converter, chunk after chunk; a later
+# value it rejects stays the string it is. empty cells are None.
+# columnar files (.npy, .npz, .parquet, .arrow, .feather) carry their types and are only sliced.
+
+CsvExtensions = (".csv", ".tsv", ".txt")
+NumpyExtensions = (".npy", ".npz")
+ArrowExtensions = (".parquet", ".arrow", ".feather", ".ipc")
+
+
+def to_bool(s):
+    if s in ("True", "true", "TRUE"):
+        return True
+    if s in ("False", "false", "FALSE"):
+        return False
+    raise ValueError(s)
+
+
+Converters = {"int": int, "float": float, "bool": to_bool, "str": str}
+InferredTypes = ("int", "float", "bool")
+
+
+def infer_type(values):
+    # first of InferredTypes reading every non-empty value, else str.
+    present = [v for v in values if v != ""]
+    if len(present) == 0:
+        return "str"
+    for name in InferredTypes:
+        convert = Converters[name]
+        try:
+            for v in present:
+                convert(v)
+            return name
+        except ValueError:
+            continue
+    return "str"
+
+
+def convert_column(values, convert):
+    if convert is str:
+        return [None if v == "" else v for v in values]
+    try:
+        return [None if v == "" else convert(v) for v in values]
+    except ValueError:
+        pass
+    column = []
+    for v in values:
+        if v == "":
+            column.append(None)
+            continue
+        try:
+            column.append(convert(v))
+        except ValueError:
+            column.append(v)
+    return column
+
+
+def extension(filename):
+    return os.path.splitext("{}".format(filename))[1].lower()
+
+
+def read_csv(filename, size=BatchRows, delimiter=None, types=None):
+    # types: column name -> one of Converters, in place of inference.
+    if delimiter is None:
+        delimiter = "\t" if extension(filename) == ".tsv" else ","
+    types = types or {}
+    with open(filename, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        names = next(reader, None)
+        if names is None:
+            return
+        n = len(names)
+        converters = None
+        for rows in batches(reader, size):
+            columns = [list(c) for c in zip(*(r if len(r) == n else (r + [""] * n)[:n] for r in rows))]
+            if converters is None:
+                converters = [Converters[types.get(name) or infer_type(c)] for name, c in zip(names, columns)]
+            yield names, [convert_column(c, convert) for c, convert in zip(columns, converters)]
+
+
+def read_numpy(filename, size=BatchRows):
+    # .npz: one array per column. .npy: a structured array, mapped, its fields being the columns.
+    if extension(filename) == ".npz":
+        data = np.load(filename, allow_pickle=False)
+        names = list(data.files)
+        arrays = [data[name] for name in names]
+    else:
+        data = np.load(filename, mmap_mode="r", allow_pickle=False)
+        if data.dtype.names is None:
+            raise NetworkError("{} holds no structured array, its columns have no names.".format(filename))
+        names = list(data.dtype.names)
+        arrays = [data[name] for name in names]
+    length = len(arrays[0]) if len(arrays) > 0 else 0
+    if any(len(a) != length for a in arrays):
+        raise NetworkError("columns of {} differ in length.".format(filename))
+    for i in range(0, length, size):
+        yield names, [a[i:i + size].tolist() for a in arrays]
+
+
+def read_arrow(filename, size=BatchRows):
+    if pyarrow is None:
+        raise NetworkError("reading {} needs pyarrow.".format(filename))
+    if extension(filename) == ".parquet":
+        record_batches = pyarrow.parquet.ParquetFile(filename).iter_batches(batch_size=size)
+    else:
+        # .arrow, .feather (v2) and .ipc are Arrow IPC files.
+        reader = pyarrow.ipc.open_file(filename)
+        record_batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for b in record_batches:
+        for i in range(0, b.num_rows, size):
+            s = b.slice(i, size)
+            yield s.schema.names, [c.to_pylist() for c in s.columns]
+
+
+def read_columns(filename, size=BatchRows):
+    ext = extension(filename)
+    if ext in NumpyExtensions:
+        return read_numpy(filename, size)
+    if ext in ArrowExtensions:
+        return read_arrow(filename, size)
+    raise NetworkError("unknown columnar file:{}, one of {} expected.".format(
+        filename, ", ".join(NumpyExtensions + ArrowExtensions)))
+
+
+def key_column(names, candidates, position):
+    # first of candidates naming a column, else the column at position.
+    for c in candidates:
+        if c in names:
+            return c
+    if position < len(names):
+        return names[position]
+    raise NetworkError("no column for {} in {}.".format(candidates, names))
+
+
+def keyed_rows(names, columns, keys):
+    # (key values.., attrs) of each row of a chunk; rows missing a key are skipped.
+    key_indices = [names.index(k) for k in keys]
+    attr_indices = [i for i in range(len(names)) if i not in key_indices]
+    attr_names = [names[i] for i in attr_indices]
+    n = len(columns[0]) if len(columns) > 0 else 0
+    if len(attr_indices) > 0:
+        attrs = [dict(zip(attr_names, values)) for values in zip(*(columns[i] for i in attr_indices))]
+    else:
+        attrs = [{} for _ in range(n)]
+    for row in zip(*[columns[i] for i in key_indices], attrs):
+        if None in row[:-1]:
+            continue
+        yield row
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import re
+import operator
 from networkml.generic import GenericComponent, GenericValueHolder, GenericValidator, GenericUnaryEvaluatee
 from networkml.generic import GenericBinaryEvaluatee, GenericValidatorParam, GenericEvaluatee
 
@@ -20,6 +21,8 @@ class MultiArityEvaluatee(GenericComponent, GenericEvaluatee):
         self._evaluatees = evaluatees
         self._repr_with_parent = repr_with_parent
         self._symbolic_args = [False for _ in self._evaluatees]
+        self._predicate = None
+        self._compiled = False
 
     @property
     def arity(self):
@@ -53,6 +56,7 @@ class MultiArityEvaluatee(GenericComponent, GenericEvaluatee):
 
     def set_symbolic(self, n, f):
         self._symbolic_args[n] = f
+        self.invalidate_predicate()
 
     def set_repr_with_parent(self, flag: bool):
         self._repr_with_parent = flag
@@ -64,10 +68,49 @@ class MultiArityEvaluatee(GenericComponent, GenericEvaluatee):
             return self._evaluatees[n]
         return self.validator.validate(self._evaluatees[n])
 
+    def operand(self, n):
+        # n-th operand as written in the spec, without symbol resolution.
+        return self._evaluatees[n]
+
     def set_nth(self, n, expr):
         evaluatees = list(self._evaluatees)
         evaluatees[n] = expr
         self._evaluatees = tuple(evaluatees)
+        self.invalidate_predicate()
+
+    @property
+    def predicate(self):
+        # evaluate() under tag validation compiled into a closure over the attribute dict.
+        # compiled once and cached. None if this tree cannot be compiled.
+        if not self._compiled:
+            self._predicate = self.compile()
+            self._compiled = True
+        return self._predicate
+
+    def invalidate_predicate(self):
+        self._predicate = None
+        self._compiled = False
+
+    def compile(self):
+        return None
+
+    def compile_operand(self, n):
+        # mirrors evaluate(): literal, nested evaluatee, or tag looked up in the attribute dict.
+        e = self._evaluatees[n]
+        if not self.get_symbolic(n):
+            return lambda d: e
+        if isinstance(e, GenericEvaluatee):
+            if not isinstance(e, MultiArityEvaluatee):
+                return None
+            return e.predicate
+        from networkml.network import NetworkCallable
+        if isinstance(e, NetworkCallable):
+            return None
+        try:
+            hash(e)
+        except TypeError:
+            return None
+        return lambda d: d.get(e)
 
     def evaluate(self, caller=None):
         rtn = []
@@ -151,6 +194,11 @@ class UnaryEvaluatee(MultiArityEvaluatee, GenericUnaryEvaluatee):
         # elif type(self._evaluatees[0]) is str or type(self._evaluatees[0]) is int or type(self._evaluatees[0]) is float:
         return expr
 
+    def compile(self):
+        if isinstance(self._evaluatees[0], GenericEvaluatee):
+            return None
+        return self.compile_operand(0)
+
     def __repr__(self):
         if self._repr_with_parent:
             lpar = "("
@@ -202,6 +250,7 @@ class BinaryEvaluatee(MultiArityEvaluatee, GenericBinaryEvaluatee):
         evaluatees = list(self._evaluatees)
         evaluatees[0] = l
         self._evaluatees = tuple(evaluatees)
+        self.invalidate_predicate()
 
     @property
     def r(self):
@@ -211,10 +260,21 @@ class BinaryEvaluatee(MultiArityEvaluatee, GenericBinaryEvaluatee):
         evaluatees = list(self._evaluatees)
         evaluatees[1] = r
         self._evaluatees = tuple(evaluatees)
+        self.invalidate_predicate()
 
     def evaluate(self, caller=None):
         return super().evaluate(caller)
 
+    def compile_binary(self, op):
+        l = self.compile_operand(0)
+        r = self.compile_operand(1)
+        if l is None or r is None:
+            return None
+        if not self.r_symbol:
+            c = self._evaluatees[1]
+            return lambda d: op(l(d), c)
+        return lambda d: op(l(d), r(d))
+
     def __repr__(self):
         if self._repr_with_parent:
             lpar = "("
@@ -254,6 +314,12 @@ class BooleanNegatee(BooleanUnaryEvaluatee):
     def evaluate(self, caller=None):
         return not super().evaluate(caller)
 
+    def compile(self):
+        p = super().compile()
+        if p is None:
+            return None
+        return lambda d: not p(d)
+
 
 class BooleanBinaryEvaluatee(BinaryEvaluatee):
 
@@ -270,6 +336,13 @@ class BooleanConjunctiveEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l and r
 
+    def compile(self):
+        l = self.compile_operand(0)
+        r = self.compile_operand(1)
+        if l is None or r is None:
+            return None
+        return lambda d: l(d) and r(d)
+
 
 class BooleanDisjunctiveEvaluatee(BooleanBinaryEvaluatee):
 
@@ -280,6 +353,13 @@ class BooleanDisjunctiveEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l or r
 
+    def compile(self):
+        l = self.compile_operand(0)
+        r = self.compile_operand(1)
+        if l is None or r is None:
+            return None
+        return lambda d: l(d) or r(d)
+
 
 class BooleanEqualityEvaluatee(BooleanBinaryEvaluatee):
 
@@ -290,6 +370,9 @@ class BooleanEqualityEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l == r
 
+    def compile(self):
+        return self.compile_binary(operator.eq)
+
 
 class BooleanDifferenceEvaluatee(BooleanBinaryEvaluatee):
     def __init__(self, owner, l, r, sym="!=", l_symbol=False, r_symbol=True, repr_with_parent=False):
@@ -299,6 +382,9 @@ class BooleanDifferenceEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l != r
 
+    def compile(self):
+        return self.compile_binary(operator.ne)
+
 
 class BooleanMatchee(BooleanBinaryEvaluatee):
 
@@ -318,6 +404,22 @@ class BooleanMatchee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return self.matches(l, r)
 
+    def compile(self):
+        l = self.compile_operand(0)
+        r = self.compile_operand(1)
+        if l is None or r is None:
+            return None
+        if self.r_symbol:
+            return lambda d: self.matches(l(d), r(d))
+        # literal pattern is checked and compiled once, matches() does the same per call.
+        r = self._evaluatees[1]
+        if type(r) is not str:
+            return None
+        if len(r) < 2 or r[0] != "|" or r[len(r)-1] != "|":
+            return lambda d: False
+        pat = re.compile(r[1:len(r)-1])
+        return lambda d: pat.search(l(d)) is not None
+
 
 class BooleanUnmatchee(BooleanMatchee):
 
@@ -327,6 +429,12 @@ class BooleanUnmatchee(BooleanMatchee):
     def evaluate(self, caller=None):
         return not super().evaluate(caller)
 
+    def compile(self):
+        p = super().compile()
+        if p is None:
+            return None
+        return lambda d: not p(d)
+
 
 class BooleanLessThanEvaluatee(BooleanBinaryEvaluatee):
 
@@ -337,6 +445,9 @@ class BooleanLessThanEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l < r
 
+    def compile(self):
+        return self.compile_binary(operator.lt)
+
 
 class BooleanLessOrEqualsEvaluatee(BooleanBinaryEvaluatee):
 
@@ -347,6 +458,9 @@ class BooleanLessOrEqualsEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l <= r
 
+    def compile(self):
+        return self.compile_binary(operator.le)
+
 
 class BooleanGreaterThanEvaluatee(BooleanBinaryEvaluatee):
 
@@ -357,6 +471,9 @@ class BooleanGreaterThanEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l > r
 
+    def compile(self):
+        return self.compile_binary(operator.gt)
+
 
 class BooleanGreaterOrEqualsEvaluatee(BooleanBinaryEvaluatee):
 
@@ -367,6 +484,9 @@ class BooleanGreaterOrEqualsEvaluatee(BooleanBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l >= r
 
+    def compile(self):
+        return self.compile_binary(operator.ge)
+
 
 class ArithmeticBinaryEvaluatee(BinaryEvaluatee):
 
@@ -389,6 +509,9 @@ class ArithmeticAdditionalEvaluatee(ArithmeticBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l + r
 
+    def compile(self):
+        return self.compile_binary(operator.add)
+
 
 class ArithmeticSubtractalEvaluatee(ArithmeticBinaryEvaluatee):
 
@@ -399,6 +522,9 @@ class ArithmeticSubtractalEvaluatee(ArithmeticBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l - r
 
+    def compile(self):
+        return self.compile_binary(operator.sub)
+
 
 class ArithmeticMultiplicableEvaluatee(ArithmeticBinaryEvaluatee):
 
@@ -409,6 +535,9 @@ class ArithmeticMultiplicableEvaluatee(ArithmeticBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l * r
 
+    def compile(self):
+        return self.compile_binary(operator.mul)
+
 
 class ArithmeticDivideEvaluatee(ArithmeticBinaryEvaluatee):
 
@@ -419,6 +548,9 @@ class ArithmeticDivideEvaluatee(ArithmeticBinaryEvaluatee):
         l, r = super().evaluate(caller)
         return l / r
 
+    def compile(self):
+        return self.compile_binary(operator.truediv)
+
 
 class ArithmeticModulusEvaluatee(ArithmeticBinaryEvaluatee):
 
@@ -428,3 +560,6 @@ class ArithmeticModulusEvaluatee(ArithmeticBinaryEvaluatee):
     def evaluate(self, caller=None):
         l, r = super().evaluate(caller)
         return l % r
+
+    def compile(self):
+        return self.compile_binary(operator.mod)
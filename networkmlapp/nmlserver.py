@@ -77,8 +77,9 @@ def main():
     networkml_config = config['networkml-config']
     server_config = config['nmlserver-config']
     S = SpecificationWorld(None, networkml_config)
+    # a *.nmlg model is mapped read-only, shared with other servers on the host, unless mapped-model is false.
     if "default-model" in server_config.keys():
-        S.N.load(S, server_config['default-model'])
+        S.N.load(S, server_config['default-model'], mapped=server_config.get('mapped-model', True))
     S.start_server()
 
     # main loop